@@ -9,16 +9,19 @@ trading_platform_path = os.path.join(project_root, "front", "trading_platform")
 print(trading_platform_path)
 sys.path.append(trading_platform_path)
 
+import asyncio
+import signal
 import redis
+import redis.asyncio
 import json
 import time
-from datetime import datetime, timezone, timedelta
+from datetime import datetime
 from watchdog.observers import Observer
 from watchdog.events import FileSystemEventHandler
 from app.oms.storage import DataStorage
-from app.oms.redis_sync import RedisSyncManager
-from app.oms.constant import Order, OrderStatus, OrderSide, OrderType
-import threading
+from app.oms.async_redis_sync import AsyncRedisSyncManager
+from app.oms.redis_sync import sync_options_from_env
+from app.oms.redis_pool import HEALTH_CHECK_INTERVAL, get_async_connection_pool
 
 # Redis配置
 REDIS_HOST = '1.95.154.244'
@@ -27,7 +30,6 @@ REDIS_PASSWORD = '123'
 REDIS_DB = 0
 SYNC_CHANNEL = 'jailbird:sync'
 DELETE_CHANNEL = 'jailbird:delete'
-ORDERS_HASH = 'jailbird:account:orders'  # 添加订单哈希表的键名
 
 # 本地配置 - 使用相对路径
 # 可以通过环境变量或配置文件覆盖
@@ -41,8 +43,10 @@ os.makedirs(os.path.dirname(LOCAL_DB), exist_ok=True)
 os.makedirs(DATA_PATH, exist_ok=True)
 
 class FileChangeHandler(FileSystemEventHandler):
-    def __init__(self, redis_client):
-        self.redis_client = redis_client
+    """把watchdog监控线程中的文件事件转交给事件循环，由 SyncDaemon 处理"""
+    def __init__(self, loop: asyncio.AbstractEventLoop, events: asyncio.Queue):
+        self.loop = loop
+        self.events = events
         self.last_modified = {}
 
     def on_modified(self, event):
@@ -52,70 +56,66 @@ class FileChangeHandler(FileSystemEventHandler):
                current_time - self.last_modified[event.src_path] > 1:
                 self.last_modified[event.src_path] = current_time
                 print(f"检测到文件变化: {event.src_path}")
-                self.sync_file(event.src_path)
+                self.loop.call_soon_threadsafe(self.events.put_nowait, ('modified', event.src_path))
 
     def on_deleted(self, event):
         if not event.is_directory and event.src_path.endswith('.json'):
             print(f"检测到文件删除: {event.src_path}")
-            self.delete_file(event.src_path)
+            self.loop.call_soon_threadsafe(self.events.put_nowait, ('deleted', event.src_path))
 
-    def sync_file(self, file_path):
-        try:
-            with open(file_path, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-            
-            # 计算相对路径，确保正确处理不同操作系统的路径分隔符
-            try:
-                relative_path = os.path.relpath(file_path, DATA_PATH)
-                # 统一使用正斜杠作为路径分隔符
-                relative_path = relative_path.replace('\\', '/')
-            except ValueError as e:
-                # 如果出现路径问题（如不同驱动器），使用文件名作为相对路径
-                print(f"[WARNING] 无法计算相对路径，使用文件名: {e}")
-                relative_path = os.path.basename(file_path)
-                
-            key = f"jailbird:account:{relative_path}"
-            
-            self.redis_client.set(key, json.dumps(data))
-            
-            sync_message = {
-                'key': key,
-                'value': data,
-                'timestamp': datetime.now().isoformat()
-            }
-            self.redis_client.publish(SYNC_CHANNEL, json.dumps(sync_message))
-            print(f"[OK] 成功同步并发布: {file_path} -> {key}")
-            
-        except Exception as e:
-            print(f"[ERROR] 同步失败 {file_path}: {e}")
-            traceback.print_exc()
+def file_key(file_path):
+    """账户文件在Redis中的键名"""
+    # 计算相对路径，确保正确处理不同操作系统的路径分隔符
+    try:
+        relative_path = os.path.relpath(file_path, DATA_PATH)
+        # 统一使用正斜杠作为路径分隔符
+        relative_path = relative_path.replace('\\', '/')
+    except ValueError as e:
+        # 如果出现路径问题（如不同驱动器），使用文件名作为相对路径
+        print(f"[WARNING] 无法计算相对路径，使用文件名: {e}")
+        relative_path = os.path.basename(file_path)
+    return f"jailbird:account:{relative_path}"
 
-    def delete_file(self, file_path):
-        try:
-            # 计算相对路径，确保正确处理不同操作系统的路径分隔符
-            try:
-                relative_path = os.path.relpath(file_path, DATA_PATH)
-                # 统一使用正斜杠作为路径分隔符
-                relative_path = relative_path.replace('\\', '/')
-            except ValueError as e:
-                # 如果出现路径问题（如不同驱动器），使用文件名作为相对路径
-                print(f"[WARNING] 无法计算相对路径，使用文件名: {e}")
-                relative_path = os.path.basename(file_path)
-                
-            key = f"jailbird:account:{relative_path}"
-            
-            delete_message = {
-                'key': key,
-                'timestamp': datetime.now().isoformat()
-            }
-            self.redis_client.publish(DELETE_CHANNEL, json.dumps(delete_message))
-            print(f"[OK] 已发布删除消息: {file_path} -> {key}")
-            
-        except Exception as e:
-            print(f"[ERROR] 处理删除失败 {file_path}: {e}")
-            traceback.print_exc()
+async def sync_file(redis_client, file_path):
+    """写入文件内容并发布同步消息，两条命令一次往返"""
+    try:
+        # 账户文件很小，直接在事件循环中读取
+        with open(file_path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        key = file_key(file_path)
+        
+        sync_message = {
+            'key': key,
+            'value': data,
+            'timestamp': datetime.now().isoformat()
+        }
+        pipe = redis_client.pipeline(transaction=False)
+        pipe.set(key, json.dumps(data))
+        pipe.publish(SYNC_CHANNEL, json.dumps(sync_message))
+        await pipe.execute()
+        print(f"[OK] 成功同步并发布: {file_path} -> {key}")
+        
+    except Exception as e:
+        print(f"[ERROR] 同步失败 {file_path}: {e}")
+        traceback.print_exc()
 
-def initial_sync(redis_client):
+async def delete_file(redis_client, file_path):
+    """发布删除消息"""
+    try:
+        key = file_key(file_path)
+        
+        delete_message = {
+            'key': key,
+            'timestamp': datetime.now().isoformat()
+        }
+        await redis_client.publish(DELETE_CHANNEL, json.dumps(delete_message))
+        print(f"[OK] 已发布删除消息: {file_path} -> {key}")
+        
+    except Exception as e:
+        print(f"[ERROR] 处理删除失败 {file_path}: {e}")
+        traceback.print_exc()
+
+async def initial_sync(redis_client):
     """初始同步所有文件"""
     print(f"开始初始同步目录: {DATA_PATH}")
     if not os.path.exists(DATA_PATH):
@@ -123,19 +123,13 @@ def initial_sync(redis_client):
         os.makedirs(DATA_PATH, exist_ok=True)
         return
 
-    handler = FileChangeHandler(redis_client)
     file_count = 0
     
     for root, dirs, files in os.walk(DATA_PATH):
         for file in files:
             if file.endswith('.json'):
-                file_path = os.path.join(root, file)
-                try:
-                    handler.sync_file(file_path)
-                    file_count += 1
-                except Exception as e:
-                    print(f"[ERROR] 初始同步文件失败 {file_path}: {e}")
-                    traceback.print_exc()
+                await sync_file(redis_client, os.path.join(root, file))
+                file_count += 1
     
     print(f"初始同步完成，共同步 {file_count} 个文件")
 
@@ -204,40 +198,21 @@ def handle_delete_message(message, data_path):
         print(f"[ERROR] 处理删除消息失败: {e}")
         traceback.print_exc()
 
-def start_subscriber(redis_client, data_path):
-    """启动订阅服务"""
-    pubsub = redis_client.pubsub()
-    pubsub.subscribe(SYNC_CHANNEL, DELETE_CHANNEL)
-    
-    print(f"开始监听频道: {SYNC_CHANNEL}, {DELETE_CHANNEL}")
-    
-    try:
-        for message in pubsub.listen():
-            if message['type'] == 'message':
-                if message['channel'] == SYNC_CHANNEL:
-                    handle_sync_message(message, data_path)
-                elif message['channel'] == DELETE_CHANNEL:
-                    handle_delete_message(message, data_path)
-    except Exception as e:
-        print(f"[ERROR] 订阅服务出错: {e}")
-    finally:
-        pubsub.unsubscribe()
-
-def test_redis_connection(redis_client):
+async def test_redis_connection(redis_client, order_sync: AsyncRedisSyncManager):
     """测试Redis连接"""
     try:
         # 测试基本连接
-        redis_client.ping()
+        await redis_client.ping()
         print("[OK] Redis连接测试成功")
         
         # 测试写入权限
         test_key = "test:connection"
-        redis_client.set(test_key, "test")
-        redis_client.delete(test_key)
+        await redis_client.set(test_key, "test")
+        await redis_client.delete(test_key)
         print("[OK] Redis写入权限测试成功")
         
-        # 检查现有数据
-        orders_count = redis_client.hlen(ORDERS_HASH)
+        # 检查现有数据，分片模式下统计当天的各个分片
+        orders_count = await order_sync.count_remote_orders()
         print(f"[INFO] 当前Redis订单数量: {orders_count}")
         
         return True
@@ -246,130 +221,166 @@ def test_redis_connection(redis_client):
         traceback.print_exc()
         return False
 
+class SyncDaemon:
+    """同步守护进程
+
+    在一个事件循环中协作运行订单同步（AsyncRedisSyncManager）、账户文件同步
+    （本地监控文件变化并推送，云端订阅并写入文件）和Redis健康检查，
+    全部共用一个 redis.asyncio 连接池。除事件循环外只有本地模式的watchdog监控线程，
+    它只把事件放入队列。
+
+    收到 SIGINT/SIGTERM 或任一任务意外退出后按固定顺序停止：停止文件监控，
+    取消全部任务并等待结束，关闭数据库，最后断开连接池。
+    """
+    def __init__(self, is_cloud: bool, db_path: str, data_path: str):
+        self.is_cloud = is_cloud
+        self.db_path = db_path
+        self.data_path = data_path
+        self.redis_client = None
+        self.storage = None
+        self.order_sync = None
+        self.observer = None
+
+    async def run(self):
+        pool = get_async_connection_pool(REDIS_HOST, REDIS_PORT, REDIS_DB, REDIS_PASSWORD)
+        self.redis_client = redis.asyncio.Redis(connection_pool=pool)
+        tasks = []
+        try:
+            self.storage = DataStorage(self.db_path, use_cache=True)
+            # 分片和Stream由环境变量设置，与 run_redis_sync 一致，见 sync_options_from_env
+            self.order_sync = AsyncRedisSyncManager(
+                storage=self.storage,
+                redis_client=self.redis_client,
+                is_cloud=self.is_cloud,
+                **sync_options_from_env()
+            )
+            
+            # 测试Redis连接
+            if not await test_redis_connection(self.redis_client, self.order_sync):
+                print("[ERROR] Redis连接失败，程序退出")
+                return
+            
+            stopping = asyncio.Event()
+            self._add_signal_handlers(stopping)
+            tasks.append(asyncio.ensure_future(self.order_sync.run()))
+            tasks.append(asyncio.ensure_future(self._health_check()))
+            if self.is_cloud:
+                tasks.append(asyncio.ensure_future(self._subscribe_files()))
+            else:
+                tasks.append(asyncio.ensure_future(self._watch_files()))
+            
+            stop_task = asyncio.ensure_future(stopping.wait())
+            done, _ = await asyncio.wait(tasks + [stop_task], return_when=asyncio.FIRST_COMPLETED)
+            stop_task.cancel()
+            for task in done:
+                if task is not stop_task and not task.cancelled() and task.exception() is not None:
+                    print(f"[ERROR] 同步任务意外退出: {task.exception()}")
+            print("\n停止同步...")
+        finally:
+            await self._shutdown(tasks, pool)
+
+    def _add_signal_handlers(self, stopping: asyncio.Event):
+        """SIGINT/SIGTERM 时停止；Windows不支持时由 Ctrl+C 取消主任务，同样进入 _shutdown"""
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            try:
+                loop.add_signal_handler(sig, stopping.set)
+            except (NotImplementedError, RuntimeError):
+                pass
+
+    async def _shutdown(self, tasks, pool):
+        if self.observer is not None:
+            self.observer.stop()
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        if self.observer is not None:
+            self.observer.join()
+        if self.storage is not None:
+            self.storage.close()
+        await pool.disconnect()
+        print("[OK] 同步已停止")
+
+    async def _health_check(self):
+        """定期检查Redis连接，恢复时立即补发订单同步的待发送队列"""
+        connected = True
+        while True:
+            await asyncio.sleep(HEALTH_CHECK_INTERVAL)
+            try:
+                await self.redis_client.ping()
+            except redis.RedisError as e:
+                if connected:
+                    print(f"[WARNING] Redis连接已断开，等待重新连接: {e}")
+                connected = False
+                continue
+            if not connected:
+                print("[OK] Redis连接已恢复")
+                connected = True
+            await self.order_sync.connection_ok()
+
+    async def _watch_files(self):
+        """本地模式：监控账户文件目录，先全量同步一次，之后逐个推送变化的文件"""
+        events = asyncio.Queue()
+        self.observer = Observer()
+        self.observer.schedule(FileChangeHandler(asyncio.get_running_loop(), events), self.data_path, recursive=True)
+        self.observer.start()
+        
+        print("执行初始同步...")
+        await initial_sync(self.redis_client)
+        print("初始同步完成！")
+        
+        while True:
+            kind, file_path = await events.get()
+            if kind == 'modified':
+                await sync_file(self.redis_client, file_path)
+            else:
+                await delete_file(self.redis_client, file_path)
+
+    async def _subscribe_files(self):
+        """云端模式：订阅文件同步和删除消息并写入数据目录，断线后重新订阅"""
+        while True:
+            pubsub = self.redis_client.pubsub()
+            try:
+                await pubsub.subscribe(SYNC_CHANNEL, DELETE_CHANNEL)
+                print(f"开始监听频道: {SYNC_CHANNEL}, {DELETE_CHANNEL}")
+                while True:
+                    # 带超时读取：连接池设置了 socket_timeout，阻塞的 listen() 在频道空闲时会超时断开；
+                    # 空闲时 get_message 按 health_check_interval 发送PING保持连接
+                    message = await pubsub.get_message(ignore_subscribe_messages=True,
+                                                       timeout=HEALTH_CHECK_INTERVAL)
+                    if message is None:
+                        continue
+                    if message['channel'] == SYNC_CHANNEL:
+                        handle_sync_message(message, self.data_path)
+                    elif message['channel'] == DELETE_CHANNEL:
+                        handle_delete_message(message, self.data_path)
+            except redis.RedisError as e:
+                print(f"[ERROR] 订阅服务出错: {e}，5秒后重新订阅")
+                await asyncio.sleep(5)
+            finally:
+                await pubsub.aclose()
+
 def run_local():
     """本地运行模式"""
     # 输出实际使用的路径，便于调试
     print(f"使用数据库路径: {LOCAL_DB}")
     print(f"使用数据目录: {DATA_PATH}")
-    
-    try:
-        # 初始化Redis客户端
-        redis_client = redis.Redis(
-            host=REDIS_HOST,
-            port=REDIS_PORT,
-            db=REDIS_DB,
-            password=REDIS_PASSWORD,
-            decode_responses=True
-        )
-        
-        # 测试Redis连接
-        if not test_redis_connection(redis_client):
-            print("[ERROR] Redis连接失败，程序退出")
-            return
-        
-        # 初始化本地存储
-        local_storage = DataStorage(LOCAL_DB)
-        
-        # 初始化Redis同步管理器
-        redis_sync = RedisSyncManager(
-            storage=local_storage,
-            redis_host=REDIS_HOST,
-            redis_port=REDIS_PORT,
-            redis_db=REDIS_DB,
-            redis_password=REDIS_PASSWORD
-        )
-        
-        # 启动数据库同步
-        redis_sync.start_sync(is_cloud=False)
-        
-        # 设置文件监控
-        event_handler = FileChangeHandler(redis_client)
-        observer = Observer()
-        observer.schedule(event_handler, DATA_PATH, recursive=True)
-        observer.start()
-        
-        try:
-            # 执行初始同步
-            print("执行初始同步...")
-            initial_sync(redis_client)
-            print("初始同步完成！")
-            
-            # 保持运行
-            while True:
-                # 定期检查Redis连接
-                if not test_redis_connection(redis_client):
-                    print("[WARNING] Redis连接已断开，尝试重新连接...")
-                    time.sleep(5)
-                    continue
-                time.sleep(30)  # 每30秒检查一次连接
-                
-        except KeyboardInterrupt:
-            print("\n停止监控...")
-            observer.stop()
-            redis_sync.stop_sync()
-        observer.join()
-    except Exception as e:
-        print(f"[ERROR] 运行出错: {e}")
-        traceback.print_exc()
+    run_daemon(SyncDaemon(is_cloud=False, db_path=LOCAL_DB, data_path=DATA_PATH))
 
 def run_cloud():
     """云端运行模式"""
+    # 输出实际使用的路径，便于调试
+    cloud_db_path = os.getenv('TRADING_DATA_PATH')
+    print(f"使用云端数据库路径: {cloud_db_path}")
+    print(f"使用数据目录: {DATA_PATH}")
+    run_daemon(SyncDaemon(is_cloud=True, db_path=cloud_db_path, data_path=DATA_PATH))
+
+def run_daemon(daemon: SyncDaemon):
     try:
-        # 输出实际使用的路径，便于调试
-        # cloud_db_path = os.path.join(current_dir, "cloud_trading_data.db")
-        cloud_db_path = os.getenv('TRADING_DATA_PATH')
-        print(f"使用云端数据库路径: {cloud_db_path}")
-        print(f"使用数据目录: {DATA_PATH}")
-        
-        # 初始化Redis客户端
-        redis_client = redis.Redis(
-            host=REDIS_HOST,
-            port=REDIS_PORT,
-            db=REDIS_DB,
-            password=REDIS_PASSWORD,
-            decode_responses=True
-        )
-        
-        # 测试Redis连接
-        if not test_redis_connection(redis_client):
-            print("[ERROR] Redis连接失败，程序退出")
-            return
-        
-        # 初始化云端存储
-        cloud_storage = DataStorage(cloud_db_path)
-        
-        # 初始化Redis同步管理器
-        redis_sync = RedisSyncManager(
-            storage=cloud_storage,
-            redis_host=REDIS_HOST,
-            redis_port=REDIS_PORT,
-            redis_db=REDIS_DB,
-            redis_password=REDIS_PASSWORD
-        )
-        
-        # 启动数据库同步
-        redis_sync.start_sync(is_cloud=True)
-        
-        # 启动文件订阅服务
-        subscriber_thread = threading.Thread(
-            target=start_subscriber,
-            args=(redis_client, DATA_PATH),
-            daemon=True
-        )
-        subscriber_thread.start()
-        
-        try:
-            while True:
-                # 定期检查Redis连接
-                if not test_redis_connection(redis_client):
-                    print("[WARNING] Redis连接已断开，尝试重新连接...")
-                    time.sleep(5)
-                    continue
-                time.sleep(30)  # 每30秒检查一次连接
-                
-        except KeyboardInterrupt:
-            print("\n停止同步...")
-            redis_sync.stop_sync()
+        asyncio.run(daemon.run())
+    except KeyboardInterrupt:
+        # 不支持信号处理的平台上 Ctrl+C 时，asyncio.run 已取消主任务并完成 _shutdown
+        pass
     except Exception as e:
         print(f"[ERROR] 运行出错: {e}")
         traceback.print_exc()
@@ -380,4 +391,4 @@ if __name__ == "__main__":
         run_cloud()
     else:
         print("运行本地模式...")
-        run_local() 
\ No newline at end of file
+        run_local()
@@ -7,6 +7,7 @@ from datetime import datetime
 import pytz
 import os
 from app.notes.models import Note
+from app.oms.symbols import symbol_registry
 from app import db
 import json
 import csv
@@ -540,6 +541,7 @@ def trading_performance():
         for code, pos in positions_data.items():
             # 确保pos是字典类型
             if isinstance(pos, dict):
+                symbol_info = symbol_registry.get(str(code))
                 processed_pos = {
                     'volume': pos.get('volume', 0),
                     'cost': pos.get('cost', 0),
@@ -548,7 +550,11 @@ def trading_performance():
                     'trade_price': pos.get('trade_price', 0),
                     'latest_price': pos.get('latest_price', 0),
                     'market_value': pos.get('market_value', 0),
-                    'security_type': pos.get('security_type', 'UNKNOWN')
+                    'security_type': pos.get('security_type') or symbol_info.security_type.value,
+                    'exchange': symbol_info.exchange,
+                    'lot_size': symbol_info.lot_size,
+                    'tick_size': symbol_info.tick_size,
+                    'name': symbol_info.name,
                 }
                 processed_positions[code] = processed_pos
             else:
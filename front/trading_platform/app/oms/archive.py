@@ -0,0 +1,121 @@
+import sqlite3
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+
+class OrderArchive:
+    """按月分区的订单和事件归档
+
+    每个月一个SQLite文件（orders_YYYYMM.db），其中的 orders/events 表结构与主库相同。
+    主库只保留最近的数据，历史查询只打开与时间范围重叠的分区文件。
+    """
+    def __init__(self, archive_dir: str):
+        self.archive_dir = Path(archive_dir)
+
+    def partition_path(self, month: str) -> Path:
+        """month 形如 YYYY-MM"""
+        return self.archive_dir / f"orders_{month.replace('-', '')}.db"
+
+    def partitions(self, start_time: Optional[datetime] = None,
+                   end_time: Optional[datetime] = None) -> List[Path]:
+        """返回与时间范围重叠且已存在的分区文件，范围为None时不限制"""
+        if not self.archive_dir.is_dir():
+            return []
+        start_key = f"{start_time.year:04d}{start_time.month:02d}" if start_time else ''
+        end_key = f"{end_time.year:04d}{end_time.month:02d}" if end_time else '999999'
+        return [
+            path for path in sorted(self.archive_dir.glob('orders_*.db'))
+            if start_key <= path.stem[len('orders_'):] <= end_key
+        ]
+
+    @staticmethod
+    def _month_range(month: str) -> Tuple[str, str]:
+        """分区月份的起止（ISO字符串，左闭右开）"""
+        year, mon = int(month[:4]), int(month[5:7])
+        next_year, next_mon = (year + 1, 1) if mon == 12 else (year, mon + 1)
+        return f"{year:04d}-{mon:02d}-01", f"{next_year:04d}-{next_mon:02d}-01"
+
+    def archive(self, conn: sqlite3.Connection, cutoff: str, orders_table_sql: str,
+                events_table_sql: str) -> Dict[str, int]:
+        """将主库中早于cutoff的订单和事件移动到对应月份的分区
+
+        每个分区单独提交：先写入分区再从主库删除，两个库的提交不保证原子，中途失败时
+        数据可能同时存在于两边，查询时以主库为准去重，重新执行归档即可恢复。
+        归档不是订单删除，删除触发器产生的墓碑记录在同一事务内清除，不通知下游。
+
+        Args:
+            conn: 主库连接，调用时不能处于事务中
+            cutoff: ISO时间字符串，早于该时间的数据被归档
+            orders_table_sql / events_table_sql: 建表语句，表名前需带 {schema} 占位
+
+        Returns:
+            Dict[str, int]: 归档的订单数和事件数
+        """
+        self.archive_dir.mkdir(parents=True, exist_ok=True)
+        order_columns = [col[1] for col in conn.execute('PRAGMA table_info(orders)')]
+        event_columns = [col[1] for col in conn.execute('PRAGMA table_info(events)')]
+        order_months = [row[0] for row in conn.execute(
+            'SELECT DISTINCT substr(create_time, 1, 7) FROM orders WHERE create_time < ?', (cutoff,))]
+        event_months = [row[0] for row in conn.execute(
+            'SELECT DISTINCT substr(timestamp, 1, 7) FROM events WHERE timestamp < ?', (cutoff,))]
+
+        counts = {'orders': 0, 'events': 0}
+        for month in sorted(set(order_months) | set(event_months)):
+            if not month or len(month) != 7:
+                continue
+            start, end = self._month_range(month)
+            conn.execute('ATTACH DATABASE ? AS archive', (str(self.partition_path(month)),))
+            try:
+                conn.execute(orders_table_sql.format(schema='archive.'))
+                conn.execute(events_table_sql.format(schema='archive.'))
+                conn.execute('CREATE INDEX IF NOT EXISTS archive.idx_orders_create_time ON orders(create_time)')
+                conn.commit()
+                # 旧分区可能缺少后来新增的列，只复制两边都有的列
+                archive_columns = {
+                    table: {col[1] for col in conn.execute(f'PRAGMA archive.table_info({table})')}
+                    for table in ('orders', 'events')
+                }
+                # 立即获取写锁，保证读取的变更序号之后只有本事务产生的墓碑
+                conn.execute('BEGIN IMMEDIATE')
+                seq_before = conn.execute('SELECT seq FROM main.order_change_seq WHERE id = 1').fetchone()[0]
+                for table, columns, time_column, key in (
+                        ('orders', order_columns, 'create_time', 'orders'),
+                        ('events', event_columns, 'timestamp', 'events')):
+                    column_list = ', '.join(c for c in columns if c in archive_columns[table])
+                    where = f'{time_column} >= ? AND {time_column} < ? AND {time_column} < ?'
+                    conn.execute(
+                        f'INSERT OR REPLACE INTO archive.{table} ({column_list}) '
+                        f'SELECT {column_list} FROM main.{table} WHERE {where}',
+                        (start, end, cutoff))
+                    cursor = conn.execute(f'DELETE FROM main.{table} WHERE {where}', (start, end, cutoff))
+                    counts[key] += cursor.rowcount
+                conn.execute('DELETE FROM main.order_tombstones WHERE change_seq > ?', (seq_before,))
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+            finally:
+                conn.execute('DETACH DATABASE archive')
+        return counts
+
+    def query(self, sql: str, params: tuple, start_time: Optional[datetime] = None,
+              end_time: Optional[datetime] = None) -> List[Tuple[Dict[str, int], list]]:
+        """在与时间范围重叠的分区上以只读方式执行查询，返回每个分区的 (列名映射, 行列表)"""
+        results = []
+        for path in self.partitions(start_time, end_time):
+            conn = sqlite3.connect(f"{path.resolve().as_uri()}?mode=ro", uri=True)
+            try:
+                cursor = conn.execute(sql, params)
+                column_map = {d[0]: i for i, d in enumerate(cursor.description)}
+                results.append((column_map, cursor.fetchall()))
+            finally:
+                conn.close()
+        return results
+
+    def query_orders(self, start_iso: str, end_iso: str, start_time: datetime, end_time: datetime,
+                     columns: str = '*') -> List[Tuple[Dict[str, int], list]]:
+        """在重叠的分区中查询订单，返回每个分区的 (列名映射, 行列表)"""
+        return self.query(
+            f'SELECT {columns} FROM orders WHERE create_time >= ? AND create_time <= ?',
+            (start_iso, end_iso), start_time, end_time)
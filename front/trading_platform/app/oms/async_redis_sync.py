@@ -0,0 +1,65 @@
+import asyncio
+import inspect
+
+import redis.asyncio
+
+from app.oms.redis_sync import RedisSyncManager
+from app.oms.storage import DataStorage
+
+
+class AsyncRedisSyncManager(RedisSyncManager):
+    """在 asyncio 事件循环中运行的Redis同步管理器
+
+    同步逻辑与 RedisSyncManager 完全相同，Redis读写改用 redis.asyncio 客户端，
+    监控和同步作为两个协程在 run 中运行，不创建线程，可以与其他协程共用一个连接池。
+    数据库读写直接在事件循环中执行：每轮只处理变化的订单，耗时很短。
+    访问Redis的方法（见 redis_sync._redis_steps）在本类上返回协程，其余方法与 RedisSyncManager 相同。
+    """
+    def __init__(self, storage: DataStorage, redis_client: redis.asyncio.Redis,
+                 is_cloud: bool = False, **kwargs):
+        """
+        Args:
+            storage: DataStorage实例
+            redis_client: redis.asyncio 客户端，由调用方检查连接和关闭连接池
+            is_cloud: 是否为云端实例
+            **kwargs: 同 RedisSyncManager，连接参数不使用
+        """
+        super().__init__(storage, redis_client=redis_client, **kwargs)
+        self.is_cloud = is_cloud
+        # 两个协程都会推送，等待管道写入时会切换协程，用协程锁保证批次依次写入
+        self._send_lock = asyncio.Lock()
+
+    async def _run(self, steps):
+        """执行用 _redis_steps 包装的生成器：等待 yield 出的协程，把结果或异常送回生成器"""
+        result, error = None, None
+        while True:
+            try:
+                pending = steps.send(result) if error is None else steps.throw(error)
+            except StopIteration as stop:
+                return stop.value
+            result, error = pending, None
+            if inspect.isawaitable(pending):
+                try:
+                    result = await pending
+                except BaseException as e:
+                    # 取消任务时同样送回生成器，执行其中的 finally（如释放发送锁）
+                    error = e
+
+    def _sleep(self, seconds: float):
+        return asyncio.sleep(seconds)
+
+    async def run(self):
+        """运行监控和同步协程，直到被取消"""
+        print(f"已启动{'云端' if self.is_cloud else '本地'}订单同步")
+        self.running = True
+        try:
+            await asyncio.gather(self._monitor_local_changes(), self._sync_loop())
+        finally:
+            self.running = False
+
+    def start_sync(self, is_cloud: bool = False):
+        raise RuntimeError("AsyncRedisSyncManager 需在事件循环中运行 run()")
+
+    def stop_sync(self):
+        """取消 run 所在的任务即可停止"""
+        self.running = False
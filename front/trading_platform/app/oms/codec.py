@@ -0,0 +1,279 @@
+import json
+import math
+import os
+import sqlite3
+import struct
+import tempfile
+import time
+from dataclasses import asdict
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from app.oms.constant import Order, OrderSide, OrderStatus, OrderType, SecurityType
+
+try:
+    import msgpack
+except ImportError:  # msgpack为可选依赖
+    msgpack = None
+
+
+class EnumEncoder(json.JSONEncoder):
+    """处理枚举类型的JSON编码器"""
+    def default(self, obj):
+        # 处理所有枚举类型
+        if hasattr(obj, "value") and not isinstance(obj, type):
+            return obj.value
+        # 使用类型名称字符串来检查，避免变量覆盖问题
+        if isinstance(obj, np.floating):
+            return round(float(obj),3)
+        if isinstance(obj, np.integer):
+            return int(obj)
+        if obj.__class__.__name__ == 'datetime':
+            return obj.isoformat()
+        # 处理 NumPy 数值类型
+        if hasattr(obj, "dtype") and hasattr(obj, "item"):
+            return obj.item()  # 将 NumPy 数值转换为 Python 原生类型
+        # 处理 bytes 类型
+        if isinstance(obj, bytes):
+            try:
+                return obj.decode('utf-8')  # 尝试解码为 UTF-8 字符串
+            except UnicodeDecodeError:
+                # 如果解码失败，转换为十六进制字符串
+                return obj.hex()
+        return super().default(obj)
+
+
+# 事件表 codec 列保存的版本标记，旧数据该列为空或0，按JSON读取
+CODEC_JSON = 0
+CODEC_ORDER_STRUCT = 1
+CODEC_MSGPACK = 2
+
+
+def _plain_dict(data) -> Dict[str, Any]:
+    """dataclass转为字典并将顶层的 NumPy 数值转换为 Python 原生类型"""
+    data_dict = asdict(data)
+    # 转换 NumPy 类型
+    for key, value in data_dict.items():
+        if hasattr(value, "dtype") and hasattr(value, "item"):
+            data_dict[key] = value.item()
+    return data_dict
+
+
+class JsonEventCodec:
+    """原有的JSON文本格式"""
+    name = 'json'
+    tag = CODEC_JSON
+
+    def encode(self, data) -> str:
+        return json.dumps(_plain_dict(data), cls=EnumEncoder)
+
+    def decode(self, payload) -> Dict[str, Any]:
+        if isinstance(payload, bytes):
+            payload = payload.decode('utf-8')
+        return json.loads(payload)
+
+
+class OrderStructCodec:
+    """Order事件的定长二进制格式
+
+    定长头部依次为4个枚举编码、2个布尔值、5个浮点数（NaN表示None）以及7个字符串的字节长度
+    （-1表示None），之后是这些字符串的UTF-8内容。枚举字段不是对应枚举成员时编码记为
+    _RAW_ENUM，其值以长度前缀字符串追加在末尾。
+    无法按此格式表示的数据抛出 TypeError/ValueError，由调用方改用JSON格式。
+    解码结果与JSON格式解码得到的字典一致。
+    """
+    name = 'struct'
+    tag = CODEC_ORDER_STRUCT
+
+    _HEADER = struct.Struct('<BBBB??ddddd7i')
+    _STR_LEN = struct.Struct('<i')
+    _RAW_ENUM = 0xFF
+    _ENUMS = (
+        ('direction', OrderSide),
+        ('status', OrderStatus),
+        ('order_type', OrderType),
+        ('security_type', SecurityType),
+    )
+    _FLOATS = ('price', 'volume', 'filled_volume', 'traded_price', 'limit_price')
+    _STRINGS = ('order_id', 'symbol', 'create_time', 'trader_platform',
+                'strategy_name', 'execution_strategy', 'parent_id')
+    _CODES = {name: {member: i for i, member in enumerate(enum_cls)} for name, enum_cls in _ENUMS}
+    _ENUM_VALUES = [[member.value for member in enum_cls] for _, enum_cls in _ENUMS]
+
+    def encode(self, data) -> bytes:
+        if not isinstance(data, Order):
+            raise TypeError('OrderStructCodec only encodes Order')
+        codes = []
+        raw_enums = []
+        for name, _ in self._ENUMS:
+            value = getattr(data, name)
+            code = self._CODES[name].get(value)
+            if code is None:
+                if not isinstance(value, str):
+                    raise TypeError(f'{name} is not encodable: {value!r}')
+                code = self._RAW_ENUM
+                raw_enums.append(value)
+            codes.append(code)
+        for name in ('is_active', 'is_finished'):
+            if not isinstance(getattr(data, name), bool):
+                raise TypeError(f'{name} is not bool')
+        floats = [self._float(getattr(data, name)) for name in self._FLOATS]
+
+        create_time = data.create_time
+        if isinstance(create_time, datetime):
+            create_time = create_time.isoformat()
+        lengths = []
+        blobs = []
+        for name in self._STRINGS:
+            value = create_time if name == 'create_time' else getattr(data, name)
+            if value is None:
+                lengths.append(-1)
+                continue
+            if not isinstance(value, str):
+                raise TypeError(f'{name} is not a string: {value!r}')
+            raw = value.encode('utf-8')
+            lengths.append(len(raw))
+            blobs.append(raw)
+        for value in raw_enums:
+            raw = value.encode('utf-8')
+            blobs.append(self._STR_LEN.pack(len(raw)) + raw)
+        header = self._HEADER.pack(*codes, data.is_active, data.is_finished, *floats, *lengths)
+        return header + b''.join(blobs)
+
+    def decode(self, payload) -> Dict[str, Any]:
+        payload = bytes(payload)
+        h = self._HEADER.unpack_from(payload, 0)
+        pos = self._HEADER.size
+        strings = []
+        for length in h[11:18]:
+            if length < 0:
+                strings.append(None)
+            else:
+                strings.append(payload[pos:pos + length].decode('utf-8'))
+                pos += length
+        enums = []
+        for members, code in zip(self._ENUM_VALUES, h[:4]):
+            if code == self._RAW_ENUM:
+                length = self._STR_LEN.unpack_from(payload, pos)[0]
+                pos += self._STR_LEN.size
+                enums.append(payload[pos:pos + length].decode('utf-8'))
+                pos += length
+            else:
+                enums.append(members[code])
+        # NaN（不等于自身）表示None
+        price, volume, filled_volume, traded_price, limit_price = [
+            None if v != v else v for v in h[6:11]
+        ]
+        # 与 Order 字段顺序一致
+        return {
+            'order_id': strings[0],
+            'symbol': strings[1],
+            'direction': enums[0],
+            'price': price,
+            'volume': volume,
+            'status': enums[1],
+            'create_time': strings[2],
+            'filled_volume': filled_volume,
+            'trader_platform': strings[3],
+            'is_active': h[4],
+            'order_type': enums[2],
+            'is_finished': h[5],
+            'strategy_name': strings[4],
+            'traded_price': traded_price,
+            'execution_strategy': strings[5],
+            'security_type': enums[3],
+            'parent_id': strings[6],
+            'limit_price': limit_price,
+        }
+
+    @staticmethod
+    def _float(value) -> float:
+        if value is None:
+            return math.nan
+        if isinstance(value, (bool, str)) or not isinstance(value, (int, float, np.integer, np.floating)):
+            raise TypeError(f'not a number: {value!r}')
+        return float(value)
+
+
+class MsgpackEventCodec:
+    """msgpack格式，需要安装 msgpack"""
+    name = 'msgpack'
+    tag = CODEC_MSGPACK
+
+    _encoder = EnumEncoder()
+
+    def encode(self, data) -> bytes:
+        # 枚举、时间等类型按JSON格式的规则转换，解码结果与JSON格式一致
+        return msgpack.packb(_plain_dict(data), default=self._encoder.default, use_bin_type=True)
+
+    def decode(self, payload) -> Dict[str, Any]:
+        return msgpack.unpackb(payload, raw=False)
+
+
+CODECS = {codec.name: codec for codec in (JsonEventCodec(), OrderStructCodec())}
+if msgpack is not None:
+    CODECS[MsgpackEventCodec.name] = MsgpackEventCodec()
+CODECS_BY_TAG = {codec.tag: codec for codec in CODECS.values()}
+
+
+def get_codec(name: str):
+    """按名称获取编码器"""
+    if name not in CODECS:
+        raise ValueError(f"未知或不可用的事件编码格式: {name}，可选: {', '.join(CODECS)}")
+    return CODECS[name]
+
+
+def encode_event_data(codec, data) -> tuple:
+    """按指定格式编码，无法编码时退回JSON格式，返回 (版本标记, 数据)"""
+    if codec.tag != CODEC_JSON:
+        try:
+            return codec.tag, codec.encode(data)
+        except (TypeError, ValueError, struct.error, OverflowError):
+            pass
+    return CODEC_JSON, CODECS['json'].encode(data)
+
+
+def decode_event_data(tag: Optional[int], payload) -> Dict[str, Any]:
+    """按版本标记解码事件数据，旧数据没有标记时按JSON解码"""
+    codec = CODECS_BY_TAG.get(tag or CODEC_JSON)
+    if codec is None:
+        raise ValueError(f"无法解码事件数据，编码格式 {tag} 不可用")
+    return codec.decode(payload)
+
+
+def benchmark(orders: List[Order]) -> List[dict]:
+    """对比各编码格式的编码、解码耗时和写入SQLite后的文件大小"""
+    results = []
+    for codec in CODECS.values():
+        start = time.perf_counter()
+        payloads = [codec.encode(order) for order in orders]
+        encode_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        for payload in payloads:
+            codec.decode(payload)
+        decode_time = time.perf_counter() - start
+
+        fd, path = tempfile.mkstemp(suffix='.db')
+        os.close(fd)
+        try:
+            conn = sqlite3.connect(path)
+            conn.execute('CREATE TABLE events (id INTEGER PRIMARY KEY, data TEXT)')
+            conn.executemany('INSERT INTO events (data) VALUES (?)', [(p,) for p in payloads])
+            conn.commit()
+            conn.execute('VACUUM')
+            conn.close()
+            db_size = os.path.getsize(path)
+        finally:
+            os.remove(path)
+
+        results.append({
+            'codec': codec.name,
+            'encode_us': encode_time / len(orders) * 1e6,
+            'decode_us': decode_time / len(orders) * 1e6,
+            'avg_bytes': sum(len(p.encode('utf-8') if isinstance(p, str) else p) for p in payloads) / len(orders),
+            'db_bytes': db_size,
+        })
+    return results
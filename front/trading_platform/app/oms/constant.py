@@ -1,8 +1,8 @@
 from enum import Enum
-from dataclasses import dataclass, field, fields
+from dataclasses import dataclass, field
 from datetime import datetime
-from typing import Any, Optional
-from copy import deepcopy
+from typing import Any, ClassVar, Optional
+from copy import copy, deepcopy
 
 
 class OrderStatus(Enum):
@@ -27,6 +27,7 @@ class SecurityType(Enum):
     """证券类型"""
     STOCK = "STOCK"  # 股票
     ETF = "ETF"      # ETF基金
+    BOND = "BOND"    # 可转债
 
 # 数据频率类型
 class FreqType(Enum):
@@ -65,44 +66,57 @@ class OrderStatus(Enum):
     CANCELLED = "已撤销"
     REJECTED = "拒单"
 
+def _copy_payload(data: Any) -> Any:
+    """复制事件数据，效果与deepcopy相同"""
+    if isinstance(data, Order):
+        # Order的字段都是不可变值，浅拷贝即可，且不会再次执行 __post_init__
+        return copy(data)
+    if data is None or isinstance(data, (str, int, float, bool, datetime, Enum)):
+        return data
+    return deepcopy(data)
+
+
 @dataclass
 class Event:
-    """事件对象"""
+    """事件对象
+
+    默认构造和clone时复制事件数据，各事件互不影响。
+    share_payloads 为True时事件数据视为不可变快照，构造和clone都直接共享，
+    需要修改时调用 mutable_data() 取得本事件私有的副本（写时复制）。
+    共享模式下订阅者不能直接修改 event.data（对方会看到修改），必须先调用 mutable_data()；
+    需要强制只读时事件数据使用冻结的 OrderRecord（见 app.oms.order_record）。
+    """
     type: EventType  # 事件类型
     data: Any  # 事件数据
     timestamp: datetime = field(default_factory=datetime.now)
 
+    # 共享事件数据模式，进程内统一设置
+    share_payloads: ClassVar[bool] = False
+
     def __post_init__(self):
         """初始化后的类型检查"""
-        self.data = deepcopy(self.data)
+        self._owns_data = not Event.share_payloads
+        if self._owns_data:
+            self.data = _copy_payload(self.data)
 
     def clone(self) -> 'Event':
-        """创建事件的深拷贝"""
-        # return Event(
-        #     type=self.type,
-        #     data=deepcopy(self.data),
-        #     timestamp=self.timestamp
-        # )
-        """使用fields方法创建对象副本"""
-        new_event = Event(type=self.type, data=None, timestamp=self.timestamp)
-        
-        if isinstance(self.data, Order):
-            new_order = Order(
-                order_id=None,
-                symbol="",
-                direction=OrderSide.BUY,
-                price=0,
-                volume=0,
-                status=OrderStatus.SUBMITTING,
-                create_time=datetime.now()
-            )
-            for field in fields(self.data):
-                setattr(new_order, field.name, getattr(self.data, field.name))
-            new_event.data = new_order
-        else:
-            new_event.data = deepcopy(self.data)  # 对于非Order对象，仍使用deepcopy
-            
+        """复制事件，共享模式下与原事件共享数据"""
+        new_event = Event.__new__(Event)
+        new_event.type = self.type
+        new_event.timestamp = self.timestamp
+        new_event._owns_data = not Event.share_payloads
+        new_event.data = _copy_payload(self.data) if new_event._owns_data else self.data
         return new_event
+
+    def mutable_data(self) -> Any:
+        """返回可以修改的事件数据，数据与其他事件共享时先复制一份"""
+        if getattr(self.data, 'frozen', False):
+            # 冻结的 OrderRecord 复制后仍不可修改，换成可修改的副本
+            self.data = self.data.replace(frozen=False)
+        elif not self._owns_data:
+            self.data = _copy_payload(self.data)
+        self._owns_data = True
+        return self.data
     
 @dataclass
 class Order:
@@ -154,8 +168,8 @@ class DictToClass:
     def __init__(self, data):
         for key, value in data.items():
             setattr(self, key, value)
-def get_security_type(symbol: str) -> SecurityType:
-    """根据证券代码判断证券类型
+def infer_security_type(symbol: str) -> SecurityType:
+    """根据证券代码规则判断证券类型
     
     Args:
         symbol: str, 证券代码
@@ -169,4 +183,23 @@ def get_security_type(symbol: str) -> SecurityType:
     etf_prefixes = ('510', '511', '512', '513', '518', '159')
     if symbol.startswith(etf_prefixes):
         return SecurityType.ETF
-    return SecurityType.STOCK 
\ No newline at end of file
+    # 可转债代码规则：
+    # 上交所：110xxx, 111xxx, 113xxx, 118xxx
+    # 深交所：123xxx, 127xxx, 128xxx
+    bond_prefixes = ('110', '111', '113', '118', '123', '127', '128')
+    if symbol.startswith(bond_prefixes):
+        return SecurityType.BOND
+    return SecurityType.STOCK
+
+
+_symbol_registry = None
+
+
+def get_security_type(symbol: str) -> SecurityType:
+    """查询证券类型，优先使用证券信息表（app.oms.symbols），没有记录时按代码规则判断"""
+    global _symbol_registry
+    if _symbol_registry is None:
+        # 延迟导入，避免循环导入
+        from app.oms.symbols import symbol_registry
+        _symbol_registry = symbol_registry
+    return _symbol_registry.security_type(symbol)
@@ -0,0 +1,178 @@
+import queue
+import threading
+import time
+import traceback
+from typing import Optional
+
+from app.oms.constant import Event
+
+
+class AsyncEventWriter:
+    """异步事件写入器
+
+    调用方只把事件放入有界队列，由单个后台线程批量写入数据库：
+    攒够 batch_size 条或距离本批第一条事件超过 flush_interval 秒即提交一次。
+    队列满时 submit 最多阻塞 block_timeout 秒，仍然放不进去则丢弃并计数。
+    写入线程未启动或已停止时，submit 直接在调用方线程同步写入。
+    """
+    def __init__(self,
+                 storage,
+                 batch_size: int = 200,
+                 flush_interval: float = 0.05,
+                 max_queue: int = 10000,
+                 block_timeout: float = 1.0):
+        """
+        Args:
+            storage: DataStorage实例，使用其 save_events 批量写入
+            batch_size: 每批最多写入的事件数
+            flush_interval: 一批事件最长等待时间（秒）
+            max_queue: 队列容量
+            block_timeout: 队列满时submit的最长阻塞时间（秒），为0时直接丢弃
+        """
+        self.storage = storage
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.block_timeout = block_timeout
+        self._queue: "queue.Queue" = queue.Queue(maxsize=max_queue)
+        self._running = False
+        self._thread: Optional[threading.Thread] = None
+        # 已提交但尚未写入的事件数，供flush等待
+        self._pending = 0
+        self._pending_cond = threading.Condition()
+        self._stats_lock = threading.Lock()
+        self._submitted = 0
+        self._written = 0
+        self._failed = 0
+        self._dropped = 0
+        self._batches = 0
+        self._latency_total = 0.0
+        self._latency_max = 0.0
+
+    def start(self):
+        """启动写入线程"""
+        if self._thread and self._thread.is_alive():
+            return
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name='event-writer', daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: Optional[float] = None):
+        """不再接收新事件，写完队列中剩余的事件后停止写入线程"""
+        with self._pending_cond:
+            self._running = False
+        self.flush(timeout)
+        if self._thread:
+            self._thread.join(timeout)
+
+    def submit(self, event: Event) -> bool:
+        """提交事件，返回是否成功放入队列（写入线程未运行时为是否同步写入成功）"""
+        with self._pending_cond:
+            # 与 stop 互斥：计入 _pending 的事件一定由写入线程写完，flush 不会一直等待
+            running = self._running
+            if running:
+                self._pending += 1
+        if not running:
+            return self._write_now(event)
+        try:
+            if self.block_timeout > 0:
+                self._queue.put((time.monotonic(), event), timeout=self.block_timeout)
+            else:
+                self._queue.put_nowait((time.monotonic(), event))
+        except queue.Full:
+            self._done(1)
+            with self._stats_lock:
+                self._dropped += 1
+            return False
+        with self._stats_lock:
+            self._submitted += 1
+        return True
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """等待已提交的事件全部写入，超时返回False"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._pending_cond:
+            while self._pending > 0:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._pending_cond.wait(remaining)
+        return True
+
+    def stats(self) -> dict:
+        """写入统计：提交、写入、失败、丢弃数量，批次数和排队到提交的延迟（毫秒）"""
+        with self._stats_lock:
+            processed = self._written + self._failed
+            return {
+                'submitted': self._submitted,
+                'written': self._written,
+                'failed': self._failed,
+                'dropped': self._dropped,
+                'batches': self._batches,
+                'queue_size': self._queue.qsize(),
+                'avg_latency_ms': self._latency_total / processed * 1000 if processed else 0.0,
+                'max_latency_ms': self._latency_max * 1000,
+            }
+
+    def _write_now(self, event: Event) -> bool:
+        """在调用方线程同步写入一个事件"""
+        try:
+            failures = self.storage.save_events([event])
+        except Exception as e:
+            print(f"[ERROR] 写入事件失败: {e}")
+            traceback.print_exc()
+            failures = [(None, str(e))]
+        with self._stats_lock:
+            self._submitted += 1
+            if failures:
+                self._failed += 1
+            else:
+                self._written += 1
+        return not failures
+
+    def _done(self, count: int):
+        with self._pending_cond:
+            self._pending -= count
+            if self._pending <= 0:
+                self._pending_cond.notify_all()
+
+    def _next_batch(self) -> list:
+        """阻塞等待第一条事件，然后在flush_interval内尽量凑满一批"""
+        try:
+            batch = [self._queue.get(timeout=0.5)]
+        except queue.Empty:
+            return []
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                if remaining <= 0:
+                    batch.append(self._queue.get_nowait())
+                else:
+                    batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        # 停止后继续写到已提交的事件全部处理完，包括 stop 之前正在放入队列的事件
+        while self._running or self._pending > 0:
+            batch = self._next_batch()
+            if not batch:
+                continue
+            try:
+                failures = self.storage.save_events([event for _, event in batch])
+            except Exception as e:
+                print(f"[ERROR] 批量写入事件失败: {e}")
+                traceback.print_exc()
+                failures = [(None, str(e))]
+            now = time.monotonic()
+            # save_events 整批失败时返回 [(None, 错误信息)]
+            failed = len(batch) if any(i is None for i, _ in failures) else len(failures)
+            latencies = [now - enqueued for enqueued, _ in batch]
+            with self._stats_lock:
+                self._batches += 1
+                self._written += len(batch) - failed
+                self._failed += failed
+                self._latency_total += sum(latencies)
+                self._latency_max = max(self._latency_max, max(latencies))
+            self._done(len(batch))
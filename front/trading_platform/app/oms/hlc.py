@@ -0,0 +1,40 @@
+import threading
+import time
+
+
+class HybridLogicalClock:
+    """混合逻辑时钟
+
+    时间戳为 (毫秒时间 << 16) | 逻辑计数 的整数，可直接比较大小。同一进程内严格递增；
+    收到其他节点的时间戳后调用 update，之后生成的时间戳总是大于它，
+    因此“看到对方的修改后再做的修改”即使两端时钟有偏差也排在后面。
+    """
+    LOGICAL_BITS = 16
+
+    def __init__(self):
+        self._last = 0
+        self._lock = threading.Lock()
+
+    def _physical(self) -> int:
+        return int(time.time() * 1000) << self.LOGICAL_BITS
+
+    def now(self) -> int:
+        """生成本地事件的时间戳"""
+        with self._lock:
+            self._last = max(self._last + 1, self._physical())
+            return self._last
+
+    def update(self, remote: int) -> int:
+        """合并收到的时间戳，返回合并后的本地时间戳"""
+        with self._lock:
+            self._last = max(self._last + 1, self._physical(), remote + 1)
+            return self._last
+
+    @classmethod
+    def physical_ms(cls, timestamp: int) -> int:
+        """时间戳中的毫秒时间"""
+        return timestamp >> cls.LOGICAL_BITS
+
+
+# 进程内共享的时钟
+clock = HybridLogicalClock()
@@ -0,0 +1,50 @@
+import sqlite3
+from typing import Callable, List, Sequence, Tuple
+
+# (版本号, 说明, 执行函数)，执行函数接收游标，版本号从1开始递增
+MigrationStep = Tuple[int, str, Callable[[sqlite3.Cursor], None]]
+
+
+def schema_version(conn: sqlite3.Connection) -> int:
+    """数据库当前的结构版本，保存在 PRAGMA user_version 中，新库为0"""
+    return conn.execute('PRAGMA user_version').fetchone()[0]
+
+
+def pending_migrations(conn: sqlite3.Connection, steps: Sequence[MigrationStep]) -> List[MigrationStep]:
+    """尚未执行的迁移步骤"""
+    current = schema_version(conn)
+    return [step for step in steps if step[0] > current]
+
+
+def run_migrations(conn: sqlite3.Connection, steps: Sequence[MigrationStep]) -> List[int]:
+    """在一个事务中执行所有未执行的迁移步骤并更新 user_version
+
+    结构已是最新时只读取一次 user_version。执行前获取写锁并重新读取版本，
+    多个进程同时启动时只有一个会执行迁移；任一步骤失败则整体回滚并抛出异常。
+
+    Returns:
+        List[int]: 本次执行的版本号
+    """
+    latest = max(step[0] for step in steps)
+    if schema_version(conn) >= latest:
+        return []
+    if conn.in_transaction:
+        conn.commit()
+    conn.execute('BEGIN IMMEDIATE')
+    try:
+        current = schema_version(conn)
+        cursor = conn.cursor()
+        applied = []
+        for version, _, func in sorted(steps, key=lambda step: step[0]):
+            if version <= current:
+                continue
+            func(cursor)
+            applied.append(version)
+        if applied:
+            # PRAGMA 不支持参数绑定，版本号为整数
+            cursor.execute(f'PRAGMA user_version = {int(applied[-1])}')
+        conn.commit()
+        return applied
+    except Exception:
+        conn.rollback()
+        raise
@@ -0,0 +1,162 @@
+import threading
+from dataclasses import dataclass
+from datetime import date
+from typing import Dict, List, Optional
+
+from app.oms.constant import Order, OrderStatus
+
+# 允许的状态转换，状态不变的更新总是允许（如部分成交后继续成交）
+STATUS_TRANSITIONS = {
+    OrderStatus.SUBMITTING: {OrderStatus.SUBMITTED, OrderStatus.PARTIAL_FILLED, OrderStatus.FILLED,
+                             OrderStatus.CANCELLED, OrderStatus.REJECTED},
+    OrderStatus.SUBMITTED: {OrderStatus.PARTIAL_FILLED, OrderStatus.FILLED,
+                            OrderStatus.CANCELLED, OrderStatus.REJECTED},
+    OrderStatus.PARTIAL_FILLED: {OrderStatus.FILLED, OrderStatus.CANCELLED},
+    OrderStatus.FILLED: set(),
+    OrderStatus.CANCELLED: set(),
+    OrderStatus.REJECTED: set(),
+}
+
+
+@dataclass
+class ParentSummary:
+    """母单汇总，随子单更新增量维护"""
+    parent_id: str
+    child_count: int = 0
+    active_count: int = 0
+    volume: float = 0
+    filled_volume: float = 0
+    # 有成交价的子单的成交量和成交额，用于计算成交均价
+    priced_volume: float = 0
+    notional: float = 0
+
+    @property
+    def vwap(self) -> Optional[float]:
+        return self.notional / self.priced_volume if self.priced_volume else None
+
+    def _add(self, order: Order, sign: int):
+        filled = order.filled_volume or 0
+        self.child_count += sign
+        self.active_count += sign if order.is_active else 0
+        self.volume += sign * (order.volume or 0)
+        self.filled_volume += sign * filled
+        if order.traded_price is not None and filled:
+            self.priced_volume += sign * filled
+            self.notional += sign * filled * order.traded_price
+
+
+class OrderBook:
+    """当天订单的内存视图，维护母单到子单的映射和母单汇总
+
+    订单簿是数据库的只读视图，由 DataStorage.get_order_book 按 changes_since 追上数据库。
+    订单更新按 STATUS_TRANSITIONS 校验：已结束的订单不能回到其他状态，
+    同一状态下成交量不能减少。数据库中的记录已经写入，不合法的更新仍然应用，
+    只计入 anomalies 并打印警告，保证订单簿与数据库一致。
+    """
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._orders: Dict[str, Order] = {}
+        self._children: Dict[str, Dict[str, Order]] = {}
+        self._summaries: Dict[str, ParentSummary] = {}
+        self.day: Optional[date] = None
+        self.anomalies = 0
+
+    def load(self, day: date, orders: List[Order]):
+        """用某一天的订单重建，不做状态校验"""
+        with self._lock:
+            self.day = day
+            self._orders.clear()
+            self._children.clear()
+            self._summaries.clear()
+            for order in orders:
+                if order.order_id is not None:
+                    self._set(order)
+
+    @staticmethod
+    def _status(order: Order) -> Optional[OrderStatus]:
+        status = order.status
+        if isinstance(status, OrderStatus):
+            return status
+        try:
+            return OrderStatus(status)
+        except ValueError:
+            return None
+
+    def is_valid_update(self, old: Order, new: Order) -> bool:
+        """新状态相对旧状态是否合法"""
+        old_status, new_status = self._status(old), self._status(new)
+        if new_status is None:
+            return False
+        if old_status is None or new_status in STATUS_TRANSITIONS[old_status]:
+            return True
+        return new_status == old_status and (new.filled_volume or 0) >= (old.filled_volume or 0)
+
+    def apply(self, order: Order) -> bool:
+        """应用一条订单更新，返回状态转换是否合法，非订单簿当天的订单忽略"""
+        if order.order_id is None:
+            return False
+        # 与SQL一致按ISO字符串前缀判断日期
+        if self.day is not None and order.create_time.isoformat()[:10] != self.day.isoformat():
+            return False
+        with self._lock:
+            old = self._orders.get(order.order_id)
+            valid = old is None or self.is_valid_update(old, order)
+            if not valid:
+                self.anomalies += 1
+                print(f"[WARNING] 订单 {order.order_id} 的状态更新不合法，按数据库记录更新: "
+                      f"{getattr(old.status, 'value', old.status)} -> {getattr(order.status, 'value', order.status)}")
+            self._set(order)
+            return valid
+
+    def remove(self, order_id: str):
+        with self._lock:
+            old = self._orders.pop(order_id, None)
+            if old is not None:
+                self._unlink(old)
+
+    def _set(self, order: Order):
+        old = self._orders.get(order.order_id)
+        if old is not None:
+            self._unlink(old)
+        self._orders[order.order_id] = order
+        if order.parent_id:
+            self._children.setdefault(order.parent_id, {})[order.order_id] = order
+            summary = self._summaries.get(order.parent_id)
+            if summary is None:
+                summary = self._summaries[order.parent_id] = ParentSummary(order.parent_id)
+            summary._add(order, 1)
+
+    def _unlink(self, order: Order):
+        if not order.parent_id:
+            return
+        children = self._children.get(order.parent_id)
+        if children is not None:
+            children.pop(order.order_id, None)
+            if not children:
+                del self._children[order.parent_id]
+        summary = self._summaries.get(order.parent_id)
+        if summary is not None:
+            summary._add(order, -1)
+            if summary.child_count <= 0:
+                del self._summaries[order.parent_id]
+
+    def get(self, order_id: str) -> Optional[Order]:
+        return self._orders.get(order_id)
+
+    def children(self, parent_id: str) -> List[Order]:
+        with self._lock:
+            return list(self._children.get(parent_id, {}).values())
+
+    def summary(self, parent_id: str) -> Optional[ParentSummary]:
+        return self._summaries.get(parent_id)
+
+    def summaries(self) -> Dict[str, ParentSummary]:
+        with self._lock:
+            return dict(self._summaries)
+
+    def best_fill(self, parent_id: str) -> Optional[Order]:
+        """母单下成交量最大的子单"""
+        children = self.children(parent_id)
+        if not children:
+            return None
+        return max(children, key=lambda o: o.filled_volume or 0)
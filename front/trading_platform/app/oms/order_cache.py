@@ -0,0 +1,103 @@
+import threading
+from datetime import date
+from typing import Dict, List, Optional, Set
+
+from app.oms.constant import Order, OrderStatus
+
+
+class OrderCache:
+    """当天订单的内存缓存，由DataStorage写穿更新
+
+    缓存以order_id为键，并按parent_id、strategy_name建立索引。
+    订单写入和缓存校验都通过同一个专用连接完成，该连接的 PRAGMA data_version
+    只在其他连接（包括其他进程）提交后变化，此时整天数据重新加载。
+    返回的Order对象在调用方之间共享，只能读取，不能修改。
+    """
+    def __init__(self):
+        # 加载、写穿和读取都需持有该锁，避免重新加载覆盖掉刚写入的数据或读到加载了一半的缓存
+        self.lock = threading.RLock()
+        self.day: Optional[date] = None
+        self._orders: Dict[str, Order] = {}
+        self._anonymous: List[Order] = []  # order_id为空的订单无法作为键
+        self._by_parent: Dict[str, Set[str]] = {}
+        self._by_strategy: Dict[str, Set[str]] = {}
+        self._version: Optional[int] = None
+
+    def is_fresh(self, day: date, version: int) -> bool:
+        """缓存是否为当天且data_version未变化"""
+        return self.day == day and self._version == version
+
+    def load(self, day: date, orders: List[Order], version: int):
+        """用数据库中的当天订单重建缓存"""
+        self.clear()
+        self.day = day
+        for order in orders:
+            self._add(order)
+        self._version = version
+
+    def clear(self):
+        """清空缓存，下次读取时重新加载"""
+        self.day = None
+        self._orders.clear()
+        self._anonymous.clear()
+        self._by_parent.clear()
+        self._by_strategy.clear()
+        self._version = None
+
+    def put(self, order: Order):
+        """写穿：保存成功后的订单写入缓存，非当天订单忽略
+
+        传入的订单应由写入数据库的行重新构造，不与调用方共享
+        """
+        # 与SQL一致按ISO字符串前缀判断日期
+        if self.day is None or order.create_time.isoformat()[:10] != self.day.isoformat():
+            return
+        if order.order_id is None:
+            # 无法判断是否为已缓存的同一订单，清空缓存，下次读取时按数据库重新加载
+            self.clear()
+            return
+        self._add(order)
+
+    def _add(self, order: Order):
+        if order.order_id is None:
+            self._anonymous.append(order)
+            return
+        order_id = order.order_id
+        old = self._orders.get(order_id)
+        if old is not None:
+            self._unindex(old)
+        self._orders[order_id] = order
+        if order.parent_id:
+            self._by_parent.setdefault(order.parent_id, set()).add(order_id)
+        if order.strategy_name:
+            self._by_strategy.setdefault(order.strategy_name, set()).add(order_id)
+
+    def _unindex(self, order: Order):
+        for index, key in ((self._by_parent, order.parent_id), (self._by_strategy, order.strategy_name)):
+            ids = index.get(key)
+            if ids:
+                ids.discard(order.order_id)
+                if not ids:
+                    del index[key]
+
+    def get(self, order_id: str) -> Optional[Order]:
+        return self._orders.get(order_id)
+
+    def active_orders(self) -> List[Order]:
+        """与 get_active_orders 的查询条件一致，按创建时间降序"""
+        orders = [
+            o for o in list(self._orders.values()) + self._anonymous
+            if o.is_active or o.is_finished or o.status == OrderStatus.CANCELLED
+        ]
+        # 与SQL一致按ISO字符串排序，避免带时区和不带时区的时间无法比较
+        orders.sort(key=lambda o: o.create_time.isoformat(), reverse=True)
+        return orders
+
+    def by_parent(self, parent_id: str) -> List[Order]:
+        return [self._orders[i] for i in self._by_parent.get(parent_id, ())]
+
+    def by_strategy(self, strategy_name: str) -> List[Order]:
+        return [self._orders[i] for i in self._by_strategy.get(strategy_name, ())]
+
+    def group_by_parent(self) -> Dict[str, List[Order]]:
+        return {parent_id: self.by_parent(parent_id) for parent_id in self._by_parent}
@@ -0,0 +1,151 @@
+from datetime import datetime
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from app.oms.constant import Order, OrderSide, OrderStatus, OrderType
+
+# 分类列的取值表，编码即在表中的下标，无法识别的值编码为-1
+DIRECTIONS = list(OrderSide)
+STATUSES = list(OrderStatus)
+ORDER_TYPES = list(OrderType)
+
+# 按列读取时查询的列，顺序即结果中的列顺序
+FRAME_COLUMNS = (
+    'order_id', 'symbol', 'direction', 'price', 'volume', 'status', 'create_time',
+    'filled_volume', 'trader_platform', 'is_active', 'order_type', 'is_finished',
+    'strategy_name', 'traded_price', 'execution_strategy', 'parent_id',
+)
+_FLOAT_COLUMNS = ('price', 'volume', 'filled_volume', 'traded_price')
+_BOOL_COLUMNS = ('is_active', 'is_finished')
+_TEXT_COLUMNS = ('order_id', 'symbol', 'trader_platform', 'strategy_name', 'execution_strategy', 'parent_id')
+_CATEGORY_COLUMNS = (
+    ('direction', DIRECTIONS),
+    ('status', STATUSES),
+    ('order_type', ORDER_TYPES),
+)
+
+
+def _encode_categories(values: np.ndarray, members: list) -> np.ndarray:
+    """按取值表把字符串列编码为int8，只对去重后的取值做映射"""
+    codes_by_value = {member.value: i for i, member in enumerate(members)}
+    # None 无法与字符串一起排序去重，先换成空串
+    values = np.where(values == None, '', values).astype(str)  # noqa: E711
+    uniques, inverse = np.unique(values, return_inverse=True)
+    mapping = np.array([codes_by_value.get(v, -1) for v in uniques], dtype=np.int8)
+    return mapping[inverse] if len(values) else np.empty(0, dtype=np.int8)
+
+
+def _parse_times(values: np.ndarray) -> np.ndarray:
+    """ISO时间字符串列转为datetime64[us]，带时区的时间按其本地时间保存，与 get_order_history 一致"""
+    texts = np.where(values == None, 'NaT', values).astype(str)  # noqa: E711
+    # numpy 会把 +08:00 等带时区的时间换算为UTC（只给出警告），先去掉时区
+    aware = (np.char.find(texts, '+', 19) >= 0) | (np.char.find(texts, '-', 19) >= 0)
+    if aware.any():
+        texts = texts.astype(object)
+        texts[aware] = [datetime.fromisoformat(v).replace(tzinfo=None).isoformat() for v in texts[aware]]
+    try:
+        return texts.astype('datetime64[us]')
+    except ValueError:
+        return np.array([
+            datetime.fromisoformat(v).replace(tzinfo=None) if v != 'NaT' else None for v in texts
+        ], dtype='datetime64[us]')
+
+
+class OrderFrame:
+    """按列存放的订单查询结果
+
+    数值列为float64/bool数组，create_time为datetime64[us]，direction/status/order_type
+    为int8编码（对应 DIRECTIONS/STATUSES/ORDER_TYPES 的下标），其余为object数组。
+    需要Order对象时通过下标或 orders() 按需构造，与 get_order_history 的结果一致。
+    """
+    def __init__(self, columns: Dict[str, np.ndarray], rows: list, column_map: Dict[str, int]):
+        self.columns = columns
+        self._rows = rows
+        self._column_map = column_map
+        self._orders: List[Optional[Order]] = [None] * len(rows)
+
+    @classmethod
+    def from_rows(cls, rows: list, column_map: Dict[str, int]) -> 'OrderFrame':
+        """由查询结果构造，rows中的列须与column_map一致"""
+        if rows:
+            data = np.array(rows, dtype=object)
+        else:
+            data = np.empty((0, len(column_map)), dtype=object)
+        columns = {}
+        for name in _TEXT_COLUMNS:
+            columns[name] = data[:, column_map[name]]
+        for name in _FLOAT_COLUMNS:
+            # NULL 转为 NaN
+            columns[name] = data[:, column_map[name]].astype(float)
+        for name in _BOOL_COLUMNS:
+            values = data[:, column_map[name]]
+            columns[name] = np.where(values == None, False, values).astype(bool)  # noqa: E711
+        for name, members in _CATEGORY_COLUMNS:
+            columns[name] = _encode_categories(data[:, column_map[name]], members)
+        columns['create_time'] = _parse_times(data[:, column_map['create_time']])
+        return cls(columns, rows, column_map)
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def __getitem__(self, index: int) -> Order:
+        """按下标构造Order，构造后缓存"""
+        order = self._orders[index]
+        if order is None:
+            # 避免循环导入
+            from app.oms.storage import trans_order_to_dict
+            order = trans_order_to_dict(self._rows[index], self._column_map)
+            self._orders[index] = order
+        return order
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    def orders(self) -> List[Order]:
+        """构造全部Order对象"""
+        return list(self)
+
+    def take(self, indices) -> 'OrderFrame':
+        """按下标数组或布尔掩码选取行，返回新的OrderFrame"""
+        indices = np.asarray(indices)
+        if indices.dtype == bool:
+            indices = np.flatnonzero(indices)
+        frame = OrderFrame(
+            {name: values[indices] for name, values in self.columns.items()},
+            [self._rows[i] for i in indices],
+            self._column_map,
+        )
+        frame._orders = [self._orders[i] for i in indices]
+        return frame
+
+    @staticmethod
+    def concat(frames: List['OrderFrame']) -> 'OrderFrame':
+        """合并列顺序相同的多个OrderFrame"""
+        frames = [f for f in frames if len(f)] or frames[:1]
+        first = frames[0]
+        if len(frames) == 1:
+            return first
+        frame = OrderFrame(
+            {name: np.concatenate([f.columns[name] for f in frames]) for name in first.columns},
+            [row for f in frames for row in f._rows],
+            first._column_map,
+        )
+        frame._orders = [order for f in frames for order in f._orders]
+        return frame
+
+    def status_mask(self, *statuses: OrderStatus) -> np.ndarray:
+        """状态属于给定取值的布尔掩码"""
+        codes = [STATUSES.index(status) for status in statuses]
+        return np.isin(self.columns['status'], codes)
+
+    def sort_by_time(self, descending: bool = True) -> 'OrderFrame':
+        """按创建时间排序，NaT排在最后"""
+        times = self.columns['create_time']
+        order = np.argsort(times, kind='stable')
+        if descending:
+            # NaT 在升序中排在最后，降序时保持在最后
+            valid = order[~np.isnat(times[order])]
+            order = np.concatenate([valid[::-1], order[len(valid):]])
+        return self.take(order)
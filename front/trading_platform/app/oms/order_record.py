@@ -0,0 +1,192 @@
+import time
+import tracemalloc
+from dataclasses import fields
+from datetime import datetime
+from typing import Any, Dict, List
+
+from app.oms.constant import (Event, EventType, Order, OrderSide, OrderStatus, OrderType,
+                              get_security_type)
+
+# 与 Order 字段顺序一致
+ORDER_FIELDS = tuple(f.name for f in fields(Order))
+
+
+class OrderRecord:
+    """使用 __slots__ 的轻量订单记录，字段与 Order 相同
+
+    security_type 由证券信息表查询（见 app.oms.symbols）。frozen=True 时返回 FrozenOrderRecord，不可修改，
+    clone、copy、deepcopy 直接返回自身，可在多个事件和订阅者之间共享；
+    需要修改时用 replace 生成新记录。
+    """
+    __slots__ = ORDER_FIELDS
+
+    def __init__(self, order_id, symbol, direction, price, volume, status, create_time,
+                 filled_volume=0, trader_platform="", is_active=True, order_type=OrderType.MARKET,
+                 is_finished=False, strategy_name="", traded_price=None, execution_strategy=None,
+                 security_type=None, parent_id=None, limit_price=None, frozen: bool = False):
+        self.order_id = order_id
+        self.symbol = symbol
+        self.direction = direction
+        self.price = price
+        self.volume = volume
+        self.status = status
+        self.create_time = create_time
+        self.filled_volume = filled_volume
+        self.trader_platform = trader_platform
+        self.is_active = is_active
+        self.order_type = order_type
+        self.is_finished = is_finished
+        self.strategy_name = strategy_name
+        self.traded_price = traded_price
+        self.execution_strategy = execution_strategy
+        # 与 Order.__post_init__ 一致，证券类型总是由代码决定
+        self.security_type = get_security_type(symbol)
+        self.parent_id = parent_id
+        self.limit_price = limit_price
+        if frozen:
+            # 两个类的内存布局相同，赋值完成后切换类型即可冻结，构造时不做逐字段检查
+            self.__class__ = FrozenOrderRecord
+
+    frozen = False
+
+    def __eq__(self, other):
+        if not isinstance(other, (OrderRecord, Order)):
+            return NotImplemented
+        return all(getattr(self, name) == getattr(other, name) for name in ORDER_FIELDS)
+
+    __hash__ = None
+
+    def __repr__(self):
+        values = ', '.join(f"{name}={getattr(self, name)!r}" for name in ORDER_FIELDS)
+        return f"{type(self).__name__}({values})"
+
+    def __reduce__(self):
+        return _restore, (self.as_dict(), self.frozen)
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {name: getattr(self, name) for name in ORDER_FIELDS}
+
+    def replace(self, frozen: bool = None, **changes) -> 'OrderRecord':
+        """复制并修改部分字段，默认保持原记录的冻结状态"""
+        values = self.as_dict()
+        values.update(changes)
+        return OrderRecord(**values, frozen=self.frozen if frozen is None else frozen)
+
+    def clone(self) -> 'OrderRecord':
+        """冻结的记录直接共享，否则复制一份"""
+        return self.replace()
+
+    def freeze(self) -> 'OrderRecord':
+        """返回冻结的记录，已冻结时返回自身"""
+        return self.replace(frozen=True)
+
+    def __copy__(self):
+        return self.clone()
+
+    def __deepcopy__(self, memo):
+        # 字段都是不可变值（字符串、数值、枚举、datetime），浅复制即可
+        return self.clone()
+
+    @classmethod
+    def from_order(cls, order: Order, frozen: bool = False) -> 'OrderRecord':
+        return OrderRecord(*(getattr(order, name) for name in ORDER_FIELDS), frozen=frozen)
+
+    def to_order(self) -> Order:
+        return Order(**self.as_dict())
+
+
+class FrozenOrderRecord(OrderRecord):
+    """不可修改的订单记录，由 OrderRecord(..., frozen=True) 构造"""
+    __slots__ = ()
+
+    frozen = True
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f"OrderRecord 已冻结，不能修改 {name}，请使用 replace()")
+
+    def __delattr__(self, name):
+        raise AttributeError(f"OrderRecord 已冻结，不能删除 {name}")
+
+    def __hash__(self):
+        return hash(tuple(getattr(self, name) for name in ORDER_FIELDS))
+
+    def clone(self) -> 'OrderRecord':
+        return self
+
+    def freeze(self) -> 'OrderRecord':
+        return self
+
+
+def _restore(values: Dict[str, Any], frozen: bool) -> OrderRecord:
+    """pickle 还原"""
+    return OrderRecord(**values, frozen=frozen)
+
+
+def clone_event(event: Event) -> Event:
+    """复制事件：数据为冻结的OrderRecord时共享数据，否则与 Event.clone 相同"""
+    if isinstance(event.data, OrderRecord) and event.data.frozen:
+        new_event = Event.__new__(Event)
+        new_event.type = event.type
+        new_event.data = event.data
+        new_event.timestamp = event.timestamp
+        new_event._owns_data = False
+        return new_event
+    return event.clone()
+
+
+def _sample_kwargs(i: int) -> dict:
+    return dict(
+        order_id=f'{i:016x}',
+        symbol='510300' if i % 2 else '600000',
+        direction=OrderSide.BUY if i % 2 else OrderSide.SELL,
+        price=3.5,
+        volume=100,
+        status=OrderStatus.PARTIAL_FILLED,
+        create_time=datetime.now(),
+        filled_volume=50,
+        trader_platform='qmt',
+        order_type=OrderType.LIMIT,
+        strategy_name='etf_arbitrage',
+        traded_price=3.5,
+        execution_strategy='BasicStrategy',
+        parent_id=f'{i // 10:016x}',
+    )
+
+
+def _measure(func) -> tuple:
+    """返回 (耗时秒, 结果占用的内存字节)，tracemalloc 会拖慢分配，计时和内存分两次运行"""
+    start = time.perf_counter()
+    result = func()
+    elapsed = time.perf_counter() - start
+    del result
+    tracemalloc.start()
+    result = func()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del result
+    return elapsed, size
+
+
+def benchmark(count: int = 10000) -> List[dict]:
+    """对比 Order 和 OrderRecord 的构造、事件复制耗时及内存占用"""
+    kwargs = [_sample_kwargs(i) for i in range(count)]
+    orders = [Order(**kw) for kw in kwargs]
+    records = [OrderRecord(**kw, frozen=True) for kw in kwargs]
+    order_events = [Event(EventType.ORDER, order) for order in orders]
+    record_events = [Event(EventType.ORDER, record) for record in records]
+
+    results = []
+    for name, build, clone in (
+            ('Order', lambda: [Order(**kw) for kw in kwargs],
+             lambda: [event.clone() for event in order_events]),
+            ('OrderRecord', lambda: [OrderRecord(**kw, frozen=True) for kw in kwargs],
+             lambda: [clone_event(event) for event in record_events])):
+        build_time, build_bytes = _measure(build)
+        clone_time, _ = _measure(clone)
+        results.append({
+            'type': name,
+            'build_us': build_time / count * 1e6,
+            'clone_us': clone_time / count * 1e6,
+            'bytes': build_bytes / count,
+        })
+    return results
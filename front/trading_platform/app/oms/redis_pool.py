@@ -0,0 +1,96 @@
+import random
+import threading
+import time
+from typing import Dict, Tuple
+
+import redis
+import redis.asyncio
+
+# 空闲连接超过该秒数后，下次使用前先发送PING检查，代替每次调用前的连接测试
+HEALTH_CHECK_INTERVAL = 30
+
+# 连接参数：开启TCP keepalive，空闲超过 HEALTH_CHECK_INTERVAL 的连接使用前自动检查
+_POOL_OPTIONS = dict(
+    decode_responses=True,
+    socket_keepalive=True,
+    socket_connect_timeout=5,
+    socket_timeout=30,
+    health_check_interval=HEALTH_CHECK_INTERVAL,
+)
+
+_pools: Dict[Tuple, redis.ConnectionPool] = {}
+_pools_lock = threading.Lock()
+
+
+def get_connection_pool(host: str = 'localhost', port: int = 6379, db: int = 0,
+                        password: str = None) -> redis.ConnectionPool:
+    """返回同一Redis地址共享的连接池
+
+    连接开启TCP keepalive，空闲超过 HEALTH_CHECK_INTERVAL 的连接使用前自动检查，
+    断开的连接由连接池重新建立。
+    """
+    key = (host, port, db, password)
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is None:
+            pool = _pools[key] = redis.ConnectionPool(
+                host=host, port=port, db=db, password=password, **_POOL_OPTIONS)
+        return pool
+
+
+def get_async_connection_pool(host: str = 'localhost', port: int = 6379, db: int = 0,
+                              password: str = None) -> redis.asyncio.ConnectionPool:
+    """创建 redis.asyncio 使用的连接池，连接参数与 get_connection_pool 相同
+
+    异步连接池的连接属于创建它们的事件循环，因此不在进程内共享，
+    由调用方在事件循环结束前 disconnect。
+    """
+    return redis.asyncio.ConnectionPool(host=host, port=port, db=db, password=password, **_POOL_OPTIONS)
+
+
+class CircuitBreaker:
+    """Redis连接熔断器
+
+    连续失败 failure_threshold 次后断开，等待时间按指数增长并加随机抖动，
+    上限 max_delay 秒。等待结束后允许一次尝试，成功即恢复，失败则继续加倍等待。
+    """
+    def __init__(self, failure_threshold: int = 3, base_delay: float = 0.5, max_delay: float = 60.0):
+        self.failure_threshold = failure_threshold
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.failures = 0
+        self._open_until = 0.0
+        self._lock = threading.Lock()
+
+    @property
+    def is_open(self) -> bool:
+        return self.failures >= self.failure_threshold
+
+    def allow(self) -> bool:
+        """当前是否可以访问Redis"""
+        return not self.is_open or time.monotonic() >= self._open_until
+
+    def remaining(self) -> float:
+        """距下次允许尝试的秒数"""
+        return max(0.0, self._open_until - time.monotonic()) if self.is_open else 0.0
+
+    def record_success(self) -> bool:
+        """记录一次成功，返回是否从断开状态恢复"""
+        with self._lock:
+            recovered = self.is_open
+            self.failures = 0
+            self._open_until = 0.0
+            return recovered
+
+    def record_failure(self) -> float:
+        """记录一次失败，返回下次尝试前需要等待的秒数"""
+        with self._lock:
+            self.failures += 1
+            if not self.is_open:
+                return 0.0
+            exponent = min(self.failures - self.failure_threshold, 16)
+            delay = min(self.max_delay, self.base_delay * 2 ** exponent)
+            # 在 [delay/2, delay] 之间随机，避免多个实例同时重连
+            delay = random.uniform(delay / 2, delay)
+            self._open_until = time.monotonic() + delay
+            return delay
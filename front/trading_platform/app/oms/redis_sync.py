@@ -1,13 +1,122 @@
+import os
 import sys
 import json
+import socket
+import functools
 import redis
 import threading
 import time
 import traceback
-from typing import Optional, Dict
-from datetime import datetime
-from app.oms.constant import Order
-from app.oms.storage import DataStorage
+from collections import Counter, OrderedDict
+from typing import Optional, Dict, Iterable, List
+from datetime import datetime, timedelta
+from app.oms.constant import Order, OrderStatus
+from app.oms.storage import DataStorage, trans_order_to_dict
+from app.oms.hlc import clock
+from app.oms.redis_pool import CircuitBreaker, get_connection_pool
+
+# 视为Redis暂时不可用的错误，触发熔断和离线队列
+_CONNECTION_ERRORS = (redis.ConnectionError, redis.TimeoutError)
+
+# trans_order_to_dict 读取字典行时使用的列映射
+_IDENTITY_COLUMNS = {name: name for name in (
+    'order_id', 'symbol', 'direction', 'price', 'volume', 'status', 'create_time', 'filled_volume',
+    'trader_platform', 'is_active', 'order_type', 'is_finished', 'strategy_name', 'traded_price',
+    'execution_strategy', 'parent_id')}
+
+# 分片存储：每个交易日、每个策略一个订单哈希表，每天一个分片索引集合
+ORDERS_SHARD_PREFIX = 'jailbird:orders'
+# 没有策略名的订单所在分片
+NO_STRATEGY = '_'
+
+
+def sync_options_from_env() -> dict:
+    """订单在Redis中的存储格式，各同步入口都用它构造同步管理器，保证所有主机读写同一组键
+
+    环境变量 JAILBIRD_REDIS_SHARDED、JAILBIRD_REDIS_STREAM 设为 0/false/no/off 时
+    分别关闭分片存储和Stream，默认都启用。所有主机需使用相同的设置，
+    旧的单一哈希表中的数据用 migrate_orders_hash 迁移。
+
+    Returns:
+        dict: RedisSyncManager 的 sharded 和 use_stream 参数
+    """
+    def flag(name: str) -> bool:
+        return os.getenv(name, '1').strip().lower() not in ('0', 'false', 'no', 'off')
+    return {'sharded': flag('JAILBIRD_REDIS_SHARDED'), 'use_stream': flag('JAILBIRD_REDIS_STREAM')}
+
+
+def _redis_steps(func):
+    """把访问Redis的生成器方法包装为普通方法，由实例的 _run 执行（见 RedisSyncManager._run）
+
+    同步实例上调用直接返回结果，AsyncRedisSyncManager 上返回协程
+    """
+    @functools.wraps(func)
+    def wrapper(self, *args, **kwargs):
+        return self._run(func(self, *args, **kwargs))
+    return wrapper
+
+
+def order_shard_key(order_dict: dict) -> str:
+    """订单所在的分片，如 jailbird:orders:20240102:etf_arbitrage"""
+    day = str(order_dict.get('create_time') or '')[:10].replace('-', '')
+    return f"{ORDERS_SHARD_PREFIX}:{day}:{order_dict.get('strategy_name') or NO_STRATEGY}"
+
+
+def shard_index_key(day: str) -> str:
+    """某天（YYYYMMDD）的分片索引集合"""
+    return f"{ORDERS_SHARD_PREFIX}:{day}:shards"
+
+
+def shard_strategy(shard: str) -> str:
+    return shard.split(':', 3)[3]
+
+
+def shard_expire_at(shard: str, ttl_days: int) -> int:
+    """分片的过期时间戳：交易日结束后再保留 ttl_days 天"""
+    day = datetime.strptime(shard.split(':', 3)[2], '%Y%m%d')
+    return int((day + timedelta(days=1 + ttl_days)).timestamp())
+
+
+def migrate_orders_hash(client: redis.Redis, source: str = 'jailbird:account:orders',
+                        ttl_days: int = 3, delete_source: bool = False,
+                        dry_run: bool = False) -> Dict[str, int]:
+    """把旧的单一订单哈希表按交易日和策略拆分到分片中
+
+    每个分片用一个管道写入并登记到当天的分片索引，设置与正常推送相同的过期时间；
+    已过期的交易日直接跳过。delete_source 时写入完成后删除原哈希表。
+
+    Returns:
+        Dict[str, int]: 分片 -> 订单数量
+    """
+    shards: Dict[str, Dict[str, str]] = {}
+    for order_id, order_json in client.hscan_iter(source, count=1000):
+        try:
+            shard = order_shard_key(json.loads(order_json))
+            shard_expire_at(shard, ttl_days)
+        except ValueError as e:
+            print(f"[WARNING] 跳过无法解析的订单 {order_id}: {e}")
+            continue
+        shards.setdefault(shard, {})[order_id] = order_json
+    if dry_run:
+        return {shard: len(orders) for shard, orders in shards.items()}
+
+    now = time.time()
+    counts = {}
+    for shard, orders in shards.items():
+        expire_at = shard_expire_at(shard, ttl_days)
+        if expire_at <= now:
+            continue
+        index = shard_index_key(shard.split(':', 3)[2])
+        pipe = client.pipeline(transaction=True)
+        pipe.hset(shard, mapping=orders)
+        pipe.expireat(shard, expire_at)
+        pipe.sadd(index, shard)
+        pipe.expireat(index, expire_at)
+        pipe.execute()
+        counts[shard] = len(orders)
+    if delete_source:
+        client.delete(source)
+    return counts
 
 class RedisSyncManager:
     """Redis同步管理器，负责本地数据库和Redis之间的数据同步"""
@@ -17,7 +126,17 @@ class RedisSyncManager:
                  redis_port: int = 6379, 
                  redis_db: int = 0,
                  sync_interval: int = 5,
-                 redis_password: str = '123'):
+                 redis_password: str = '123',
+                 publish_updates: bool = False,
+                 debug: bool = False,
+                 use_stream: bool = False,
+                 stream_maxlen: int = 100000,
+                 snapshot_every: int = 50,
+                 outbox_size: int = 100000,
+                 sharded: bool = False,
+                 strategies: Optional[Iterable[str]] = None,
+                 shard_ttl_days: int = 3,
+                 redis_client: Optional[redis.Redis] = None):
         """
         初始化Redis同步管理器
         
@@ -28,32 +147,101 @@ class RedisSyncManager:
             redis_db: Redis数据库编号
             sync_interval: 同步间隔（秒）
             redis_password: Redis密码
+            publish_updates: 推送订单时是否同时在 ORDERS_CHANNEL 上发布本批变化的订单
+            debug: 推送后回读校验写入结果并输出Redis中的订单数量，会增加往返次数
+            use_stream: 推送时同时写入 ORDERS_STREAM，同步线程改为阻塞读取该流，
+                取代定时读取整个哈希表；两端需同时启用
+            stream_maxlen: 流保留的大约消息数
+            snapshot_every: 流中同一订单每隔多少个版本发送一次完整数据，其余只发送变化的字段
+            outbox_size: Redis不可用期间本地暂存的订单变化数量上限，同一订单只保留最新一条
+            sharded: 订单按交易日和策略写入分片（见 order_shard_key），而不是单一的 ORDERS_HASH；
+                两端需同时启用，已有数据用 migrate_orders_hash 迁移
+            strategies: 只同步这些策略的分片，为空时同步全部，只影响读取
+            shard_ttl_days: 分片在交易日结束后保留的天数
+            redis_client: 使用已有的Redis客户端，忽略 redis_host 等连接参数，由调用方检查连接
         """
         self.storage = storage
-        self.redis_client = redis.Redis(
-            host=redis_host, 
-            port=redis_port, 
-            db=redis_db,
-            password=redis_password,  # 添加密码认证
-            decode_responses=True  # 自动解码响应
+        # 同一地址的实例共享连接池，连接断开后由连接池重建
+        self.redis_client = redis_client if redis_client is not None else redis.Redis(
+            connection_pool=get_connection_pool(redis_host, redis_port, redis_db, redis_password)
         )
+        self._breaker = CircuitBreaker()
+        # Redis不可用期间的订单变化：order_id -> 订单字典，None 表示删除
+        self._outbox: 'OrderedDict[str, Optional[dict]]' = OrderedDict()
+        self._outbox_lock = threading.Lock()
+        # 同一时间只有一个批次在写入：同步线程补发队列与监控线程推送互斥，
+        # 同一订单的旧数据不会在新数据之后写入，流消息的版本号也不会重复
+        self._send_lock = threading.Lock()
+        self.outbox_size = outbox_size
+        # 待发送队列溢出后需要全量重新推送
+        self._resync_required = False
+        self.sharded = sharded
+        self.strategies = set(strategies) if strategies else None
+        self.shard_ttl_days = shard_ttl_days
+        # 已推送订单所在的分片，删除时使用
+        self._shards: Dict[str, str] = {}
+        # 每个订单最新状态的混合逻辑时钟时间戳（本地推送或已应用的远端更新），用于丢弃过期和重复的更新
+        self._versions: Dict[str, int] = {}
+        # 应用远端更新与监控线程对比本地变化互斥，保证应用后记录的指纹先于监控线程读取
+        self._apply_lock = threading.Lock()
+        # 监控本地变化的位置：已读取到的变更序号和对应的交易日，序号为None时全量对比
+        self._monitor_cursor = None
+        self._monitor_day = None
         self.sync_thread = None
         self.monitor_thread = None
         self.running = False
         self.sync_interval = sync_interval
+        self.publish_updates = publish_updates
+        self.debug = debug
+        self.use_stream = use_stream
+        self.stream_maxlen = stream_maxlen
+        self.stream_batch_size = 500
+        # 其他消费者超过该秒数未确认的消息在启动时转给本消费者
+        self.stream_claim_idle = 60
+        self.snapshot_every = snapshot_every
+        # 流消息的版本：推送方为 order_id -> (版本号, 上次推送的订单字典)，接收方为 order_id -> 已应用的版本号
+        self._published: Dict[str, tuple] = {}
+        self._applied_versions: Dict[str, int] = {}
         self.is_cloud = False  # 标记是否为云端实例
-        self.last_orders: Dict[str, Order] = {}  # 用于跟踪上次同步的订单状态
+        self.last_orders: Dict[str, int] = {}  # 上次推送到Redis的订单指纹，见 _fingerprint
+        # 同步统计，每 log_interval 秒汇总输出一次，debug 模式下额外输出每个订单
+        self.log_interval = 60
+        self._stats = Counter()
+        self._stats_lock = threading.Lock()
+        self._last_summary = time.monotonic()
         
         # Redis键名
         self.ORDERS_HASH = 'jailbird:account:orders'
+        self.ORDERS_CHANNEL = 'jailbird:account:orders:updates'  # 分片模式下为 {分片}:updates
+        self.ORDERS_STREAM = 'jailbird:account:orders:stream'
         
         # 测试Redis连接
-        self._test_connection()
+        if redis_client is None:
+            self._test_connection()
         
+    def _run(self, steps):
+        """执行用 _redis_steps 包装的生成器
+
+        生成器每次 yield 一个Redis调用（或 _sleep、其他 _redis_steps 方法）的返回值，
+        收到的是该调用的结果。同步客户端的调用在 yield 之前已经执行完，结果原样送回，
+        异常直接在生成器内抛出；AsyncRedisSyncManager._run 则等待 yield 出的协程后送回结果或异常。
+        同步和异步客户端因此共用同一份同步逻辑。
+        """
+        result = None
+        try:
+            while True:
+                result = steps.send(result)
+        except StopIteration as stop:
+            return stop.value
+
+    def _sleep(self, seconds: float):
+        time.sleep(seconds)
+
+    @_redis_steps
     def _test_connection(self):
         """测试Redis连接"""
         try:
-            self.redis_client.ping()
+            yield self.redis_client.ping()
             print("[OK] Redis连接测试成功")
             return True
         except redis.RedisError as e:
@@ -94,248 +282,813 @@ class RedisSyncManager:
         if self.monitor_thread:
             self.monitor_thread.join()
             
+    def _is_today_active(self, order: Order) -> bool:
+        """订单是否属于 get_active_orders 返回的范围"""
+        today = datetime.now().date().isoformat()
+        return (order.create_time.isoformat()[:10] == today and
+                (order.is_active or order.is_finished or order.status == OrderStatus.CANCELLED))
+
+    def _fingerprint(self, order: Order) -> Optional[int]:
+        """订单的64位指纹，按推送到Redis的字段计算，无法序列化时返回None"""
+        try:
+            return hash(tuple(self.storage._serialize_order(order).values()))
+        except Exception as e:
+            print(f"[ERROR] 计算订单指纹时出错 {order.order_id}: {e}")
+            return None
+
+    def _count(self, key: str, n: int = 1):
+        """累计同步统计，由 _log_summary 定期输出"""
+        if n:
+            with self._stats_lock:
+                self._stats[key] += n
+
+    def _log_summary(self):
+        """距上次输出超过 log_interval 秒且有变化时输出一行同步统计"""
+        now = time.monotonic()
+        with self._stats_lock:
+            elapsed = now - self._last_summary
+            if elapsed < self.log_interval:
+                return
+            stats, self._stats = self._stats, Counter()
+            self._last_summary = now
+        if stats:
+            summary = ', '.join(f"{name} {stats[name]}" for name in sorted(stats))
+            print(f"[INFO] 最近 {elapsed:.0f} 秒Redis同步: {summary}")
+
+    @_redis_steps
     def _monitor_local_changes(self):
-        """监控本地数据库变化"""
+        """监控本地数据库变化，每轮对比见 _scan_local_changes"""
         while self.running:
             try:
-                # 获取所有活跃订单
-                current_orders = self.storage.get_active_orders()
-                print(f"[DEBUG] 获取到本地活跃订单数量: {len(current_orders)}")
-                
-                current_orders_dict = {str(order.order_id): order for order in current_orders if order.order_id}
-                print(f"[DEBUG] 有效订单数量: {len(current_orders_dict)}")
+                changed, to_publish, deleted_orders = self._scan_local_changes()
                 
-                # 检查新增或更新的订单
-                for order_id, order in current_orders_dict.items():
-                    try:
-                        # 跳过空order_id
-                        if not order_id or order_id == "None" or order_id == "null":
-                            print(f"[DEBUG] 跳过空order_id的订单")
-                            continue
-                            
-                        # 检查订单是否需要更新
-                        if order_id in self.last_orders:
-                            last_order = self.last_orders[order_id]
-                            last_status = getattr(last_order.status, 'value', None)
-                            current_status = getattr(order.status, 'value', None)
-                            print(f"[DEBUG] 订单 {order_id} 状态对比 - 旧状态: {last_status}, 新状态: {current_status}")
-                            
-                            # 只有当关键信息发生变化时才更新
-                            if (last_status == current_status and
-                                last_order.filled_volume == order.filled_volume and
-                                last_order.traded_price == order.traded_price):
-                                print(f"[DEBUG] 订单 {order_id} 无变化，跳过更新")
-                                continue
-                        else:
-                            print(f"[DEBUG] 发现新订单: {order_id}")
-                        
-                        # 发布订单到Redis
-                        self.publish_order(order)
-                        print(f"[OK] 本地推送订单到Redis: {order_id}, 状态: {getattr(order.status, 'value', None)}")
-                    except Exception as e:
-                        print(f"[ERROR] 处理订单时出错 {order_id}: {e}")
-                        traceback.print_exc()
-                
-                # 检查删除的订单
-                deleted_orders = set(self.last_orders.keys()) - set(current_orders_dict.keys())
-                if deleted_orders:
-                    print(f"[DEBUG] 发现已删除的订单: {deleted_orders}")
+                # 未能写入的订单进入待发送队列（见 _send_failed），同样记录指纹
+                if to_publish:
+                    published = yield self.publish_orders([changed[order_id] for order_id in to_publish])
+                    self._record_published(to_publish, published)
                     
-                for order_id in deleted_orders:
-                    try:
-                        # 订单已被删除
-                        self.delete_order(order_id)
-                        print(f"[OK] 从Redis删除订单: {order_id}")
-                    except Exception as e:
-                        print(f"[ERROR] 删除订单时出错 {order_id}: {e}")
-                        traceback.print_exc()
-                
-                # 更新最后已知的订单状态
-                self.last_orders = current_orders_dict
+                if deleted_orders and (yield self.delete_orders(deleted_orders)):
+                    self._record_deleted(deleted_orders)
+                    
+                if not to_publish and not deleted_orders:
+                    # 没有新的变化时也尝试补发待发送队列
+                    yield self._flush_outbox()
                 
-                time.sleep(self.sync_interval)
+                self._log_summary()
+                yield self._sleep(self.sync_interval)
             except Exception as e:
                 print(f"[ERROR] 监控本地数据库变化时出错: {e}")
                 traceback.print_exc()
-                time.sleep(self.sync_interval)
+                yield self._sleep(self.sync_interval)
+
+    def _scan_local_changes(self) -> tuple:
+        """对比本地数据库与已推送的订单
+
+        首次运行时对比当天全部活跃订单，之后只读取变更序号之后变化的订单，
+        每次轮询的开销与变化的订单数量成正比。每个已推送的订单只保存一个指纹，
+        变化和删除的订单都用集合运算得到。
+
+        Returns:
+            tuple: (变化的订单 order_id -> Order, 需要推送的 order_id -> 指纹, 需要删除的 order_id 集合)
+        """
+        with self._apply_lock:
+            today = datetime.now().date()
+            if self._resync_required and not self._breaker.is_open:
+                # 待发送队列曾溢出：作废全部指纹，全量对比时重新推送所有订单和删除
+                self._resync_required = False
+                self.last_orders = dict.fromkeys(self.last_orders)
+                self._monitor_cursor = None
+            if self._monitor_cursor is None or self._monitor_day != today:
+                # 首次启动或跨天：按当天活跃订单全量对比一次
+                self._monitor_cursor = self.storage.current_change_seq()
+                self._monitor_day = today
+                changed = {str(order.order_id): order for order in self.storage.get_active_orders()
+                           if order.order_id}
+                deleted_orders = self.last_orders.keys() - changed.keys()
+            else:
+                changed = {}
+                removed = set()
+                for seq, order_id, order in self.storage.changes_since(self._monitor_cursor):
+                    self._monitor_cursor = seq
+                    order_id = str(order_id)
+                    if order is not None and self._is_today_active(order):
+                        changed[order_id] = order
+                        removed.discard(order_id)
+                    else:
+                        # 订单被删除或不再属于当天活跃订单
+                        changed.pop(order_id, None)
+                        removed.add(order_id)
+                deleted_orders = removed & self.last_orders.keys()
+            
+            # 跳过空order_id
+            changed.pop("None", None)
+            changed.pop("null", None)
+            
+            # 指纹与上次推送不同的订单（含新订单），本轮最后一次性推送
+            fingerprints = {}
+            for order_id, order in changed.items():
+                fingerprint = self._fingerprint(order)
+                if fingerprint is not None:
+                    fingerprints[order_id] = fingerprint
+            to_publish = dict(fingerprints.items() - self.last_orders.items())
+        return changed, to_publish, deleted_orders
+
+    def _record_published(self, to_publish: Dict[str, int], published: set):
+        for order_id in published:
+            self.last_orders[order_id] = to_publish[order_id]
+        self._count('推送', len(published))
+        if self.debug:
+            print(f"[DEBUG] 本地推送订单到Redis: {sorted(published)}")
+
+    def _record_deleted(self, deleted_orders: set):
+        for order_id in deleted_orders:
+            self.last_orders.pop(order_id, None)
+        self._count('删除', len(deleted_orders))
                 
+    @_redis_steps
     def _sync_loop(self):
         """同步循环"""
+        if self.use_stream:
+            yield self._stream_sync_loop()
+            return
         while self.running:
             try:
-                # 首先测试连接
-                if not self._test_connection():
-                    print("[WARNING] Redis连接已断开，等待重试...")
-                    time.sleep(5)
+                if not self._breaker.allow():
+                    yield self._sleep(self._breaker.remaining())
                     continue
                     
-                if self.is_cloud:
-                    # 云端模式：从Redis同步到本地数据库
-                    redis_orders = self.redis_client.hgetall(self.ORDERS_HASH)
-                    print(f"[DEBUG] 从Redis获取到 {len(redis_orders)} 个订单")
-                    
-                    for order_id, order_data in redis_orders.items():
-                        try:
-                            order_dict = json.loads(order_data)
-                            order = Order(**order_dict)
-                            
-                            # 检查order_id是否为空
-                            if not order_id or order_id == "None" or order_id == "null":
-                                print(f"[WARNING] 跳过空order_id的订单")
-                                continue
-                            
-                            # 检查订单是否已存在且未更新
-                            existing_order = self.storage.get_order(order_id)
-                            if existing_order:
-                                # 使用创建时间比较
-                                if hasattr(existing_order, 'create_time') and hasattr(order, 'create_time'):
-                                    # 检查订单状态等其他关键信息
-                                    if existing_order.status == order.status and \
-                                       existing_order.filled_volume == order.filled_volume and \
-                                       existing_order.traded_price == order.traded_price:
-                                        # 如果订单状态和成交信息没有变化，跳过更新
-                                        continue
-                            
-                            # 保存或更新订单
-                            self.storage.save_order(order)
-                            print(f"[OK] 云端已同步订单: {order_id}")
-                            
-                        except Exception as e:
-                            print(f"[ERROR] 处理Redis订单数据时出错: {e}")
-                            traceback.print_exc()
-                else:
-                    # 本地模式：从Redis同步到本地数据库
-                    redis_orders = self.redis_client.hgetall(self.ORDERS_HASH)
-                    print(f"[DEBUG] 从Redis获取到 {len(redis_orders)} 个订单")
-                    
-                    for order_id, order_data in redis_orders.items():
-                        try:
-                            order_dict = json.loads(order_data)
-                            order = Order(**order_dict)
-                            
-                            # 检查order_id是否为空
-                            if not order_id or order_id == "None" or order_id == "null":
-                                print(f"[WARNING] 跳过空order_id的订单")
-                                continue
-                            
-                            # 检查订单是否已存在且未更新
-                            existing_order = self.storage.get_order(order_id)
-                            if existing_order:
-                                # 使用创建时间比较
-                                if hasattr(existing_order, 'create_time') and hasattr(order, 'create_time'):
-                                    # 检查订单状态等其他关键信息
-                                    if existing_order.status == order.status and \
-                                       existing_order.filled_volume == order.filled_volume and \
-                                       existing_order.traded_price == order.traded_price:
-                                        # 如果订单状态和成交信息没有变化，跳过更新
-                                        continue
-                            
-                            # 保存或更新订单
-                            self.storage.save_order(order)
-                            print(f"[OK] 本地已同步订单: {order_id}")
-                            
-                        except Exception as e:
-                            print(f"[ERROR] 处理Redis订单数据时出错: {e}")
-                            traceback.print_exc()
-                time.sleep(self.sync_interval)
+                yield self._sync_from_hash()
+                yield self._mark_connected()
+                self._log_summary()
+                yield self._sleep(self.sync_interval)
+            except _CONNECTION_ERRORS as e:
+                yield self._sleep(self._redis_unavailable(e, "读取Redis订单"))
             except Exception as e:
                 print(f"[ERROR] 同步过程中出错: {e}")
                 traceback.print_exc()
-                time.sleep(self.sync_interval)
+                yield self._sleep(self.sync_interval)
+
+    @_redis_steps
+    def _sync_from_hash(self):
+        """读取Redis订单哈希表，将版本比本地新的订单写入本地数据库
+
+        先补发待发送队列，本地尚未推送的订单比Redis中的新，不用Redis中的旧数据覆盖。
+        已知版本的订单在内存中比较，其余的交给 save_orders_versioned 在数据库内比较，
+        不逐个读取本地订单。
+        """
+        mode = "云端" if self.is_cloud else "本地"
+        yield self._flush_outbox()
+        if self._resync_required:
+            # 待发送队列溢出过，本地的变化要等监控线程全量推送后才能对比
+            return
+        self._reconcile_remote((yield self._read_remote_orders()), mode)
+
+    def _reconcile_remote(self, redis_orders: Dict[str, str], mode: str):
+        """把从Redis读取的订单 JSON 中比本地新的写入本地数据库"""
+        pending = set(self._outbox)
+        if self.debug:
+            print(f"[DEBUG] 从Redis获取到 {len(redis_orders)} 个订单")
+        
+        changed = {}
+        for order_id, order_data in redis_orders.items():
+            try:
+                order_dict = json.loads(order_data)
                 
-    def publish_order(self, order: Order):
-        """发布订单到Redis"""
-        try:
-            # 确保order_id是字符串类型
-            order_id = str(order.order_id) if order.order_id is not None else None
-            
-            # 跳过空order_id
-            if not order_id or order_id == "None" or order_id == "null":
-                print(f"[WARNING] 跳过发布空order_id的订单")
-                return
+                # 检查order_id是否为空
+                if not order_id or order_id == "None" or order_id == "null":
+                    print(f"[WARNING] 跳过空order_id的订单")
+                    continue
+                # 本节点自己推送的、尚未推送的和不比已知状态新的订单都不需要写入
+                if order_id in pending or order_dict.get('_origin') == self.role:
+                    continue
+                if not self._is_newer(order_id, order_dict.get('_hlc', 0)):
+                    continue
+                order = self._order_from_redis(order_dict)
                 
-            # 序列化订单数据
-            try:
-                print(f"[DEBUG] 开始序列化订单 {order_id}")
-                order_dict = self.storage._serialize_order(order)
-                # 确保status是字符串值
-                if 'status' in order_dict and hasattr(order_dict['status'], 'value'):
-                    order_dict['status'] = order_dict['status'].value
-                print(f"[DEBUG] 订单序列化结果: {order_dict}")
-            except Exception as e:
-                print(f"[ERROR] 序列化订单数据时出错: {e}")
-                traceback.print_exc()
-                return
+                changed[order_id] = (order, order_dict.get('_hlc', 0))
                 
-            # 将订单数据转换为JSON字符串
-            try:
-                order_json = json.dumps(order_dict)
-                print(f"[DEBUG] 订单JSON数据: {order_json[:200]}...")  # 只打印前200个字符
             except Exception as e:
-                print(f"[ERROR] 转换订单数据为JSON时出错: {e}")
+                print(f"[ERROR] 处理Redis订单数据时出错: {e}")
                 traceback.print_exc()
-                return
-                
-            # 发布到Redis
+        
+        # 一条UPSERT在数据库内与本地版本比较，一个事务内写入版本更新的订单
+        self._save_synced_orders(changed, mode)
+
+    def _shard_of(self, order_dict: dict) -> str:
+        """订单写入的哈希表，未启用分片时为 ORDERS_HASH"""
+        return order_shard_key(order_dict) if self.sharded else self.ORDERS_HASH
+
+    def _wants_shard(self, shard: str) -> bool:
+        return (self.strategies is None or not shard.startswith(ORDERS_SHARD_PREFIX + ':')
+                or shard_strategy(shard) in self.strategies)
+
+    @_redis_steps
+    def _read_remote_orders(self) -> Dict[str, str]:
+        """读取Redis中的订单 JSON，分片模式下只读取当天关注的策略的分片"""
+        if not self.sharded:
+            return (yield self.redis_client.hgetall(self.ORDERS_HASH))
+        day = datetime.now().strftime('%Y%m%d')
+        shards = [shard for shard in (yield self.redis_client.smembers(shard_index_key(day)))
+                  if self._wants_shard(shard)]
+        if not shards:
+            return {}
+        pipe = self.redis_client.pipeline(transaction=False)
+        for shard in shards:
+            pipe.hgetall(shard)
+        orders = {}
+        for shard_orders in (yield pipe.execute()):
+            orders.update(shard_orders)
+        return orders
+
+    @property
+    def role(self) -> str:
+        """本实例的角色，作为流消息的来源标记和消费者组名"""
+        return 'cloud' if self.is_cloud else 'local'
+
+    def _stream_consumer(self) -> tuple:
+        """本实例在流上的 (消费者组, 消费者名)
+
+        消费者名按主机固定，重启后仍能读到上次未确认的消息
+        """
+        return f'jailbird-{self.role}', socket.gethostname()
+
+    @_redis_steps
+    def _claim_stale_entries(self, group: str, consumer: str):
+        """接管其他消费者（换了主机名或旧版本按进程命名的消费者）超时未确认的消息，
+        并删除已没有未确认消息的其他消费者"""
+        start_id, claimed = '0-0', 0
+        while True:
+            start_id, entries = (yield self.redis_client.xautoclaim(
+                self.ORDERS_STREAM, group, consumer, self.stream_claim_idle * 1000,
+                start_id=start_id, count=self.stream_batch_size))[:2]
+            claimed += len(entries)
+            if start_id == '0-0':
+                break
+        for info in (yield self.redis_client.xinfo_consumers(self.ORDERS_STREAM, group)):
+            if info['name'] != consumer and not info['pending']:
+                yield self.redis_client.xgroup_delconsumer(self.ORDERS_STREAM, group, info['name'])
+        if claimed:
+            print(f"[INFO] 已接管 {claimed} 条其他消费者未确认的流消息")
+
+    @_redis_steps
+    def _ensure_stream_group(self):
+        """创建本角色的消费者组，已存在时忽略"""
+        try:
+            yield self.redis_client.xgroup_create(self.ORDERS_STREAM, f'jailbird-{self.role}', id='$', mkstream=True)
+        except redis.ResponseError as e:
+            if 'BUSYGROUP' not in str(e):
+                raise
+
+    @_redis_steps
+    def _stream_sync_loop(self):
+        """基于Redis Stream的同步循环
+
+        启动时按哈希表全量对比一次，之后用消费者组阻塞读取对方推送的订单变化，
+        服务端记录本组已读取的位置，处理完后确认。重启时先处理上次未确认的消息。
+        没有变化时阻塞等待，不产生额外开销。应用出错的消息不确认，重新读取未确认的消息后重试。
+        """
+        mode = "云端" if self.is_cloud else "本地"
+        group, consumer = self._stream_consumer()
+        last_id = None
+        while self.running:
             try:
-                # 检查Redis连接
-                if not self._test_connection():
-                    print("[ERROR] Redis连接已断开，无法发布订单")
-                    return
+                if not self._breaker.allow():
+                    yield self._sleep(self._breaker.remaining())
+                    continue
+                if last_id is None:
+                    yield self._ensure_stream_group()
+                    yield self._claim_stale_entries(group, consumer)
+                    yield self._sync_from_hash()
+                    last_id = '0'  # 先读取本消费者未确认的消息
                     
-                # 检查订单是否已存在
-                existing_data = self.redis_client.hget(self.ORDERS_HASH, order_id)
-                if existing_data:
-                    print(f"[DEBUG] 订单 {order_id} 已存在于Redis中")
+                response = yield self.redis_client.xreadgroup(
+                    group, consumer, {self.ORDERS_STREAM: last_id},
+                    count=self.stream_batch_size, block=int(self.sync_interval * 1000))
+                entries = response[0][1] if response else []
+                yield self._mark_connected()
+                if last_id == '0' and not entries:
+                    last_id = '>'
+                    continue
                     
-                # 写入数据
-                result = self.redis_client.hset(self.ORDERS_HASH, order_id, order_json)
-                print(f"[DEBUG] Redis hset结果: {result} (1=新增, 0=更新)")
+                yield self._apply_stream_entries(entries, mode)
+                self._log_summary()
+                if entries:
+                    yield self.redis_client.xack(self.ORDERS_STREAM, group, *[entry_id for entry_id, _ in entries])
+            except redis.RedisError as e:
+                # 重连后重新全量对比，避免遗漏断线期间被裁剪的消息
+                last_id = None
+                if isinstance(e, _CONNECTION_ERRORS):
+                    yield self._sleep(self._redis_unavailable(e, "读取Redis Stream"))
+                else:
+                    print(f"[ERROR] Redis Stream读取失败: {e}")
+                    yield self._sleep(self.sync_interval)
+            except Exception as e:
+                print(f"[ERROR] 同步过程中出错: {e}")
+                traceback.print_exc()
+                if last_id is not None:
+                    # 出错的消息未确认，重新读取本消费者未确认的消息后重试
+                    last_id = '0'
+                yield self._sleep(self.sync_interval)
                 
-                # 验证数据是否成功写入
-                saved_data = self.redis_client.hget(self.ORDERS_HASH, order_id)
-                if saved_data:
-                    if saved_data == order_json:
-                        print(f"[OK] 订单已成功写入Redis: {order_id}")
-                        # 显示当前Redis中的所有订单数量
-                        total_orders = self.redis_client.hlen(self.ORDERS_HASH)
-                        print(f"[INFO] Redis中当前共有 {total_orders} 个订单")
-                    else:
-                        print(f"[WARNING] 订单数据不匹配: {order_id}")
-                        print(f"[DEBUG] 期望值: {order_json[:100]}...")
-                        print(f"[DEBUG] 实际值: {saved_data[:100]}...")
+    @_redis_steps
+    def _apply_stream_entries(self, entries, mode: str):
+        """应用一批流消息
+
+        完整消息直接覆盖订单；增量消息只含变化的字段，版本号与已应用的版本连续时
+        只更新这些列。版本不连续（消息被裁剪、推送方重启等）或本地没有该订单时，
+        从订单所在的哈希表读取完整订单。同一批中同一订单的多条消息合并后写入一次。
+        分片模式下跳过不关注的策略的消息，合并后不比已知状态新的更新直接丢弃，不写数据库。
+        """
+        full, shards = self._apply_stream_deltas(entries, mode)
+        missing = [order_id for order_id, data in full.items() if data is None]
+        if missing:
+            pipe = self.redis_client.pipeline(transaction=False)
+            for order_id in missing:
+                pipe.hget(shards[order_id], order_id)
+            self._fill_missing(full, missing, (yield pipe.execute()))
+        self._save_full_orders(full, mode)
+
+    def _apply_stream_deltas(self, entries, mode: str) -> tuple:
+        """合并一批流消息并写入其中的增量更新
+
+        Returns:
+            tuple: (order_id -> 完整订单字典或 None（需从哈希表读取）, order_id -> 所在的哈希表)
+        """
+        full = {}
+        deltas = {}
+        shards = {}
+        for entry_id, fields in entries:
+            # 已被裁剪的未确认消息没有内容；本节点自己推送的消息不再应用
+            if not fields or fields.get('origin') == self.role:
+                continue
+            shard = fields.get('shard') or self.ORDERS_HASH
+            if not self._wants_shard(shard):
+                continue
+            try:
+                order_id = fields['order_id']
+                shards[order_id] = shard
+                version = int(fields['version'])
+                if 'data' in fields:
+                    full[order_id] = json.loads(fields['data'])
+                    deltas.pop(order_id, None)
+                elif self._applied_versions.get(order_id) != version - 1:
+                    self._count('版本不连续', 1)
+                    if self.debug:
+                        print(f"[DEBUG] 订单 {order_id} 版本不连续，读取完整订单")
+                    full[order_id] = None
+                    deltas.pop(order_id, None)
                 else:
-                    print(f"[ERROR] 订单写入失败: {order_id}")
-                    
-                # 列出所有订单的key
-                all_keys = self.redis_client.hkeys(self.ORDERS_HASH)
-                print(f"[DEBUG] Redis中的所有订单ID: {all_keys}")
+                    delta = json.loads(fields['delta'])
+                    delta['_hlc'] = int(fields.get('hlc') or 0)
+                    if order_id in full:
+                        if full[order_id] is not None:
+                            full[order_id].update(delta)
+                    else:
+                        deltas.setdefault(order_id, {}).update(delta)
+                self._applied_versions[order_id] = version
+            except Exception as e:
+                print(f"[ERROR] 处理Redis订单消息时出错 {entry_id}: {e}")
+                traceback.print_exc()
+
+        deltas = {order_id: delta for order_id, delta in deltas.items()
+                  if self._is_newer(order_id, delta['_hlc'])}
+        if deltas:
+            with self._apply_lock:
+                updated = self.storage.update_order_fields(
+                    (order_id, dict(delta, version=delta['_hlc'])) for order_id, delta in deltas.items())
+                for order_id, order in updated.items():
+                    self._applied(order_id, order, deltas[order_id]['_hlc'])
+            for order_id in deltas:
+                if order_id not in updated:
+                    full[order_id] = None
+            self._count('增量同步', len(updated))
+            if self.debug and updated:
+                print(f"[DEBUG] {mode}已增量同步订单: {sorted(updated)}")
+
+        return full, shards
+
+    def _fill_missing(self, full: dict, missing: List[str], results: list):
+        """填入从哈希表读取的完整订单（results 与 missing 一一对应）"""
+        for order_id, order_json in zip(missing, results):
+            if order_json is not None:
+                full[order_id] = json.loads(order_json)
+            else:
+                # 订单已从Redis删除
+                self._applied_versions.pop(order_id, None)
+
+    def _save_full_orders(self, full: dict, mode: str):
+        """写入完整订单中比已知状态新的"""
+        orders = {}
+        for order_id, data in full.items():
+            if data is None or data.get('_origin') == self.role:
+                continue
+            if not self._is_newer(order_id, data.get('_hlc', 0)):
+                continue
+            try:
+                orders[order_id] = (self._order_from_redis(data), data.get('_hlc', 0))
+            except Exception as e:
+                print(f"[ERROR] 处理Redis订单数据时出错 {order_id}: {e}")
+                traceback.print_exc()
+        self._save_synced_orders(orders, mode)
+
+    def _is_newer(self, order_id: str, hlc: int) -> bool:
+        """远端更新是否比本节点已知的状态新，重复收到的和过期的更新返回False"""
+        known = self._versions.get(order_id)
+        if known is None or hlc > known:
+            return True
+        if hlc < known:
+            self._count('丢弃过期', 1)
+        return False
+
+    @staticmethod
+    def _order_from_redis(order_dict: dict) -> Order:
+        """由Redis中的订单JSON构造Order，去掉 _hlc/_origin 等同步元数据"""
+        return Order(**{name: value for name, value in order_dict.items() if not name.startswith('_')})
+
+    def _applied(self, order_id: str, order: Order, hlc: int):
+        """记录已写入本地的远端更新：合并时钟并记录版本，
+        同时记录指纹，监控线程读到这次写入时不会再推送回Redis"""
+        clock.update(hlc)
+        self._versions[order_id] = hlc
+        fingerprint = self._fingerprint(order)
+        if fingerprint is not None:
+            self.last_orders[order_id] = fingerprint
+
+    def _save_synced_orders(self, orders: Dict[str, tuple], mode: str):
+        """批量写入从Redis同步来的订单（order_id -> (Order, 时间戳)）并输出结果"""
+        if not orders:
+            return
+        with self._apply_lock:
+            written, failures = self.storage.save_orders_versioned(orders.values())
+            failed_ids = {str(order_id) for order_id, _ in failures}
+            for order_id, (order, hlc) in orders.items():
+                if order_id in written:
+                    # 指纹按写入数据库后读出的订单计算，与监控线程读到的一致
+                    self._applied(order_id, trans_order_to_dict(
+                        self.storage._order_to_row(order), _IDENTITY_COLUMNS), hlc)
+                elif order_id not in failed_ids:
+                    # 本地版本更新，数据库拒绝了写入；记录版本，之后不再重复提交
+                    self._versions[order_id] = hlc
+        for order_id, error in failures:
+            print(f"[ERROR] {mode}同步订单失败: {order_id}, {error}")
+        synced = [order_id for order_id in orders if order_id in written]
+        self._count('同步', len(synced))
+        self._count('丢弃过期', len(orders) - len(synced) - len(failed_ids))
+        if self.debug and synced:
+            print(f"[DEBUG] {mode}已同步订单: {synced}")
+
+    def _serialize_for_redis(self, order: Order) -> Optional[tuple]:
+        """序列化订单为 (order_id, 订单字典)，order_id为空或无法序列化时返回None"""
+        # 确保order_id是字符串类型
+        order_id = str(order.order_id) if order.order_id is not None else None
+        
+        # 跳过空order_id
+        if not order_id or order_id == "None" or order_id == "null":
+            print(f"[WARNING] 跳过发布空order_id的订单")
+            return None
+            
+        try:
+            order_dict = self.storage._serialize_order(order)
+            # 确保status是字符串值
+            if 'status' in order_dict and hasattr(order_dict['status'], 'value'):
+                order_dict['status'] = order_dict['status'].value
+            json.dumps(order_dict)  # 提前发现无法序列化的字段
+            return order_id, order_dict
+        except Exception as e:
+            print(f"[ERROR] 序列化订单数据时出错: {order_id}, {e}")
+            traceback.print_exc()
+            return None
+
+    @_redis_steps
+    def publish_orders(self, orders) -> set:
+        """推送一批订单到Redis
+
+        所有订单连同待发送队列中的变化在一个MULTI事务管道中写入（见 _write_batch），
+        整批只有一次往返。Redis不可用时订单进入待发送队列，恢复后与下一批一起推送。
+
+        Returns:
+            set: 已推送或已进入待发送队列的order_id
+        """
+        order_dicts = self._stamp_orders(orders)
+        if not order_dicts:
+            return set()
+        return set(order_dicts) if (yield self._send(order_dicts)) else set()
+
+    def _stamp_orders(self, orders) -> 'OrderedDict[str, dict]':
+        """序列化一批订单并加上同步元数据"""
+        order_dicts = OrderedDict()
+        for order in orders:
+            item = self._serialize_for_redis(order)
+            if item is not None:
+                order_id, order_dict = item
+                # 同步元数据：修改时间戳和来源节点，接收方据此丢弃过期更新和回声
+                order_dict['_hlc'] = self._versions[order_id] = clock.now()
+                order_dict['_origin'] = self.role
+                order_dicts[order_id] = order_dict
+        return order_dicts
+
+    @_redis_steps
+    def _send(self, items: 'OrderedDict[str, Optional[dict]]') -> bool:
+        """连同待发送队列一起写入一批订单变化（order_id -> 订单字典，None 表示删除）
+
+        Returns:
+            bool: 已写入或已进入待发送队列时为True
+        """
+        # threading.Lock 和 asyncio.Lock 的 acquire 分别由两种 _run 执行
+        yield self._send_lock.acquire()
+        try:
+            batch, queued = self._take_outbox(items)
+            if not batch:
+                return True
+            if not self._breaker.allow():
+                self._requeue(batch)
+                return True
                 
+            try:
+                yield self._write_batch(batch)
             except redis.RedisError as e:
-                print(f"[ERROR] Redis操作失败: {e}")
-                traceback.print_exc()
+                return self._send_failed(batch, e)
+            self._sent(queued)
+            return True
+        finally:
+            self._send_lock.release()
+
+    def _take_outbox(self, items: 'OrderedDict[str, Optional[dict]]') -> tuple:
+        """取出待发送队列并合并本批变化，返回 (合并后的批次, 队列中原有的变化数量)"""
+        with self._outbox_lock:
+            batch, self._outbox = self._outbox, OrderedDict()
+        queued = len(batch)
+        for order_id, item in items.items():
+            # 同一订单只保留最新的变化
+            batch.pop(order_id, None)
+            batch[order_id] = item
+        return batch, queued
+
+    def _send_failed(self, batch: 'OrderedDict[str, Optional[dict]]', error: redis.RedisError) -> bool:
+        """处理写入失败的批次，返回值同 _send
+
+        整批放回待发送队列，之后每轮补发。监控线程的变更序号已越过这些订单，
+        丢弃后要等订单再次变化才会推送，Redis会一直保留旧数据。
+        """
+        if isinstance(error, _CONNECTION_ERRORS):
+            self._redis_unavailable(error, f"推送 {len(batch)} 个订单变化")
+        else:
+            print(f"[ERROR] Redis批量推送 {len(batch)} 个订单变化失败，稍后重试: {error}")
+        self._requeue(batch)
+        return True
+
+    def _sent(self, queued: int):
+        if self._breaker.record_success():
+            print("[OK] Redis连接已恢复")
+        if queued:
+            print(f"[OK] 已补发 {queued} 个Redis不可用期间的订单变化")
+
+    def _requeue(self, batch: 'OrderedDict[str, Optional[dict]]'):
+        """把未写入的变化放回待发送队列，排在期间新加入的变化之前"""
+        with self._outbox_lock:
+            for order_id, item in self._outbox.items():
+                batch.pop(order_id, None)
+                batch[order_id] = item
+            if len(batch) > self.outbox_size:
+                # 超出上限时丢弃队列，恢复后由监控线程全量重新推送
+                print(f"[WARNING] 待发送队列超过 {self.outbox_size} 条，恢复后全量重新推送")
+                batch = OrderedDict()
+                self._resync_required = True
+            self._outbox = batch
+
+    @_redis_steps
+    def _flush_outbox(self):
+        if self._outbox:
+            yield self._send(OrderedDict())
+
+    @_redis_steps
+    def _mark_connected(self):
+        """读取Redis成功后调用，从断开状态恢复时立即补发待发送队列"""
+        if self._breaker.record_success():
+            print("[OK] Redis连接已恢复")
+            yield self._flush_outbox()
+
+    def connection_ok(self):
+        """外部检查到Redis可用时调用，从断开状态恢复时立即补发待发送队列"""
+        return self._mark_connected()
+
+    def _redis_unavailable(self, error: Exception, action: str) -> float:
+        """记录一次连接失败，返回重试前需要等待的秒数"""
+        delay = self._breaker.record_failure()
+        if delay:
+            print(f"[WARNING] {action}失败，Redis暂不可用，{delay:.1f}秒后重试: {error}")
+        return delay or self._breaker.base_delay
+
+    @_redis_steps
+    def _write_batch(self, batch: 'OrderedDict[str, Optional[dict]]'):
+        """在一个MULTI事务管道中写入一批订单变化
+
+        每个哈希表（分片）的订单用一条HSET写入，删除用一条HDEL。启用 publish_updates 时
+        同一管道内发布本批订单，启用 use_stream 时逐条写入 ORDERS_STREAM（见 _stream_message）。
+        分片模式下同时登记分片索引并设置过期时间。
+        """
+        deleted_shards = {}
+        if self.sharded:
+            located = self._locate_deleted(batch)
+            day_shards = []
+            if None in located.values():
+                # 本地订单行已删除，无法得知策略，从当天的所有分片中删除
+                day = datetime.now().strftime('%Y%m%d')
+                day_shards = sorted((yield self.redis_client.smembers(shard_index_key(day))))
+            deleted_shards = {order_id: [shard] if shard else day_shards for order_id, shard in located.items()}
+        pipe = self.redis_client.pipeline(transaction=True)
+        shards, payloads, stream_versions = self._queue_batch(pipe, batch, deleted_shards)
+        yield pipe.execute()
+        self._batch_written(batch, shards, stream_versions)
+        if self.debug and payloads:
+            yield self._verify_published({order_id: (shards[order_id], payloads[order_id])
+                                          for order_id in payloads})
+
+    def _locate_deleted(self, batch: 'OrderedDict[str, Optional[dict]]') -> Dict[str, Optional[str]]:
+        """本进程没有推送过（如重启前推送）的待删除订单所在的分片
+
+        按本地订单行的交易日和策略计算，订单行已删除时为None
+        """
+        located = {}
+        for order_id, item in batch.items():
+            if item is not None or order_id in self._shards:
+                continue
+            order = self.storage.get_order(order_id)
+            located[order_id] = None if order is None else order_shard_key(
+                {'create_time': order.create_time.isoformat(), 'strategy_name': order.strategy_name})
+        return located
+
+    def _queue_batch(self, pipe, batch: 'OrderedDict[str, Optional[dict]]',
+                     deleted_shards: Optional[Dict[str, List[str]]] = None) -> tuple:
+        """把一批订单变化的命令加入管道
+
+        Args:
+            pipe: Redis管道
+            batch: order_id -> 订单字典，None 表示删除
+            deleted_shards: 本进程没有推送过的待删除订单 -> 要从中删除的分片，见 _write_batch
+
+        Returns:
+            tuple: (order_id -> 分片, order_id -> 订单JSON, order_id -> 流消息版本号)
+        """
+        order_dicts = {order_id: item for order_id, item in batch.items() if item is not None}
+        payloads = {order_id: json.dumps(order_dict) for order_id, order_dict in order_dicts.items()}
+        shards = {order_id: self._shard_of(order_dict) for order_id, order_dict in order_dicts.items()}
+        by_shard: Dict[str, Dict[str, str]] = {}
+        for order_id, shard in shards.items():
+            by_shard.setdefault(shard, {})[order_id] = payloads[order_id]
+        # 删除的订单以及分片变化的订单从原分片中删除
+        removed: Dict[str, List[str]] = {}
+        for order_id, item in batch.items():
+            old_shard = self._shards.get(order_id)
+            if item is None:
+                if old_shard is not None:
+                    targets = [old_shard]
+                else:
+                    targets = (deleted_shards or {}).get(order_id, [self.ORDERS_HASH])
+                for shard in targets:
+                    removed.setdefault(shard, []).append(order_id)
+            elif old_shard is not None and old_shard != shards[order_id]:
+                removed.setdefault(old_shard, []).append(order_id)
+        
+        for shard, order_ids in removed.items():
+            pipe.hdel(shard, *order_ids)
+        stream_versions = {}
+        for shard, shard_payloads in by_shard.items():
+            pipe.hset(shard, mapping=shard_payloads)
+            if self.sharded:
+                expire_at = shard_expire_at(shard, self.shard_ttl_days)
+                index = shard_index_key(shard.split(':', 3)[2])
+                pipe.expireat(shard, expire_at)
+                pipe.sadd(index, shard)
+                pipe.expireat(index, expire_at)
+            if self.publish_updates:
+                channel = f"{shard}:updates" if self.sharded else self.ORDERS_CHANNEL
+                pipe.publish(channel, json.dumps({'orders': [order_dicts[order_id] for order_id in shard_payloads]}))
+        if self.use_stream:
+            for order_id, order_dict in order_dicts.items():
+                message = self._stream_message(order_id, order_dict, payloads[order_id])
+                if message is not None:
+                    stream_versions[order_id] = int(message['version'])
+                    if self.sharded:
+                        message['shard'] = shards[order_id]
+                    pipe.xadd(self.ORDERS_STREAM, message,
+                              maxlen=self.stream_maxlen, approximate=True)
+        return shards, payloads, stream_versions
+
+    def _batch_written(self, batch: 'OrderedDict[str, Optional[dict]]', shards: Dict[str, str],
+                       stream_versions: Dict[str, int]):
+        """批次写入Redis后记录各订单的流消息版本和所在分片"""
+        for order_id, version in stream_versions.items():
+            self._published[order_id] = (version, batch[order_id])
+        for order_id, item in batch.items():
+            if item is None:
+                self._published.pop(order_id, None)
+                self._shards.pop(order_id, None)
+                self._versions.pop(order_id, None)
+            elif self.sharded:
+                self._shards[order_id] = shards[order_id]
+        if self.debug:
+            deleted = [order_id for order_id, item in batch.items() if item is None]
+            if deleted:
+                print(f"[DEBUG] 已从Redis删除订单: {deleted}")
+
+    def _stream_message(self, order_id: str, order_dict: dict, order_json: str) -> Optional[dict]:
+        """生成订单的流消息，与上次推送相比没有变化时返回None
+
+        首次推送及每 snapshot_every 个版本发送完整数据（data），其余只发送变化的字段（delta）
+        """
+        version, last = self._published.get(order_id, (0, None))
+        version += 1
+        message = {'order_id': order_id, 'version': str(version), 'origin': self.role,
+                   'hlc': str(order_dict.get('_hlc', 0))}
+        if last is None or version % self.snapshot_every == 0:
+            message['data'] = order_json
+            return message
+        delta = {name: value for name, value in order_dict.items()
+                 if not name.startswith('_') and last.get(name) != value}
+        if not delta:
+            return None
+        message['delta'] = json.dumps(delta)
+        return message
+
+    @_redis_steps
+    def _verify_published(self, payloads: Dict[str, tuple]):
+        """调试用：回读刚推送的订单（order_id -> (哈希表, JSON)）并与期望值比较"""
+        try:
+            shards = sorted({shard for shard, _ in payloads.values()})
+            pipe = self.redis_client.pipeline(transaction=False)
+            for order_id, (shard, _) in payloads.items():
+                pipe.hget(shard, order_id)
+            for shard in shards:
+                pipe.hlen(shard)
+            self._check_published(payloads, (yield pipe.execute()))
+        except redis.RedisError as e:
+            print(f"[ERROR] 校验Redis订单失败: {e}")
+
+    @staticmethod
+    def _check_published(payloads: Dict[str, tuple], results: list):
+        """比较回读结果：前 len(payloads) 项为各订单的JSON，其余为各分片的订单数量"""
+        saved_values, total_orders = results[:len(payloads)], sum(results[len(payloads):])
+        for (order_id, (_, order_json)), saved_data in zip(payloads.items(), saved_values):
+            if saved_data is None:
+                print(f"[ERROR] 订单写入失败: {order_id}")
+            elif saved_data != order_json:
+                print(f"[WARNING] 订单数据不匹配: {order_id}")
+                print(f"[DEBUG] 期望值: {order_json[:100]}...")
+                print(f"[DEBUG] 实际值: {saved_data[:100]}...")
+        print(f"[INFO] Redis中当前共有 {total_orders} 个订单")
+
+    @_redis_steps
+    def publish_order(self, order: Order):
+        """发布单个订单到Redis"""
+        try:
+            if (yield self.publish_orders([order])):
+                print(f"[OK] 订单已写入Redis: {order.order_id}")
         except Exception as e:
             print(f"[ERROR] 发布订单到Redis时出错: {e}")
             traceback.print_exc()
             
+    @_redis_steps
     def delete_order(self, order_id: str):
         """从Redis删除订单"""
-        try:
-            # 检查order_id是否为空
-            if not order_id or order_id == "None" or order_id == "null":
-                print(f"[WARNING] 跳过删除空order_id的订单")
-                return
-                
-            self.redis_client.hdel(self.ORDERS_HASH, order_id)
+        # 检查order_id是否为空
+        if not order_id or order_id == "None" or order_id == "null":
+            print(f"[WARNING] 跳过删除空order_id的订单")
+            return
+        if (yield self.delete_orders([order_id])):
             print(f"[OK] 已从Redis删除订单: {order_id}")
-        except Exception as e:
-            print(f"[ERROR] 从Redis删除订单时出错: {e}")
-            traceback.print_exc()
             
+    @_redis_steps
+    def delete_orders(self, order_ids) -> bool:
+        """用一条HDEL从Redis删除一批订单，Redis不可用时进入待发送队列"""
+        deletions = self._deletions(order_ids)
+        return (yield self._send(deletions)) if deletions else True
+
+    @staticmethod
+    def _deletions(order_ids) -> 'OrderedDict[str, None]':
+        """一批待删除的订单变化，跳过空order_id"""
+        return OrderedDict.fromkeys(order_id for order_id in order_ids
+                                    if order_id and order_id != "None" and order_id != "null")
+            
+    @_redis_steps
+    def count_remote_orders(self) -> int:
+        """Redis中的订单数量，分片模式下为当天各分片的订单数之和"""
+        if not self.sharded:
+            return (yield self.redis_client.hlen(self.ORDERS_HASH))
+        day = datetime.now().strftime('%Y%m%d')
+        shards = yield self.redis_client.smembers(shard_index_key(day))
+        if not shards:
+            return 0
+        pipe = self.redis_client.pipeline(transaction=False)
+        for shard in shards:
+            pipe.hlen(shard)
+        return sum((yield pipe.execute()))
+
+    @_redis_steps
     def get_redis_orders(self) -> dict:
         """获取Redis中的所有订单"""
         try:
-            orders = self.redis_client.hgetall(self.ORDERS_HASH)
+            orders = yield self._read_remote_orders()
             print(f"[DEBUG] 当前Redis中的订单数量: {len(orders)}")
             return orders
         except Exception as e:
@@ -343,9 +1096,10 @@ class RedisSyncManager:
             traceback.print_exc()
             return {}
             
+    @_redis_steps
     def clear_redis_orders(self):
         """清空Redis中的所有订单"""
         try:
-            self.redis_client.delete('orders')
+            yield self.redis_client.delete('orders')
         except Exception as e:
             print(f"清空Redis订单时出错: {e}") 
\ No newline at end of file
@@ -6,7 +6,6 @@ from datetime import datetime
 from app.oms.storage import DataStorage
 import traceback
 import os
-from itertools import groupby
 from operator import itemgetter
 from app.oms.constant import Order, OrderStatus, OrderSide, OrderType, Event, EventType
 import uuid
@@ -14,11 +13,16 @@ import uuid
 trading_system = None
 main_engine = None
 
-# 创建数据库连接
+# 创建数据库连接：storage用于写入，reader以只读连接查询，页面查询不会阻塞订单写入，
+# reader的订单簿维护母单汇总，供订单列表按母单查找
 try:
     storage = DataStorage(os.getenv('TRADING_DATA_PATH'))
+    reader = DataStorage(os.getenv('TRADING_DATA_PATH'), use_cache=True, read_only=True,
+                         use_order_book=True)
 except Exception as e:
     storage = DataStorage(os.getenv('JAILBIRD_DB_PATH'))
+    reader = DataStorage(os.getenv('JAILBIRD_DB_PATH'), use_cache=True, read_only=True,
+                         use_order_book=True)
 
 @bp.route('/orders')
 @login_required
@@ -32,15 +36,28 @@ def orders_page():
 def get_orders():
     """获取所有活动订单，对于相同parent_id的订单只返回成交量最大的那一个，然后按时间排序"""
     try:
-        all_orders = []
-        active_orders = storage.get_active_orders()
+        active_orders = reader.get_active_orders()
         print(f"从数据库获取到 {len(active_orders)} 个活动订单")
-        
-        # 首先将所有订单转换为字典形式
+        # 母单下成交量最大的子单和母单汇总直接从订单簿查找，不再每次排序分组
+        book = reader.get_order_book()
+
+        filtered_orders = []
+        seen_parents = set()
         for order in active_orders:
+            parent_id = getattr(order, 'parent_id', None)
+            summary = None
+            if parent_id:
+                if parent_id in seen_parents:
+                    continue
+                seen_parents.add(parent_id)
+                best = book.best_fill(parent_id)
+                if best is not None and (best.filled_volume or 0) > (order.filled_volume or 0):
+                    order = best
+                summary = book.summary(parent_id)
+
             order_data = {
                 'order_id': order.order_id,
-                'parent_id': getattr(order, 'parent_id', None),
+                'parent_id': parent_id,
                 'symbol': order.symbol,
                 'direction': order.direction.value,
                 'price': order.price,
@@ -54,29 +71,10 @@ def get_orders():
                 'execution_strategy': getattr(order, 'execution_strategy', None),
                 'traded_price': getattr(order, 'traded_price', None)
             }
-            all_orders.append(order_data)
-        
-        # 分组处理订单
-        filtered_orders = []
-        
-        # 将有parent_id的订单和没有的分开处理
-        orders_with_parent = [o for o in all_orders if o['order_id']]
-        orders_without_parent = [o for o in all_orders if not o['order_id']]
-        
-        # 直接添加没有parent_id的订单
-        filtered_orders.extend(orders_without_parent)
-        
-        # 按parent_id分组，找出每组中成交量最大的
-        if orders_with_parent:
-            # 按parent_id排序
-            orders_with_parent.sort(key=lambda x: x['order_id'])
-            
-            # 按parent_id分组
-            for parent_id, group in groupby(orders_with_parent, key=lambda x: x['order_id']):
-                group_list = list(group)
-                # 找出成交量最大的订单
-                max_filled_order = max(group_list, key=lambda x: x['filled_volume'] or 0)
-                filtered_orders.append(max_filled_order)
+            if summary is not None:
+                order_data['parent_filled_volume'] = summary.filled_volume
+                order_data['parent_vwap'] = summary.vwap
+            filtered_orders.append(order_data)
         
         # 对过滤后的订单按创建时间排序（降序，最新的订单在前面）
         sorted_filtered_orders = sorted(filtered_orders, key=lambda x: x['create_time'], reverse=True)
@@ -85,6 +83,26 @@ def get_orders():
         print(f"获取订单失败: {e}{traceback.format_exc()}")
         return jsonify([])
 
+@bp.route('/api/order-stats')
+@login_required
+def get_order_stats():
+    """订单统计：各策略成交、各证券成交均价和状态分布，可用start/end参数（ISO时间）限定范围"""
+    try:
+        start = request.args.get('start')
+        end = request.args.get('end')
+        start_time = datetime.fromisoformat(start) if start else None
+        end_time = datetime.fromisoformat(end) if end else None
+        return jsonify({
+            'strategies': reader.get_strategy_volume(start_time, end_time),
+            'symbols': reader.get_symbol_vwap(start_time, end_time),
+            'status_counts': reader.get_status_counts(start_time, end_time),
+        })
+    except ValueError as e:
+        return jsonify({'error': f'时间格式错误: {e}'}), 400
+    except Exception as e:
+        print(f"获取订单统计失败: {e}{traceback.format_exc()}")
+        return jsonify({'error': str(e)}), 500
+
 @bp.route('/api/order-add', methods=['POST'])
 def add_orders():
     """添加订单
@@ -106,7 +124,7 @@ def add_orders():
         "execution_strategy: "BasicStrategy",
         "parent_id": "generate_order_id())"
     }
-    
+    也可以传入上述结构的列表，批量添加订单
     """ 
     import uuid
     from .constant import Order
@@ -117,55 +135,35 @@ def add_orders():
         return jsonify({'error': 'No data provided'}), 400
     
     print('请求参数-------', data)
-    order = Order(
-        order_id=data.get('order_id'),
-        symbol=data.get('symbol'),
-        price=data.get('price'),
-        volume=data.get('volume'),
-        order_type=data.get('order_type'),
-        direction=data.get('direction'),
-        traded_price=data.get('traded_price'),
-        filled_volume=data.get('filled_volume'),
-        status=data.get('status'),
-        create_time=datetime.now(timezone(timedelta(hours=8))),
-        trader_platform=data.get('trader_platform'),
-        is_active=data.get('is_active'),
-        strategy_name=data.get('strategy_name') ,
-        execution_strategy=data.get('execution_strategy'),
-        parent_id=uuid.uuid4().hex[:16]
-    )
-
-    try:
-        conn = sqlite3.connect(storage.db_path)
-        cursor = conn.cursor()
-
-        from dataclasses import asdict
-        from .storage import trans_to_dict
-        
-        order_data = {k:trans_to_dict(v) for k,v in asdict(order).items()}
-
-        
-        cursor.execute('''
-        INSERT OR REPLACE INTO orders (
-            order_id, symbol, direction, price, volume,
-            status, create_time, filled_volume,
-            trader_platform, is_active, order_type,
-            is_finished, strategy_name, traded_price, execution_strategy, parent_id
-        ) VALUES (
-            :order_id, :symbol, :direction, :price, :volume,
-            :status, :create_time, :filled_volume,
-            :trader_platform, :is_active, :order_type, 
-            :is_finished, :strategy_name, :traded_price, :execution_strategy, :parent_id
+    # 支持单个订单或订单列表，列表在同一个事务中批量写入
+    items = data if isinstance(data, list) else [data]
+    orders = [
+        Order(
+            order_id=item.get('order_id'),
+            symbol=item.get('symbol'),
+            price=item.get('price'),
+            volume=item.get('volume'),
+            order_type=item.get('order_type'),
+            direction=item.get('direction'),
+            traded_price=item.get('traded_price'),
+            filled_volume=item.get('filled_volume'),
+            status=item.get('status'),
+            create_time=datetime.now(timezone(timedelta(hours=8))),
+            trader_platform=item.get('trader_platform'),
+            is_active=item.get('is_active'),
+            strategy_name=item.get('strategy_name') ,
+            execution_strategy=item.get('execution_strategy'),
+            parent_id=uuid.uuid4().hex[:16]
         )
-        ''', order_data)
-        
-        conn.commit()
-        
-    except Exception as e:
-        conn.rollback()
-        return jsonify({'error': str(e)}), 500       
-    finally:
-        conn.close()
+        for item in items
+    ]
+
+    failures = storage.save_orders(orders)
+    if failures:
+        return jsonify({
+            'error': 'Some orders failed to save',
+            'failed': [{'order_id': order_id, 'error': error} for order_id, error in failures]
+        }), 500
 
     return jsonify({'message': 'Order added successfully'}), 201
 
@@ -10,12 +10,12 @@ if project_root not in sys.path:
     sys.path.insert(0, project_root)
 
 # 导入并运行Redis同步
-from trading_platform.app.oms.redis_sync import RedisSyncManager
+from trading_platform.app.oms.redis_sync import RedisSyncManager, sync_options_from_env
 from trading_platform.app.oms.storage import DataStorage
 
 if __name__ == "__main__":
     # 初始化存储
-    storage = DataStorage()
+    storage = DataStorage(use_cache=True)
     
     # 初始化Redis同步管理器
     redis_sync = RedisSyncManager(
@@ -23,7 +23,9 @@ if __name__ == "__main__":
         redis_host="localhost",  # 替换为实际的Redis服务器地址
         redis_port=6379,
         redis_password="your_password",  # 替换为实际的Redis密码
-        redis_db=0
+        redis_db=0,
+        # 与 sync_combined 使用同一组存储格式设置
+        **sync_options_from_env()
     )
     
     try:
@@ -36,4 +38,5 @@ if __name__ == "__main__":
         
     finally:
         # 停止同步
-        redis_sync.stop_sync() 
\ No newline at end of file
+        redis_sync.stop_sync()
+        storage.close() 
\ No newline at end of file
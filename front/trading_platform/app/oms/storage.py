@@ -1,36 +1,22 @@
 from typing import Dict, List, Optional
-import json
 import numpy as np
 from datetime import datetime, timedelta
 from pathlib import Path
 import sqlite3
 from dataclasses import asdict
 from app.oms.constant import Order, Event, EventType, OrderStatus, OrderSide, OrderType
+from app.oms.order_cache import OrderCache
+from app.oms.order_book import OrderBook
+from app.oms.event_writer import AsyncEventWriter
+from app.oms.archive import OrderArchive
+from app.oms.order_frame import OrderFrame, FRAME_COLUMNS
+from app.oms.migrations import run_migrations
+from app.oms.codec import get_codec, encode_event_data, decode_event_data
+from app.oms.hlc import clock
 import traceback
-class EnumEncoder(json.JSONEncoder):
-    """处理枚举类型的JSON编码器"""
-    def default(self, obj):
-        # 处理所有枚举类型
-        if hasattr(obj, "value") and not isinstance(obj, type):
-            return obj.value
-        # 使用类型名称字符串来检查，避免变量覆盖问题
-        if isinstance(obj, np.floating):
-            return round(float(obj),3)
-        if isinstance(obj, np.integer):
-            return int(obj)
-        if obj.__class__.__name__ == 'datetime':
-            return obj.isoformat()
-        # 处理 NumPy 数值类型
-        if hasattr(obj, "dtype") and hasattr(obj, "item"):
-            return obj.item()  # 将 NumPy 数值转换为 Python 原生类型
-        # 处理 bytes 类型
-        if isinstance(obj, bytes):
-            try:
-                return obj.decode('utf-8')  # 尝试解码为 UTF-8 字符串
-            except UnicodeDecodeError:
-                # 如果解码失败，转换为十六进制字符串
-                return obj.hex()
-        return super().default(obj)
+import threading
+import heapq
+from contextlib import nullcontext
 def trans_to_dict(obj):
     if hasattr(obj, "value") and not isinstance(obj, type):
         return obj.value
@@ -52,6 +38,11 @@ def trans_to_dict(obj):
             # 如果解码失败，转换为十六进制字符串
             return obj.hex()
     return obj
+def round_price(value):
+    """价格保留3位小数，没有价格（如市价单）时保持None"""
+    return round(value, 3) if value is not None else None
+
+
 def trans_order_to_dict(row: Order,column_map) -> Order:
     
     return Order(
@@ -74,21 +65,439 @@ def trans_order_to_dict(row: Order,column_map) -> Order:
     )
 
 
+class SQLiteConnectionPool:
+    """SQLite连接池，每个线程持有一个长连接，避免每次调用都重新建立连接"""
+    # 连接建立后统一设置的PRAGMA
+    PRAGMAS = (
+        ('journal_mode', 'WAL'),      # WAL模式，读写互不阻塞
+        ('synchronous', 'NORMAL'),    # WAL下NORMAL已足够安全，减少fsync
+        ('cache_size', -20000),       # 页缓存约20MB（负数表示KB）
+        ('mmap_size', 268435456),     # 256MB内存映射读取
+        ('temp_store', 'MEMORY'),     # 临时表放在内存
+    )
+
+    def __init__(self, db_path: str, timeout: float = 5.0, read_only: bool = False):
+        self.db_path = db_path
+        self.timeout = timeout
+        self.read_only = read_only
+        self._lock = threading.Lock()
+        # 线程标识 -> (线程对象, 连接)
+        self._conns: Dict[int, tuple] = {}
+        self._dedicated: List[sqlite3.Connection] = []
+
+    def _connect(self) -> sqlite3.Connection:
+        """创建新连接并设置PRAGMA"""
+        # 连接只会被创建它的线程使用，关闭时由close()统一处理，因此关闭同线程检查
+        if self.read_only:
+            # 只读URI连接，数据库需已由写入方创建并切换到WAL模式
+            conn = sqlite3.connect(f"{Path(self.db_path).resolve().as_uri()}?mode=ro", uri=True,
+                                   timeout=self.timeout, check_same_thread=False)
+        else:
+            conn = sqlite3.connect(self.db_path, timeout=self.timeout, check_same_thread=False)
+        for name, value in self.PRAGMAS:
+            if self.read_only and name == 'journal_mode':
+                continue
+            conn.execute(f'PRAGMA {name}={value}')
+        return conn
+
+    def get(self) -> sqlite3.Connection:
+        """获取当前线程的连接，不存在时创建"""
+        thread = threading.current_thread()
+        entry = self._conns.get(thread.ident)
+        if entry is not None and entry[0] is thread:
+            return entry[1]
+        conn = self._connect()
+        with self._lock:
+            # 顺便回收已结束线程（如Flask按请求创建的线程）遗留的连接
+            stale = [ident for ident, (t, _) in self._conns.items() if not t.is_alive()]
+            stale_conns = [self._conns.pop(ident)[1] for ident in stale]
+            self._conns[thread.ident] = (thread, conn)
+        for stale_conn in stale_conns:
+            stale_conn.close()
+        return conn
+
+    def dedicated(self) -> sqlite3.Connection:
+        """创建一个不绑定线程的独立连接，调用方自行保证串行使用，随连接池一起关闭"""
+        conn = self._connect()
+        with self._lock:
+            self._dedicated.append(conn)
+        return conn
+
+    def close(self):
+        """关闭所有线程的连接"""
+        with self._lock:
+            conns = [conn for _, conn in self._conns.values()] + self._dedicated
+            self._conns.clear()
+            self._dedicated.clear()
+        for conn in conns:
+            try:
+                conn.close()
+            except Exception as e:
+                print(f"关闭数据库连接失败: {e}")
+
+
+class SQLiteSnapshot:
+    """数据库的内存快照，后台线程按固定间隔用backup API从只读连接整体复制
+
+    sqlite3 连接不能被多个线程同时使用，因此每个线程第一次查询时从最新快照复制一份
+    自己的内存连接，只用于查询；快照刷新后再次查询时重新复制，该线程被替换的连接
+    保留到下一次替换才关闭，避免同一线程中尚未读完的查询被中断。
+    内存占用为数据库大小乘以查询线程数。
+    """
+    def __init__(self, pool: SQLiteConnectionPool, interval: float):
+        self._pool = pool
+        self.interval = interval
+        self.refreshed_at: Optional[datetime] = None
+        self._lock = threading.Lock()
+        # 最新快照只在持有锁时访问，作为各线程复制的来源
+        self._conn: Optional[sqlite3.Connection] = None
+        self._generation = 0
+        # 线程标识 -> (线程对象, 快照代数, 连接, 被替换的连接)
+        self._conns: Dict[int, tuple] = {}
+        self._stop = threading.Event()
+        self.refresh()
+        self._thread = threading.Thread(target=self._run, name='db-snapshot', daemon=True)
+        self._thread.start()
+
+    def refresh(self):
+        """重新复制整个数据库"""
+        conn = sqlite3.connect(':memory:', check_same_thread=False)
+        self._pool.get().backup(conn)
+        with self._lock:
+            previous, self._conn = self._conn, conn
+            self._generation += 1
+            self.refreshed_at = datetime.now()
+        if previous is not None:
+            previous.close()
+
+    def get(self) -> sqlite3.Connection:
+        """获取当前线程的快照连接，快照刷新过时重新复制"""
+        thread = threading.current_thread()
+        entry = self._conns.get(thread.ident)
+        if entry is not None and entry[0] is thread and entry[1] == self._generation:
+            return entry[2]
+        conn = sqlite3.connect(':memory:', check_same_thread=False)
+        with self._lock:
+            if self._conn is None:
+                conn.close()
+                raise sqlite3.ProgrammingError("数据库快照已关闭")
+            self._conn.backup(conn)
+            # 顺便回收已结束线程遗留的连接
+            stale = [ident for ident, entry in self._conns.items() if not entry[0].is_alive()]
+            stale_conns = [c for ident in stale for c in self._conns.pop(ident)[2:] if c is not None]
+            old = self._conns.pop(thread.ident, None)
+            previous = None
+            if old is not None and old[0] is thread:
+                previous = old[2]
+                if old[3] is not None:
+                    stale_conns.append(old[3])
+            self._conns[thread.ident] = (thread, self._generation, conn, previous)
+        for stale_conn in stale_conns:
+            stale_conn.close()
+        return conn
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.refresh()
+            except Exception as e:
+                print(f"[ERROR] 刷新数据库快照失败: {e}")
+                traceback.print_exc()
+
+    def close(self):
+        self._stop.set()
+        self._thread.join(self.interval + 1)
+        with self._lock:
+            conns = [c for entry in self._conns.values() for c in entry[2:] if c is not None]
+            if self._conn is not None:
+                conns.append(self._conn)
+            self._conns.clear()
+            self._conn = None
+        for conn in conns:
+            conn.close()
+
+
 class DataStorage:
     """数据存储类，负责订单和事件的持久化"""
-    def __init__(self, db_path: str = "trading_data.db"):
+    def __init__(self, db_path: str = "trading_data.db", use_cache: bool = False,
+                 async_events: bool = False, event_codec: str = "struct",
+                 archive_dir: Optional[str] = None, read_only: bool = False,
+                 snapshot_interval: Optional[float] = None, use_order_book: bool = False):
+        """
+        Args:
+            db_path: 数据库路径
+            use_cache: 是否启用当天订单的内存缓存
+            async_events: save_event 是否只入队，由后台线程批量写入
+            event_codec: 事件数据的编码格式，json/struct/msgpack，见 app.oms.codec
+            archive_dir: 历史数据按月归档的目录，默认为数据库文件旁的 <库名>_archive
+            read_only: 只读模式，使用 mode=ro 的URI连接，不执行迁移也不能写入，
+                供Web页面等只查询的场景使用，数据库需已由写入方创建
+            snapshot_interval: 只读模式下查询改为读取内存快照，每隔该秒数刷新一次，
+                长时间的查询完全不占用数据库文件；启用缓存时缓存仍读取数据库文件
+            use_order_book: 是否维护当天订单的订单簿（self.order_book），
+                启动时加载当天订单，之后每次 get_order_book 按变更序号追上数据库，
+                包括其他进程写入的订单
+        """
+        if snapshot_interval and not read_only:
+            raise ValueError("snapshot_interval 只能在只读模式下使用")
+        if read_only and async_events:
+            raise ValueError("只读模式不能启用异步事件写入")
         self.db_path = db_path
-        self._init_db()
-        self._migrate_db()  # 添加迁移步骤
-    
-    def _init_db(self):
-        """初始化数据库"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
+        self.read_only = read_only
+        self.archive = OrderArchive(archive_dir or f"{Path(db_path).with_suffix('')}_archive")
+        self._event_codec = get_codec(event_codec)
+        self._pool = SQLiteConnectionPool(db_path, read_only=read_only)
+        self._cache = OrderCache() if use_cache else None
+        # 启用缓存时订单写入和缓存校验共用该连接，自身提交不会改变其data_version
+        self._cache_conn = self._pool.dedicated() if use_cache else None
+        self._snapshot = None
+        if not read_only:
+            self._migrate_db()
+        if snapshot_interval:
+            self._snapshot = SQLiteSnapshot(self._pool, snapshot_interval)
+        self.order_book = None
+        self._book_lock = threading.Lock()
+        self._book_cursor = 0
+        if use_order_book:
+            self.order_book = OrderBook()
+            self.get_order_book()
+        self.event_writer = None
+        if async_events:
+            self.event_writer = AsyncEventWriter(self)
+            self.event_writer.start()
+
+    def _get_conn(self) -> sqlite3.Connection:
+        """获取当前线程的数据库连接，快照模式下返回共用的快照连接"""
+        if self._snapshot is not None:
+            return self._snapshot.get()
+        return self._pool.get()
+
+    def close(self):
+        """写完排队的事件并关闭连接池，程序退出时调用"""
+        if self.event_writer is not None:
+            self.event_writer.stop()
+        if self._snapshot is not None:
+            self._snapshot.close()
+        self._pool.close()
+
+    def flush_events(self, timeout: Optional[float] = None) -> bool:
+        """等待异步写入的事件全部落盘，未启用异步写入时直接返回True"""
+        if self.event_writer is None:
+            return True
+        return self.event_writer.flush(timeout)
+
+    def _order_write_conn(self):
+        """返回订单写入使用的连接及需要持有的锁
+
+        启用缓存时使用缓存专用连接并持有缓存锁，保证写穿与缓存重新加载互斥
+        """
+        if self._cache is None:
+            return self._get_conn(), nullcontext()
+        return self._cache_conn, self._cache.lock
+
+    def _rows_to_orders(self, cursor: sqlite3.Cursor) -> List[Order]:
+        """将查询结果转换为订单列表，跳过无法解析的行"""
+        # 获取列名
+        column_names = [description[0] for description in cursor.description]
+        # 创建列名到索引的映射
+        column_map = {name: i for i, name in enumerate(column_names)}
         
-        # 创建订单表（如果不存在）
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS orders (
+        orders = []
+        for row in cursor.fetchall():
+            try:
+                # 使用列名映射获取数据
+                orders.append(trans_order_to_dict(row, column_map))
+            except Exception as e:
+                print(f"处理订单行时出错: {e}")
+                traceback.print_exc()
+                continue
+        return orders
+
+    def _rows_written(self, rows: List[dict]):
+        """订单写入后更新缓存：按写入数据库的行重新构造订单，与从数据库读取的结果一致"""
+        if self._cache is None:
+            return
+        for row in rows:
+            try:
+                order = trans_order_to_dict(row, {k: k for k in row})
+                if order.order_id is not None:
+                    # orders.order_id 为TEXT列，读取时总是字符串
+                    order.order_id = str(order.order_id)
+            except Exception as e:
+                # 无法解析的行交给下次重新加载处理
+                print(f"更新订单缓存失败: {e}")
+                self._cache.clear()
+                continue
+            self._cache.put(order)
+
+    def get_order_book(self) -> Optional[OrderBook]:
+        """返回已追上数据库的当天订单簿，未启用时返回None
+
+        跨天时重新加载，否则按 changes_since 应用上次之后本进程和其他进程写入的订单，
+        每次调用的开销与变化的订单数量成正比。
+        """
+        book = self.order_book
+        if book is None:
+            return None
+        with self._book_lock:
+            today = datetime.now().date()
+            if book.day != today:
+                # 先取序号再加载，加载期间写入的订单下次再应用一遍，结果相同
+                self._book_cursor = self.current_change_seq()
+                book.load(today, self._get_day_orders())
+            else:
+                for seq, order_id, order in self.changes_since(self._book_cursor):
+                    self._book_cursor = seq
+                    if order is None:
+                        book.remove(str(order_id))
+                    else:
+                        book.apply(order)
+        return book
+
+    def _cache_lock(self):
+        """读取缓存时持有的锁，从校验到读完缓存期间其他线程不能重新加载或写穿，未启用缓存时为空上下文"""
+        return self._cache.lock if self._cache is not None else nullcontext()
+
+    def _get_cache(self) -> Optional[OrderCache]:
+        """返回已同步到当天最新数据的缓存，未启用缓存时返回None
+
+        调用方需在 _cache_lock() 内调用并读取缓存
+        """
+        if self._cache is None:
+            return None
+        conn = self._cache_conn
+        today = datetime.now().date()
+        with self._cache.lock:
+            version = conn.execute('PRAGMA data_version').fetchone()[0]
+            if not self._cache.is_fresh(today, version):
+                start_time = datetime.combine(today, datetime.min.time())
+                end_time = datetime.combine(today, datetime.max.time())
+                cursor = conn.execute(self._DAY_ORDERS_SQL, (start_time.isoformat(), end_time.isoformat()))
+                self._cache.load(today, self._rows_to_orders(cursor), version)
+        return self._cache
+    
+    # ISO-8601格式的create_time按字典序即按时间排序，范围查询可以直接走索引
+    _INDEXES = (
+        'CREATE INDEX IF NOT EXISTS idx_orders_create_time ON orders(create_time)',
+        'CREATE INDEX IF NOT EXISTS idx_orders_state_time ON orders(is_active, is_finished, status, create_time)',
+        'CREATE INDEX IF NOT EXISTS idx_orders_parent_id ON orders(parent_id)',
+        'CREATE INDEX IF NOT EXISTS idx_events_type_parent ON events(event_type, parent_id)',
+        'CREATE INDEX IF NOT EXISTS idx_orders_change_seq ON orders(change_seq)',
+    )
+
+    # 每次插入或修改订单都从计数器取下一个序号写入change_seq。
+    # 写入已有订单用UPSERT走UPDATE触发器，只有真正的删除才会留下墓碑记录
+    _CHANGE_TRIGGERS = (
+        '''
+        CREATE TRIGGER IF NOT EXISTS trg_orders_change_insert AFTER INSERT ON orders
+        BEGIN
+            UPDATE order_change_seq SET seq = seq + 1 WHERE id = 1;
+            UPDATE orders SET change_seq = (SELECT seq FROM order_change_seq WHERE id = 1)
+            WHERE rowid = NEW.rowid;
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS trg_orders_change_update AFTER UPDATE ON orders
+        WHEN NEW.change_seq IS OLD.change_seq
+        BEGIN
+            UPDATE order_change_seq SET seq = seq + 1 WHERE id = 1;
+            UPDATE orders SET change_seq = (SELECT seq FROM order_change_seq WHERE id = 1)
+            WHERE rowid = NEW.rowid;
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS trg_orders_change_delete AFTER DELETE ON orders
+        BEGIN
+            UPDATE order_change_seq SET seq = seq + 1 WHERE id = 1;
+            INSERT INTO order_tombstones (change_seq, order_id, deleted_time)
+            VALUES ((SELECT seq FROM order_change_seq WHERE id = 1), OLD.order_id,
+                    strftime('%Y-%m-%dT%H:%M:%S', 'now', 'localtime'));
+        END
+        ''',
+    )
+
+    _ACTIVE_ORDERS_SQL = '''
+                SELECT * FROM orders 
+                WHERE (is_active = 1 
+                      OR is_finished = 1 
+                      OR status = ?) 
+                AND create_time >= ? 
+                AND create_time <= ?
+                ORDER BY create_time DESC
+            '''
+
+    _ORDER_HISTORY_SQL = '''
+                SELECT * FROM orders 
+                WHERE create_time >= ? 
+                AND create_time <= ?
+                ORDER BY create_time DESC
+            '''
+
+    _DAY_ORDERS_SQL = '''
+                SELECT * FROM orders 
+                WHERE create_time >= ? 
+                AND create_time <= ?
+            '''
+
+    _UPDATE_EVENT_SQL = '''
+            UPDATE events 
+            SET data = ?, timestamp = ?, codec = ?
+            WHERE event_type = ? 
+            AND parent_id = ?
+            AND event_type = 'ORDER'  -- 确保只更新ORDER类型的事件
+            '''
+
+    # 聚合查询，时间范围参数为 (start, end)
+    _BEST_FILL_BY_PARENT_SQL = '''
+                SELECT * FROM (
+                    SELECT *, ROW_NUMBER() OVER (
+                        PARTITION BY parent_id
+                        ORDER BY IFNULL(filled_volume, 0) DESC, create_time DESC
+                    ) AS fill_rank
+                    FROM orders
+                    WHERE parent_id IS NOT NULL AND parent_id != ''
+                    AND create_time >= ?
+                    AND create_time <= ?
+                )
+                WHERE fill_rank = 1
+                ORDER BY create_time DESC
+            '''
+
+    _STRATEGY_VOLUME_SQL = '''
+                SELECT strategy_name,
+                       COUNT(*) AS order_count,
+                       SUM(IFNULL(volume, 0)) AS volume,
+                       SUM(IFNULL(filled_volume, 0)) AS filled_volume,
+                       SUM(IFNULL(filled_volume, 0) * IFNULL(traded_price, 0)) AS notional
+                FROM orders
+                WHERE create_time >= ?
+                AND create_time <= ?
+                GROUP BY strategy_name
+            '''
+
+    _SYMBOL_VWAP_SQL = '''
+                SELECT symbol,
+                       SUM(filled_volume) AS filled_volume,
+                       SUM(filled_volume * traded_price) AS notional
+                FROM orders
+                WHERE filled_volume > 0
+                AND traded_price IS NOT NULL
+                AND create_time >= ?
+                AND create_time <= ?
+                GROUP BY symbol
+            '''
+
+    _STATUS_COUNTS_SQL = '''
+                SELECT status, COUNT(*) AS order_count
+                FROM orders
+                WHERE create_time >= ?
+                AND create_time <= ?
+                GROUP BY status
+            '''
+
+    # 建表语句，{schema} 为空时建在主库，归档分区使用 "archive."
+    _ORDERS_TABLE_SQL = '''
+            CREATE TABLE IF NOT EXISTS {schema}orders (
                 order_id TEXT PRIMARY KEY,
                 symbol TEXT,
                 direction TEXT,
@@ -104,75 +513,119 @@ class DataStorage:
                 strategy_name TEXT,
                 traded_price REAL,
                 execution_strategy TEXT,
-                parent_id TEXT
+                parent_id TEXT,
+                update_time TEXT,
+                change_seq INTEGER,
+                version INTEGER NOT NULL DEFAULT 0
             )
-        ''')
-        
-        # 创建事件日志表
-        cursor.execute('''
-        CREATE TABLE IF NOT EXISTS events (
+        '''
+
+    _EVENTS_TABLE_SQL = '''
+        CREATE TABLE IF NOT EXISTS {schema}events (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
             event_type TEXT,
             data TEXT,
-            timestamp TEXT
+            timestamp TEXT,
+            parent_id TEXT,
+            codec INTEGER DEFAULT 0
         )
+        '''
+
+    # 旧版本数据库可能缺少的列：(表, 列, 类型, 补齐已有数据的SQL)
+    _ADDED_COLUMNS = (
+        ('orders', 'trader_platform', 'TEXT', None),
+        ('orders', 'is_active', 'INTEGER DEFAULT 0', None),
+        ('orders', 'order_type', 'TEXT', None),
+        ('orders', 'is_finished', 'INTEGER DEFAULT 0', None),
+        ('orders', 'strategy_name', 'TEXT', None),
+        ('orders', 'traded_price', 'REAL', None),
+        ('orders', 'execution_strategy', 'TEXT', None),
+        ('orders', 'parent_id', 'TEXT', None),
+        ('orders', 'update_time', 'TEXT', None),
+        # 已有订单按rowid补齐变更序号
+        ('orders', 'change_seq', 'INTEGER', 'UPDATE orders SET change_seq = rowid'),
+        # 事件表的parent_id从JSON中物化为独立列，便于建索引
+        ('events', 'parent_id', 'TEXT', "UPDATE events SET parent_id = json_extract(data, '$.parent_id')"),
+        # 事件数据的编码格式标记，旧数据为JSON
+        ('events', 'codec', 'INTEGER DEFAULT 0', None),
+    )
+
+    @classmethod
+    def _migrate_base_schema(cls, cursor: sqlite3.Cursor):
+        """创建订单表和事件表，并为没有版本号的旧数据库补齐缺失的列"""
+        cursor.execute(cls._ORDERS_TABLE_SQL.format(schema=''))
+        cursor.execute(cls._EVENTS_TABLE_SQL.format(schema=''))
+        columns = {}
+        for table in ('orders', 'events'):
+            cursor.execute(f'PRAGMA table_info({table})')
+            columns[table] = {col[1] for col in cursor.fetchall()}
+        for table, column, column_type, backfill_sql in cls._ADDED_COLUMNS:
+            if column not in columns[table]:
+                cursor.execute(f'ALTER TABLE {table} ADD COLUMN {column} {column_type}')
+                if backfill_sql:
+                    cursor.execute(backfill_sql)
+
+    @classmethod
+    def _migrate_change_seq(cls, cursor: sqlite3.Cursor):
+        """订单变更序号的计数器、墓碑表和触发器"""
+        # 订单变更序号：单行计数器只增不减，由触发器维护
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS order_change_seq (
+                id INTEGER PRIMARY KEY CHECK (id = 1),
+                seq INTEGER NOT NULL
+            )
         ''')
-        
-        # 检查表结构
+        cursor.execute('''
+            INSERT OR IGNORE INTO order_change_seq (id, seq)
+            SELECT 1, IFNULL(MAX(change_seq), 0) FROM orders
+        ''')
+        # 被删除订单的记录，供变更流通知下游
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS order_tombstones (
+                change_seq INTEGER PRIMARY KEY,
+                order_id TEXT,
+                deleted_time TEXT
+            )
+        ''')
+        for trigger_sql in cls._CHANGE_TRIGGERS:
+            cursor.execute(trigger_sql)
+
+    @classmethod
+    def _migrate_order_version(cls, cursor: sqlite3.Cursor):
+        """订单的同步版本（混合逻辑时钟时间戳），已有订单为0"""
         cursor.execute('PRAGMA table_info(orders)')
-        columns = cursor.fetchall()
-        # print("订单表结构:")
-        # for col in columns:
-        #     print(f"  {col[1]} ({col[2]})")
-        
-        conn.commit()
-        conn.close()
+        if 'version' not in {col[1] for col in cursor.fetchall()}:
+            cursor.execute('ALTER TABLE orders ADD COLUMN version INTEGER NOT NULL DEFAULT 0')
+
+    @classmethod
+    def _migrate_indexes(cls, cursor: sqlite3.Cursor):
+        """查询使用的索引"""
+        for index_sql in cls._INDEXES:
+            cursor.execute(index_sql)
+
+    @classmethod
+    def migration_steps(cls) -> List[tuple]:
+        """数据库结构的迁移步骤 (版本号, 说明, 执行函数)，新的结构变更追加在末尾"""
+        return [
+            (1, '订单表和事件表及旧版本缺失的列', cls._migrate_base_schema),
+            (2, '订单变更序号和墓碑记录', cls._migrate_change_seq),
+            (3, '查询索引', cls._migrate_indexes),
+            (4, '订单同步版本', cls._migrate_order_version),
+        ]
 
     def _migrate_db(self):
-        """迁移数据库结构"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
+        """按 PRAGMA user_version 执行未完成的迁移步骤，结构已是最新时不做任何修改
+
+        迁移失败时 run_migrations 已整体回滚，异常继续抛出，不在未升级的结构上创建实例
+        """
         try:
-            # 检查是否需要添加新列
-            cursor.execute('PRAGMA table_info(orders)')
-            columns = {col[1] for col in cursor.fetchall()}
-            
-            # 添加缺失的列
-            if 'trader_platform' not in columns:
-                cursor.execute('ALTER TABLE orders ADD COLUMN trader_platform TEXT')
-            
-            if 'is_active' not in columns:
-                cursor.execute('ALTER TABLE orders ADD COLUMN is_active INTEGER DEFAULT 0')
-            
-            if 'order_type' not in columns:
-                cursor.execute('ALTER TABLE orders ADD COLUMN order_type TEXT')
-            
-            if 'is_finished' not in columns:
-                cursor.execute('ALTER TABLE orders ADD COLUMN is_finished INTEGER DEFAULT 0')
-            
-            # 添加新的列
-            if 'strategy_name' not in columns:
-                cursor.execute('ALTER TABLE orders ADD COLUMN strategy_name TEXT')
-            
-            if 'traded_price' not in columns:
-                cursor.execute('ALTER TABLE orders ADD COLUMN traded_price REAL')
-            
-            if 'execution_strategy' not in columns:
-                cursor.execute('ALTER TABLE orders ADD COLUMN execution_strategy TEXT')
-            
-            if 'parent_id' not in columns:
-                cursor.execute('ALTER TABLE orders ADD COLUMN parent_id TEXT')
-            
-            conn.commit()
-            print("数据库迁移完成")
-            
+            applied = run_migrations(self._get_conn(), self.migration_steps())
         except Exception as e:
-            print(f"Migration error: {e}")
-            conn.rollback()
-        
-        finally:
-            conn.close()
+            print(f"[ERROR] 数据库迁移失败: {e}")
+            self._pool.close()
+            raise
+        if applied:
+            print(f"[OK] 数据库结构已升级到版本 {applied[-1]}")
 
     def _serialize_order(self, order: Order) -> dict:
         """序列化订单对象"""
@@ -197,117 +650,355 @@ class DataStorage:
         }
         return data
     
+    # 写入orders表的列，change_seq 由触发器维护
+    _SYNC_COLUMNS = (
+        'order_id', 'symbol', 'direction', 'price', 'volume', 'status', 'create_time', 'filled_volume',
+        'trader_platform', 'is_active', 'order_type', 'is_finished', 'strategy_name', 'traded_price',
+        'execution_strategy', 'parent_id', 'update_time', 'version',
+    )
+
+    # 本地写入：版本取本进程时钟与已存版本加一中的较大者。时钟只在同步进程中合并远端时间戳，
+    # 其他进程（Web接口、策略引擎）写入时也要排在已写入的同步版本之后，不会被更早的远端修改覆盖
+    _UPSERT_ORDER_SQL = (
+        f"INSERT INTO orders ({', '.join(_SYNC_COLUMNS)}) "
+        f"VALUES ({', '.join(':' + name for name in _SYNC_COLUMNS)}) "
+        f"ON CONFLICT(order_id) DO UPDATE SET "
+        f"{', '.join(f'{name} = excluded.{name}' for name in _SYNC_COLUMNS[1:-1])}, "
+        f"version = MAX(excluded.version, orders.version + 1)"
+    )
+
+    # 版本比本地新时才覆盖，版本比较在同一条语句内完成
+    _UPSERT_VERSIONED_SQL = (
+        f"INSERT INTO orders ({', '.join(_SYNC_COLUMNS)}) "
+        f"VALUES ({', '.join(':' + name for name in _SYNC_COLUMNS)}) "
+        f"ON CONFLICT(order_id) DO UPDATE SET "
+        f"{', '.join(f'{name} = excluded.{name}' for name in _SYNC_COLUMNS[1:])} "
+        f"WHERE excluded.version > orders.version"
+    )
+
+    def _order_to_row(self, order: Order) -> dict:
+        """将订单转换为写入orders表的参数字典"""
+        order_data = {k:trans_to_dict(v) for k,v in asdict(order).items()}
+        order_data['price'] = round_price(order_data['price'])
+        order_data['traded_price'] = round_price(order_data['traded_price'])
+        order_data['update_time'] = datetime.now().isoformat()
+        # 本地写入的版本比本进程见过的和该订单已存的同步版本都新（见 _UPSERT_ORDER_SQL）
+        order_data['version'] = clock.now()
+        return order_data
+
     def save_order(self, order: Order):
         """保存订单信息"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
+        conn, lock = self._order_write_conn()
+        row = self._order_to_row(order)
         
-        try:
+        with lock:
+            cursor = conn.cursor()
+            try:
+                cursor.execute(self._UPSERT_ORDER_SQL, row)
+                conn.commit()
+                
+            except Exception:
+                conn.rollback()
+                raise
+            self._rows_written([row])
 
-            order_data = {k:trans_to_dict(v) for k,v in asdict(order).items()}
-            order_data['price'] = round(order_data['price'],3)
-            order_data['update_time'] = datetime.now().isoformat()
-            
-            cursor.execute('''
-            INSERT OR REPLACE INTO orders (
-                order_id, symbol, direction, price, volume,
-                status, create_time, filled_volume,
-                trader_platform, is_active, order_type,
-                is_finished, strategy_name, traded_price, execution_strategy, parent_id
-            ) VALUES (
-                :order_id, :symbol, :direction, :price, :volume,
-                :status, :create_time, :filled_volume,
-                :trader_platform, :is_active, :order_type, 
-                :is_finished, :strategy_name, :traded_price, :execution_strategy, :parent_id
-            )
-            ''', order_data)
-            
-            conn.commit()
-            
-        except Exception as e:
-            conn.rollback()
-            raise
-        finally:
-            conn.close()
+    def save_orders(self, orders) -> List[tuple]:
+        """批量保存订单，所有订单在同一个事务中写入
+
+        Args:
+            orders: 可迭代的Order对象
+
+        Returns:
+            List[tuple]: 写入失败的订单列表，元素为 (order_id, 错误信息)
+        """
+        failures = []
+        rows = []
+        for order in orders:
+            try:
+                rows.append(self._order_to_row(order))
+            except Exception as e:
+                failures.append((getattr(order, 'order_id', None), str(e)))
+        if not rows:
+            return failures
+
+        conn, lock = self._order_write_conn()
+        with lock:
+            cursor = conn.cursor()
+            try:
+                cursor.executemany(self._UPSERT_ORDER_SQL, rows)
+                conn.commit()
+                saved = rows
+            except sqlite3.Error:
+                # 整批写入失败时回滚，逐条重试以定位出错的行，仍只提交一次
+                conn.rollback()
+                saved = []
+                for row in rows:
+                    try:
+                        cursor.execute(self._UPSERT_ORDER_SQL, row)
+                        saved.append(row)
+                    except sqlite3.Error as e:
+                        failures.append((row.get('order_id'), str(e)))
+                conn.commit()
+            self._rows_written(saved)
+        return failures
+
+    def save_orders_versioned(self, orders) -> tuple:
+        """批量写入从其他节点同步来的订单，只有版本比本地新的订单才覆盖
+
+        所有订单用一条 executemany 的UPSERT写入，由 WHERE excluded.version > orders.version
+        在数据库内比较版本，整批一个事务，不需要逐个读取本地订单。
+
+        Args:
+            orders: 可迭代的 (Order, 版本号)
+
+        Returns:
+            tuple: (实际写入的order_id集合, 写入失败的 (order_id, 错误信息) 列表)
+        """
+        failures = []
+        rows = []
+        for order, version in orders:
+            try:
+                row = self._order_to_row(order)
+                row['order_id'] = str(row['order_id'])
+                row['version'] = version
+                rows.append(row)
+            except Exception as e:
+                failures.append((getattr(order, 'order_id', None), str(e)))
+        if not rows:
+            return set(), failures
+
+        conn, lock = self._order_write_conn()
+        with lock:
+            cursor = conn.cursor()
+            try:
+                cursor.executemany(self._UPSERT_VERSIONED_SQL, rows)
+                # 版本与本批相同的行即为本批写入的
+                versions = {}
+                for i in range(0, len(rows), 500):
+                    chunk = [row['order_id'] for row in rows[i:i + 500]]
+                    cursor.execute(f"SELECT order_id, version FROM orders WHERE order_id IN "
+                                   f"({','.join('?' * len(chunk))})", chunk)
+                    versions.update(cursor.fetchall())
+                conn.commit()
+            except sqlite3.Error as e:
+                conn.rollback()
+                return set(), failures + [(row['order_id'], str(e)) for row in rows]
+            written = [row for row in rows if versions.get(row['order_id']) == row['version']]
+            self._rows_written(written)
+        return {row['order_id'] for row in written}, failures
+
+    # update_order_fields 允许修改的列，取值为 _serialize_order 的格式
+    _UPDATABLE_COLUMNS = (
+        'symbol', 'direction', 'price', 'volume', 'status', 'create_time', 'filled_volume',
+        'trader_platform', 'is_active', 'order_type', 'is_finished', 'strategy_name',
+        'traded_price', 'execution_strategy', 'parent_id',
+    )
+
+    def update_order_fields(self, updates) -> Dict[str, Order]:
+        """在一个事务中只更新订单的部分列
+
+        Args:
+            updates: 可迭代的 (order_id, {列名: 值})，值为 _serialize_order 的格式；
+                含 version 时只更新版本比它旧的订单并写入该版本
+
+        Returns:
+            Dict[str, Order]: 更新后的订单，数据库中不存在的订单不在其中
+        """
+        conn, lock = self._order_write_conn()
+        updated = set()
+        with lock:
+            cursor = conn.cursor()
+            try:
+                for order_id, fields in updates:
+                    columns = [name for name in fields if name in self._UPDATABLE_COLUMNS]
+                    if not columns:
+                        continue
+                    params = [fields[name] for name in columns]
+                    for name in ('price', 'traded_price'):
+                        if name in columns:
+                            # 与 _order_to_row 一致
+                            params[columns.index(name)] = round_price(fields[name])
+                    assignments = ', '.join(f'{name} = ?' for name in columns)
+                    version = fields.get('version')
+                    if version is None:
+                        cursor.execute(f'UPDATE orders SET {assignments}, update_time = ?, '
+                                       f'version = MAX(?, version + 1) WHERE order_id = ?',
+                                       (*params, datetime.now().isoformat(), clock.now(), str(order_id)))
+                    else:
+                        cursor.execute(f'UPDATE orders SET {assignments}, update_time = ?, version = ? '
+                                       f'WHERE order_id = ? AND version < ?',
+                                       (*params, datetime.now().isoformat(), version, str(order_id), version))
+                    if cursor.rowcount:
+                        updated.add(str(order_id))
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+            if not updated:
+                return {}
+            # 重新读取更新后的完整行，同时用于更新缓存和订单簿
+            placeholders = ','.join('?' * len(updated))
+            cursor.execute(f'SELECT * FROM orders WHERE order_id IN ({placeholders})', tuple(updated))
+            names = [description[0] for description in cursor.description]
+            rows = [dict(zip(names, row)) for row in cursor.fetchall()]
+            self._rows_written(rows)
+        orders = {}
+        for row in rows:
+            try:
+                orders[row['order_id']] = trans_order_to_dict(row, {k: k for k in row})
+            except Exception as e:
+                print(f"处理订单行时出错: {e}")
+        return orders
+
+    def _encode_event(self, event: Event) -> tuple:
+        """序列化事件，返回 (event_type, data, timestamp, parent_id, codec, 是否需要按parent_id更新)"""
+        data = event.data
+        # Order事件按配置的格式编码，其他数据退回JSON
+        codec, event_data = encode_event_data(self._event_codec, data)
+        # 只有当事件类型为ORDER且存在parent_id时才进行更新操作
+        upsert = (event.type == EventType.ORDER and data.parent_id) or (data.status == OrderStatus.CANCELLED.value)
+        return event.type.value, event_data, event.timestamp.isoformat(), data.parent_id, codec, bool(upsert)
+
+    def _write_event(self, cursor: sqlite3.Cursor, event_type: str, event_data,
+                     timestamp: str, parent_id: Optional[str], codec: int, upsert: bool):
+        """在当前事务中写入一条事件"""
+        if upsert:
+            cursor.execute(self._UPDATE_EVENT_SQL, (
+                event_data,
+                timestamp,
+                codec,
+                event_type,
+                parent_id
+            ))
+            if cursor.rowcount > 0:
+                return
+        cursor.execute('''
+        INSERT INTO events (event_type, data, timestamp, parent_id, codec) 
+        VALUES (?, ?, ?, ?, ?)
+        ''', (
+            event_type,
+            event_data,
+            timestamp,
+            parent_id,
+            codec
+        ))
     
     def save_event(self, event: Event):
-        """保存事件信息"""
+        """保存事件信息
+
+        启用异步写入时只放入队列，队列满时按写入器的策略阻塞或丢弃
+        """
+        if self.event_writer is not None:
+            self.event_writer.submit(event)
+            return
+        
+        # events表在迁移步骤中创建，这里不再逐次检查
+        conn = self._get_conn()
         try:
-            conn = sqlite3.connect(self.db_path)
             cursor = conn.cursor()
-            
-            # 检查events表是否存在
-            cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='events'")
-            if not cursor.fetchone():
-                # 如果表不存在，创建它
-                cursor.execute('''
-                CREATE TABLE IF NOT EXISTS events (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    event_type TEXT,
-                    data TEXT,
-                    timestamp TEXT
-                )
-                ''')
-                conn.commit()
-            
-            # 使用自定义 JSON 编码器序列化事件数据
-            data = event.data
-        
-            # 转换 NumPy 类型
-            data_dict = asdict(data)
-            for key, value in data_dict.items():
-                if hasattr(value, "dtype") and hasattr(value, "item"):
-                    data_dict[key] = value.item()
-            
-            event_data = json.dumps(data_dict, cls=EnumEncoder)
-            # 只有当事件类型为ORDER且存在parent_id时才进行更新操作
-            if (event.type == EventType.ORDER and data.parent_id) or (data.status == OrderStatus.CANCELLED.value):
-                cursor.execute('''
-                UPDATE events 
-                SET data = ?, timestamp = ?
-                WHERE event_type = ? 
-                AND json_extract(data, '$.parent_id') = ?
-                AND event_type = 'ORDER'  -- 确保只更新ORDER类型的事件
-                ''', (
-                    event_data,
-                    event.timestamp.isoformat(),
-                    event.type.value,
-                    data.parent_id
-                ))
-                
-                if cursor.rowcount == 0:
-                    cursor.execute('''
-                    INSERT INTO events (event_type, data, timestamp) 
-                    VALUES (?, ?, ?)
-                    ''', (
-                        event.type.value,
-                        event_data,
-                        event.timestamp.isoformat()
-                    ))
-            else:
-                # 对于其他类型的事件，直接插入
-                cursor.execute('''
-                INSERT INTO events (event_type, data, timestamp) 
-                VALUES (?, ?, ?)
-                ''', (
-                    event.type.value,
-                    event_data,
-                    event.timestamp.isoformat()
-                ))
-            
+            self._write_event(cursor, *self._encode_event(event))
             conn.commit()
         except Exception as e:
             print(f"保存事件失败: {e}")
             traceback.print_exc()
-        finally:
-            conn.close()
+            conn.rollback()
+
+    def save_events(self, events) -> List[tuple]:
+        """批量保存事件，所有事件在同一个事务中写入
+
+        Args:
+            events: 可迭代的Event对象
+
+        Returns:
+            List[tuple]: 写入失败的事件列表，元素为 (事件索引, 错误信息)；
+                整个事务失败时返回 [(None, 错误信息)]
+        """
+        failures = []
+        inserts = []
+        conn = self._get_conn()
+        cursor = conn.cursor()
+        try:
+            if not conn.in_transaction:
+                cursor.execute('BEGIN')
+            for i, event in enumerate(events):
+                try:
+                    encoded = self._encode_event(event)
+                except Exception as e:
+                    failures.append((i, str(e)))
+                    continue
+                if not encoded[5]:
+                    inserts.append((i, encoded[:5]))
+                    continue
+                # 需要按parent_id覆盖的事件逐条执行，用保存点隔离单条失败
+                cursor.execute('SAVEPOINT save_event')
+                try:
+                    self._write_event(cursor, *encoded)
+                except sqlite3.Error as e:
+                    cursor.execute('ROLLBACK TO SAVEPOINT save_event')
+                    failures.append((i, str(e)))
+                cursor.execute('RELEASE SAVEPOINT save_event')
+            if inserts:
+                cursor.executemany('''
+                INSERT INTO events (event_type, data, timestamp, parent_id, codec) 
+                VALUES (?, ?, ?, ?, ?)
+                ''', [row for _, row in inserts])
+            conn.commit()
+        except Exception as e:
+            print(f"批量保存事件失败: {e}")
+            traceback.print_exc()
+            conn.rollback()
+            failures = [(None, str(e))]
+        return failures
         
+    def get_events(self, event_type: EventType = None, start_time: datetime = None,
+                   end_time: datetime = None, limit: int = 1000) -> List[dict]:
+        """获取事件记录，按时间降序排列，data按各行的编码格式解码为字典"""
+        conditions = []
+        params = []
+        if event_type is not None:
+            conditions.append('event_type = ?')
+            params.append(event_type.value)
+        if start_time is not None:
+            conditions.append('timestamp >= ?')
+            params.append(start_time.isoformat())
+        if end_time is not None:
+            conditions.append('timestamp <= ?')
+            params.append(end_time.isoformat())
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ''
+        query = f'SELECT id, event_type, data, timestamp, codec FROM events {where} ORDER BY timestamp DESC LIMIT ?'
+        
+        events = []
+        try:
+            rows = self._get_conn().execute(query, (*params, limit)).fetchall()
+            for event_id, event_type_value, data, timestamp, codec in rows:
+                try:
+                    events.append({
+                        'id': event_id,
+                        'event_type': event_type_value,
+                        'data': decode_event_data(codec, data),
+                        'timestamp': timestamp,
+                    })
+                except Exception as e:
+                    print(f"解析事件 {event_id} 失败: {e}")
+            return events
+        except Exception as e:
+            print(f"获取事件失败: {e}")
+            traceback.print_exc()
+            return []
+
     def get_order(self, order_id: str) -> Optional[Order]:
         """获取订单信息"""
-        conn = sqlite3.connect(self.db_path)
+        conn = self._get_conn()
         cursor = conn.cursor()
         
         try:
+            with self._cache_lock():
+                cache = self._get_cache()
+                if cache is not None:
+                    order = cache.get(order_id)
+                    if order is not None:
+                        return order
+            
             cursor.execute('SELECT * FROM orders WHERE order_id = ?', (order_id,))
             
             # 获取列名
@@ -327,80 +1018,37 @@ class DataStorage:
             print(f"获取订单失败: {e}")
             traceback.print_exc()
             return None
-        
-        finally:
-            conn.close()
 
     def get_active_orders(self) -> List[Order]:
         """获取当天的活动订单和已完成订单，按时间降序排列"""
-        conn = sqlite3.connect(self.db_path)
+        conn = self._get_conn()
         cursor = conn.cursor()
         
         try:
+            with self._cache_lock():
+                cache = self._get_cache()
+                if cache is not None:
+                    return cache.active_orders()
+            
             today = datetime.now().date()
             start_time = datetime.combine(today, datetime.min.time())
             end_time = datetime.combine(today, datetime.max.time())
             
-            # 首先检查数据库中的状态值
-            cursor.execute('''
-                SELECT DISTINCT status FROM orders
-                WHERE create_time >= ? 
-                AND create_time <= ?
-            ''', (start_time.isoformat(), end_time.isoformat()))
-            
-            # statuses = cursor.fetchall()
-            # print(f"数据库中的状态值: {statuses}")
-            
-            # 修改查询语句并打印参数
-            query = '''
-                SELECT * FROM orders 
-                WHERE (is_active = 1 
-                      OR is_finished = 1 
-                      OR status = ?) 
-                AND create_time >= ? 
-                AND create_time <= ?
-                ORDER BY create_time DESC
-            '''
+            query = self._ACTIVE_ORDERS_SQL
             params = (OrderStatus.CANCELLED.value, start_time.isoformat(), end_time.isoformat())
             # print(f"查询参数: {params}")
             
             cursor.execute(query, params)
-            
-            # 获取列名
-            column_names = [description[0] for description in cursor.description]
-            column_map = {name: i for i, name in enumerate(column_names)}
-            
-            rows = cursor.fetchall()
-            # print(f"\n找到 {len(rows)} 条订单")
-            
-            # 打印每个订单的状态
-            # for row in rows:
-                # status_idx = column_map['status']
-                # print(f"订单状态: {row[status_idx]}")
-            
-            orders = []
-            for row in rows:
-                try:
-                    order = trans_order_to_dict(row, column_map)
-                    orders.append(order)
-                except Exception as e:
-                    print(f"处理订单行时出错: {e}")
-                    traceback.print_exc()
-                    continue
-            
-            return orders
+            return self._rows_to_orders(cursor)
         
         except Exception as e:
             print(f"获取活动订单失败: {e}")
             traceback.print_exc()
             return []
-        
-        finally:
-            conn.close()
     
     def get_order_history(self, start_time: datetime = None, end_time: datetime = None) -> List[Order]:
         """获取历史订单"""
-        conn = sqlite3.connect(self.db_path)
+        conn = self._get_conn()
         cursor = conn.cursor()
         
         try:
@@ -410,50 +1058,220 @@ class DataStorage:
             if not end_time:
                 end_time = datetime.now()
             
-            query = '''
-                SELECT * FROM orders 
-                WHERE create_time >= ? 
-                AND create_time <= ?
-                ORDER BY create_time DESC
-            '''
+            query = self._ORDER_HISTORY_SQL
             
             cursor.execute(query, (start_time.isoformat(), end_time.isoformat()))
+            orders = self._rows_to_orders(cursor)
+            archived = self._get_archived_orders(start_time, end_time, {o.order_id for o in orders})
+            if archived:
+                orders.extend(archived)
+                # 与SQL一致按ISO字符串降序
+                orders.sort(key=lambda o: o.create_time.isoformat(), reverse=True)
+            return orders
             
-            # 获取列名
-            column_names = [description[0] for description in cursor.description]
-            # 创建列名到索引的映射
-            column_map = {name: i for i, name in enumerate(column_names)}
-            
-            rows = cursor.fetchall()
-            
-            orders = []
+        except Exception as e:
+            print(f"获取历史订单失败: {e}")
+            traceback.print_exc()
+            return []
+
+    def get_order_history_frame(self, start_time: datetime = None, end_time: datetime = None) -> OrderFrame:
+        """按列读取历史订单，时间范围和排序与 get_order_history 一致
+
+        大量订单只做统计或筛选时使用，避免逐行构造Order对象
+        """
+        # 如果没有指定时间范围，默认获取最近7天的订单
+        if not start_time:
+            start_time = datetime.now() - timedelta(days=7)
+        if not end_time:
+            end_time = datetime.now()
+        column_list = ', '.join(FRAME_COLUMNS)
+        column_map = {name: i for i, name in enumerate(FRAME_COLUMNS)}
+        start_iso, end_iso = start_time.isoformat(), end_time.isoformat()
+        try:
+            rows = self._get_conn().execute(
+                f'SELECT {column_list} FROM orders WHERE create_time >= ? AND create_time <= ? '
+                f'ORDER BY create_time DESC', (start_iso, end_iso)).fetchall()
+            frame = OrderFrame.from_rows(rows, column_map)
+            archived = self.archive.query_orders(start_iso, end_iso, start_time, end_time, column_list)
+            if not any(part_rows for _, part_rows in archived):
+                return frame
+            hot_ids = set(frame.columns['order_id'].tolist())
+            frames = [frame] + [
+                OrderFrame.from_rows([r for r in part_rows if r[column_map['order_id']] not in hot_ids], column_map)
+                for _, part_rows in archived
+            ]
+            return OrderFrame.concat(frames).sort_by_time()
+        except Exception as e:
+            print(f"获取历史订单失败: {e}")
+            traceback.print_exc()
+            return OrderFrame.from_rows([], column_map)
+
+    def _get_archived_orders(self, start_time: datetime, end_time: datetime, exclude_ids) -> List[Order]:
+        """从与时间范围重叠的归档分区读取订单，跳过主库中已存在的订单"""
+        orders = []
+        for column_map, rows in self.archive.query_orders(
+                start_time.isoformat(), end_time.isoformat(), start_time, end_time):
+            id_idx = column_map['order_id']
             for row in rows:
+                if row[id_idx] in exclude_ids:
+                    continue
                 try:
-                    # 使用列名映射获取数据
-                    order = trans_order_to_dict(row,column_map)
-                    orders.append(order)
+                    orders.append(trans_order_to_dict(row, column_map))
                 except Exception as e:
-                    print(f"处理订单行时出错: {e}")
+                    print(f"处理归档订单行时出错: {e}")
                     traceback.print_exc()
-                    continue
-            
-            return orders
-            
+        return orders
+
+    @staticmethod
+    def _time_range_params(start_time: datetime = None, end_time: datetime = None) -> tuple:
+        """聚合查询的时间范围参数，未指定时不限制"""
+        return (start_time.isoformat() if start_time else '',
+                end_time.isoformat() if end_time else '9999-12-31T23:59:59.999999')
+
+    def _aggregate(self, sql: str, start_time: datetime = None, end_time: datetime = None) -> List[dict]:
+        """在主库和与时间范围重叠的归档分区上执行聚合查询，返回各库的结果行"""
+        params = self._time_range_params(start_time, end_time)
+        cursor = self._get_conn().execute(sql, params)
+        column_names = [description[0] for description in cursor.description]
+        rows = [dict(zip(column_names, row)) for row in cursor.fetchall()]
+        for column_map, part_rows in self.archive.query(sql, params, start_time, end_time):
+            names = sorted(column_map, key=column_map.get)
+            rows.extend(dict(zip(names, row)) for row in part_rows)
+        return rows
+
+    @staticmethod
+    def _merge_sums(rows: List[dict], key: str) -> Dict[str, dict]:
+        """按key合并各库的聚合结果，其余列相加"""
+        merged = {}
+        for row in rows:
+            total = merged.get(row[key])
+            if total is None:
+                merged[row[key]] = dict(row)
+                continue
+            for name, value in row.items():
+                if name != key:
+                    total[name] = (total[name] or 0) + (value or 0)
+        return merged
+
+    def get_best_fill_by_parent(self, start_time: datetime = None, end_time: datetime = None) -> List[Order]:
+        """每个parent_id下成交量最大的订单（相同时取最新的），按创建时间降序"""
+        try:
+            params = self._time_range_params(start_time, end_time)
+            orders = self._rows_to_orders(self._get_conn().execute(self._BEST_FILL_BY_PARENT_SQL, params))
+            archived = self.archive.query(self._BEST_FILL_BY_PARENT_SQL, params, start_time, end_time)
+            if not any(rows for _, rows in archived):
+                return orders
+            # 同一母单的子单跨分区时再比较一次
+            for column_map, rows in archived:
+                for row in rows:
+                    try:
+                        orders.append(trans_order_to_dict(row, column_map))
+                    except Exception as e:
+                        print(f"处理归档订单行时出错: {e}")
+            best = {}
+            for order in sorted(orders, key=lambda o: o.create_time.isoformat(), reverse=True):
+                current = best.get(order.parent_id)
+                if current is None or (order.filled_volume or 0) > (current.filled_volume or 0):
+                    best[order.parent_id] = order
+            return sorted(best.values(), key=lambda o: o.create_time.isoformat(), reverse=True)
         except Exception as e:
-            print(f"获取历史订单失败: {e}")
+            print(f"获取母单最大成交订单失败: {e}")
+            traceback.print_exc()
+            return []
+
+    def get_strategy_volume(self, start_time: datetime = None, end_time: datetime = None) -> List[dict]:
+        """按策略统计订单数、委托量、成交量、成交额、成交率及成交额占比，按成交额降序"""
+        try:
+            stats = list(self._merge_sums(
+                self._aggregate(self._STRATEGY_VOLUME_SQL, start_time, end_time), 'strategy_name').values())
+            total_notional = sum(row['notional'] for row in stats)
+            for row in stats:
+                row['fill_rate'] = row['filled_volume'] / row['volume'] if row['volume'] else None
+                row['notional_share'] = row['notional'] / total_notional if total_notional else None
+            stats.sort(key=lambda row: row['notional'], reverse=True)
+            return stats
+        except Exception as e:
+            print(f"获取策略成交统计失败: {e}")
+            traceback.print_exc()
+            return []
+
+    def get_symbol_vwap(self, start_time: datetime = None, end_time: datetime = None) -> List[dict]:
+        """按证券代码统计成交量、成交额和按traded_price加权的成交均价"""
+        try:
+            stats = list(self._merge_sums(
+                self._aggregate(self._SYMBOL_VWAP_SQL, start_time, end_time), 'symbol').values())
+            for row in stats:
+                row['vwap'] = row['notional'] / row['filled_volume'] if row['filled_volume'] else None
+            stats.sort(key=lambda row: row['notional'], reverse=True)
+            return stats
+        except Exception as e:
+            print(f"获取成交均价失败: {e}")
+            traceback.print_exc()
+            return []
+
+    def get_status_counts(self, start_time: datetime = None, end_time: datetime = None) -> Dict[str, int]:
+        """各订单状态的订单数"""
+        try:
+            merged = self._merge_sums(self._aggregate(self._STATUS_COUNTS_SQL, start_time, end_time), 'status')
+            return {status: row['order_count'] for status, row in merged.items()}
+        except Exception as e:
+            print(f"获取订单状态统计失败: {e}")
+            traceback.print_exc()
+            return {}
+
+    def get_orders_by_parent(self, parent_id: str) -> List[Order]:
+        """获取当天同一母单下的所有子订单"""
+        with self._cache_lock():
+            cache = self._get_cache()
+            if cache is not None:
+                return cache.by_parent(parent_id)
+        return [o for o in self._get_day_orders() if o.parent_id == parent_id]
+
+    def get_orders_by_strategy(self, strategy_name: str) -> List[Order]:
+        """获取当天某个策略的所有订单"""
+        with self._cache_lock():
+            cache = self._get_cache()
+            if cache is not None:
+                return cache.by_strategy(strategy_name)
+        return [o for o in self._get_day_orders() if o.strategy_name == strategy_name]
+
+    def get_orders_grouped_by_parent(self) -> Dict[str, List[Order]]:
+        """按parent_id分组返回当天的订单，没有parent_id的订单不包含在内"""
+        with self._cache_lock():
+            cache = self._get_cache()
+            if cache is not None:
+                return cache.group_by_parent()
+        groups = {}
+        for order in self._get_day_orders():
+            if order.parent_id:
+                groups.setdefault(order.parent_id, []).append(order)
+        return groups
+
+    def _get_day_orders(self) -> List[Order]:
+        """从数据库读取当天的所有订单"""
+        try:
+            today = datetime.now().date()
+            start_time = datetime.combine(today, datetime.min.time())
+            end_time = datetime.combine(today, datetime.max.time())
+            cursor = self._get_conn().execute(self._DAY_ORDERS_SQL, (start_time.isoformat(), end_time.isoformat()))
+            return self._rows_to_orders(cursor)
+        except Exception as e:
+            print(f"获取当天订单失败: {e}")
             traceback.print_exc()
             return []
-            
-        finally:
-            conn.close()
 
     def clear_old_orders(self, days: int = 30):
         """清理指定天数之前的订单数据"""
-        conn = sqlite3.connect(self.db_path)
+        conn = self._get_conn()
         cursor = conn.cursor()
         
         try:
             cutoff_date = (datetime.now() - timedelta(days=days)).isoformat()
+            if conn.in_transaction:
+                conn.commit()
+            # 立即获取写锁，保证读取的变更序号之后只有本事务产生的墓碑
+            conn.execute('BEGIN IMMEDIATE')
+            seq_before = conn.execute('SELECT seq FROM order_change_seq WHERE id = 1').fetchone()[0]
             
             cursor.execute('''
                 DELETE FROM orders 
@@ -461,12 +1279,105 @@ class DataStorage:
             ''', (cutoff_date,))
             
             deleted_count = cursor.rowcount
+            # 清理历史不需要通知下游，同时删除过期的墓碑记录
+            cursor.execute('''
+                DELETE FROM order_tombstones 
+                WHERE change_seq > ? OR deleted_time < ?
+            ''', (seq_before, cutoff_date))
             conn.commit()
+            if self._cache is not None:
+                self._cache.clear()
             print(f"已清理 {deleted_count} 条历史订单")
             
         except Exception as e:
             print(f"清理历史订单失败: {e}")
             conn.rollback()
-            
-        finally:
-            conn.close() 
\ No newline at end of file
+
+    def archive_old_orders(self, keep_days: int = 1) -> Dict[str, int]:
+        """将已结束交易日的订单和事件移入按月分区的归档库
+
+        Args:
+            keep_days: 主库保留的天数（含当天），默认只保留当天
+
+        Returns:
+            Dict[str, int]: 归档的订单数和事件数
+        """
+        cutoff = datetime.combine(datetime.now().date() - timedelta(days=keep_days - 1), datetime.min.time())
+        conn = self._get_conn()
+        try:
+            counts = self.archive.archive(conn, cutoff.isoformat(),
+                                          self._ORDERS_TABLE_SQL, self._EVENTS_TABLE_SQL)
+            print(f"[OK] 已归档 {counts['orders']} 条订单、{counts['events']} 条事件到 {self.archive.archive_dir}")
+            return counts
+        except Exception as e:
+            print(f"[ERROR] 归档历史数据失败: {e}")
+            traceback.print_exc()
+            return {'orders': 0, 'events': 0}
+
+    def current_change_seq(self) -> int:
+        """当前最新的订单变更序号，可作为 changes_since 的起始游标"""
+        row = self._get_conn().execute('SELECT seq FROM order_change_seq WHERE id = 1').fetchone()
+        return row[0] if row else 0
+
+    def changes_since(self, cursor: int = 0):
+        """按变更序号升序返回游标之后新增、修改或删除的订单
+
+        Args:
+            cursor: 上次处理到的变更序号
+
+        Yields:
+            tuple: (change_seq, order_id, order)，订单被删除时order为None
+        """
+        conn = self._get_conn()
+        order_cursor = conn.execute(
+            'SELECT * FROM orders WHERE change_seq > ? ORDER BY change_seq', (cursor,))
+        column_names = [description[0] for description in order_cursor.description]
+        column_map = {name: i for i, name in enumerate(column_names)}
+        seq_idx = column_map['change_seq']
+        order_rows = order_cursor.fetchall()
+        tombstones = conn.execute(
+            'SELECT change_seq, order_id FROM order_tombstones WHERE change_seq > ? ORDER BY change_seq',
+            (cursor,)).fetchall()
+
+        changed = ((row[seq_idx], False, row) for row in order_rows)
+        deleted = ((seq, True, order_id) for seq, order_id in tombstones)
+        for seq, is_deleted, item in heapq.merge(changed, deleted, key=lambda x: x[0]):
+            if is_deleted:
+                yield seq, item, None
+                continue
+            try:
+                yield seq, item[column_map['order_id']], trans_order_to_dict(item, column_map)
+            except Exception as e:
+                print(f"处理订单行时出错: {e}")
+                traceback.print_exc()
+
+    def explain_queries(self) -> Dict[str, List[str]]:
+        """对主要查询执行 EXPLAIN QUERY PLAN，返回每个查询的执行计划"""
+        now = datetime.now().isoformat()
+        queries = {
+            'get_order': ('SELECT * FROM orders WHERE order_id = ?', ('',)),
+            'get_active_orders': (self._ACTIVE_ORDERS_SQL, (OrderStatus.CANCELLED.value, now, now)),
+            'get_order_history': (self._ORDER_HISTORY_SQL, (now, now)),
+            'orders_by_parent': ('SELECT * FROM orders WHERE parent_id = ?', ('',)),
+            'changes_since': ('SELECT * FROM orders WHERE change_seq > ? ORDER BY change_seq', (0,)),
+            'update_event': (self._UPDATE_EVENT_SQL, ('', now, 0, EventType.ORDER.value, '')),
+        }
+        conn = self._get_conn()
+        plans = {}
+        for name, (sql, params) in queries.items():
+            rows = conn.execute(f'EXPLAIN QUERY PLAN {sql}', params).fetchall()
+            plans[name] = [row[-1] for row in rows]
+        return plans
+
+    def check_query_plans(self) -> bool:
+        """检查主要查询是否都命中索引，打印执行计划，存在全表扫描时返回False"""
+        ok = True
+        for name, details in self.explain_queries().items():
+            # 不带索引的 SCAN 表示全表扫描
+            full_scan = [d for d in details if d.startswith('SCAN') and 'INDEX' not in d]
+            status = '[WARNING]' if full_scan else '[OK]'
+            ok = ok and not full_scan
+            print(f"{status} {name}")
+            for detail in details:
+                print(f"    {detail}")
+        return ok
@@ -0,0 +1,144 @@
+import csv
+import json
+import os
+from dataclasses import dataclass
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, Optional
+
+from app.oms.constant import SecurityType, infer_security_type
+
+# 默认的证券信息文件，可通过 SYMBOL_METADATA_PATH 环境变量指定其他文件
+DEFAULT_METADATA_PATHS = (
+    Path(__file__).resolve().parents[2] / 'data' / 'symbols.csv',
+    Path(__file__).resolve().parents[2] / 'data' / 'symbols.json',
+)
+
+# 按代码规则推断时各类证券的交易单位和最小价格变动
+_LOT_SIZE = {SecurityType.STOCK: 100, SecurityType.ETF: 100, SecurityType.BOND: 10}
+_TICK_SIZE = {SecurityType.STOCK: 0.01, SecurityType.ETF: 0.001, SecurityType.BOND: 0.001}
+
+
+@dataclass(frozen=True)
+class SymbolInfo:
+    """证券基础信息"""
+    symbol: str
+    security_type: SecurityType
+    exchange: str  # SH/SZ/BJ，无法判断时为空
+    lot_size: int
+    tick_size: float
+    name: str = ""
+
+
+def infer_exchange(symbol: str) -> str:
+    """根据代码判断交易所，代码带 .SH/.SZ/.BJ 后缀时以后缀为准"""
+    code, _, suffix = symbol.partition('.')
+    if suffix:
+        return suffix.upper()
+    # 11开头为上交所可转债，其余1开头（15x基金、12x可转债）为深交所
+    if code.startswith(('5', '6', '9', '11')):
+        return 'SH'
+    if code.startswith(('0', '1', '2', '3')):
+        return 'SZ'
+    if code.startswith(('4', '8')):
+        return 'BJ'
+    return ''
+
+
+@lru_cache(maxsize=65536)
+def infer_symbol_info(symbol: str) -> SymbolInfo:
+    """按代码规则推断证券信息，用于证券信息文件中没有的代码"""
+    security_type = infer_security_type(symbol)
+    return SymbolInfo(
+        symbol=symbol,
+        security_type=security_type,
+        exchange=infer_exchange(symbol),
+        lot_size=_LOT_SIZE[security_type],
+        tick_size=_TICK_SIZE[security_type],
+    )
+
+
+class SymbolRegistry:
+    """证券信息表，启动时从CSV/JSON文件加载，文件中没有的代码按代码规则推断
+
+    CSV需包含 symbol 列，可选 security_type、exchange、lot_size、tick_size、name 列；
+    JSON为同样字段的对象列表，或以代码为键的对象。缺少的字段按代码规则补齐。
+    """
+    def __init__(self):
+        self._symbols: Dict[str, SymbolInfo] = {}
+        self.path: Optional[Path] = None
+
+    def __len__(self) -> int:
+        return len(self._symbols)
+
+    def load(self, path) -> int:
+        """加载证券信息文件，替换已加载的内容，返回加载的代码数量"""
+        path = Path(path)
+        if path.suffix.lower() == '.json':
+            with open(path, encoding='utf-8') as f:
+                data = json.load(f)
+            if isinstance(data, dict):
+                rows = [dict(value, symbol=key) for key, value in data.items()]
+            else:
+                rows = data
+        else:
+            with open(path, encoding='utf-8-sig', newline='') as f:
+                rows = list(csv.DictReader(f))
+
+        symbols = {}
+        for row in rows:
+            symbol = str(row.get('symbol') or '').strip()
+            if not symbol:
+                continue
+            try:
+                symbols[symbol] = self._parse(symbol, row)
+            except (KeyError, ValueError) as e:
+                print(f"[WARNING] 证券信息 {symbol} 格式错误，按代码规则推断: {e}")
+        self._symbols = symbols
+        self.path = path
+        return len(symbols)
+
+    @staticmethod
+    def _parse(symbol: str, row: dict) -> SymbolInfo:
+        inferred = infer_symbol_info(symbol)
+        security_type = row.get('security_type')
+        return SymbolInfo(
+            symbol=symbol,
+            # 允许填写枚举名（ETF）或取值
+            security_type=(SecurityType[security_type.upper()] if security_type
+                           else inferred.security_type),
+            exchange=(row.get('exchange') or inferred.exchange).upper(),
+            lot_size=int(row.get('lot_size') or inferred.lot_size),
+            tick_size=float(row.get('tick_size') or inferred.tick_size),
+            name=row.get('name') or "",
+        )
+
+    def get(self, symbol: str) -> SymbolInfo:
+        """查询证券信息，文件中没有时按代码规则推断"""
+        info = self._symbols.get(symbol)
+        if info is None:
+            info = infer_symbol_info(symbol)
+        return info
+
+    def security_type(self, symbol: str) -> SecurityType:
+        return self.get(symbol).security_type
+
+
+def _load_default(registry: SymbolRegistry):
+    """加载环境变量或默认位置的证券信息文件，没有文件时只使用代码规则"""
+    env_path = os.getenv('SYMBOL_METADATA_PATH')
+    paths = (Path(env_path),) if env_path else DEFAULT_METADATA_PATHS
+    for path in paths:
+        if path.exists():
+            try:
+                count = registry.load(path)
+                print(f"[OK] 已加载 {count} 条证券信息: {path}")
+            except Exception as e:
+                print(f"[ERROR] 加载证券信息失败 {path}: {e}")
+            return
+    if env_path:
+        print(f"[WARNING] 证券信息文件不存在: {env_path}")
+
+
+symbol_registry = SymbolRegistry()
+_load_default(symbol_registry)
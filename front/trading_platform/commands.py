@@ -2,6 +2,7 @@ from flask.cli import FlaskGroup
 from app import create_app, db
 from app.models import User
 import click
+import os
 
 cli = FlaskGroup(create_app=create_app)
 
@@ -20,5 +21,122 @@ def create_user(username, password):
         click.echo(f'创建用户失败: {str(e)}')
         db.session.rollback()
 
+@cli.command('migrate-db')
+@click.option('--db-path', default=None, help='交易数据库路径，默认使用 TRADING_DATA_PATH 环境变量')
+@click.option('--dry-run', is_flag=True, help='只列出未执行的迁移步骤')
+def migrate_db(db_path, dry_run):
+    """升级交易数据库结构，可在部署时提前执行"""
+    import sqlite3
+    from app.oms.migrations import pending_migrations, run_migrations, schema_version
+    from app.oms.storage import DataStorage
+    db_path = db_path or os.getenv('TRADING_DATA_PATH') or os.getenv('JAILBIRD_DB_PATH')
+    steps = DataStorage.migration_steps()
+    conn = None
+    try:
+        conn = sqlite3.connect(db_path)
+        pending = pending_migrations(conn, steps)
+        click.echo(f'当前版本: {schema_version(conn)}，待执行: {len(pending)}')
+        for version, description, _ in pending:
+            click.echo(f'  {version}: {description}')
+        if pending and not dry_run:
+            conn.execute('PRAGMA journal_mode=WAL')
+            applied = run_migrations(conn, steps)
+            click.echo(f'已升级到版本 {schema_version(conn)}' if applied else '数据库已是最新版本')
+    except Exception as e:
+        click.echo(f'数据库迁移失败: {str(e)}')
+    finally:
+        if conn is not None:
+            conn.close()
+
+@cli.command('check-db-indexes')
+@click.option('--db-path', default=None, help='交易数据库路径，默认使用 TRADING_DATA_PATH 环境变量')
+def check_db_indexes(db_path):
+    """检查订单库主要查询的执行计划是否命中索引"""
+    from app.oms.storage import DataStorage
+    db_path = db_path or os.getenv('TRADING_DATA_PATH') or os.getenv('JAILBIRD_DB_PATH')
+    storage = DataStorage(db_path)
+    try:
+        if storage.check_query_plans():
+            click.echo('所有查询均命中索引')
+        else:
+            click.echo('存在全表扫描的查询')
+    finally:
+        storage.close()
+
+@cli.command('archive-orders')
+@click.option('--db-path', default=None, help='交易数据库路径，默认使用 TRADING_DATA_PATH 环境变量')
+@click.option('--keep-days', default=1, help='主库保留的天数（含当天）')
+def archive_orders(db_path, keep_days):
+    """将已结束交易日的订单和事件移入按月分区的归档库"""
+    from app.oms.storage import DataStorage
+    db_path = db_path or os.getenv('TRADING_DATA_PATH') or os.getenv('JAILBIRD_DB_PATH')
+    storage = DataStorage(db_path)
+    try:
+        counts = storage.archive_old_orders(keep_days)
+        click.echo(f"归档订单 {counts['orders']} 条，事件 {counts['events']} 条")
+    finally:
+        storage.close()
+
+@cli.command('migrate-redis-orders')
+@click.option('--redis-host', default=lambda: os.getenv('REDIS_HOST', 'localhost'), help='Redis地址，默认使用 REDIS_HOST 环境变量')
+@click.option('--redis-port', default=6379)
+@click.option('--redis-db', default=0)
+@click.option('--redis-password', default=lambda: os.getenv('REDIS_PASSWORD'), help='默认使用 REDIS_PASSWORD 环境变量')
+@click.option('--ttl-days', default=3, help='分片在交易日结束后保留的天数')
+@click.option('--delete-source', is_flag=True, help='迁移完成后删除原订单哈希表')
+@click.option('--dry-run', is_flag=True, help='只统计各分片的订单数量')
+def migrate_redis_orders(redis_host, redis_port, redis_db, redis_password, ttl_days, delete_source, dry_run):
+    """将Redis中的单一订单哈希表按交易日和策略拆分为分片"""
+    import redis
+    from app.oms.redis_pool import get_connection_pool
+    from app.oms.redis_sync import migrate_orders_hash
+    client = redis.Redis(connection_pool=get_connection_pool(redis_host, redis_port, redis_db, redis_password))
+    counts = migrate_orders_hash(client, ttl_days=ttl_days, delete_source=delete_source and not dry_run,
+                                 dry_run=dry_run)
+    for shard, count in sorted(counts.items()):
+        click.echo(f'  {shard}: {count}')
+    click.echo(f"{'待迁移' if dry_run else '已迁移'} {sum(counts.values())} 个订单，{len(counts)} 个分片")
+
+@cli.command('bench-event-codec')
+@click.option('--count', default=10000, help='参与测试的订单数量')
+def bench_event_codec(count):
+    """对比事件数据各编码格式的编解码耗时和磁盘占用"""
+    from datetime import datetime
+    from app.oms.codec import benchmark
+    from app.oms.constant import Order, OrderSide, OrderStatus, OrderType
+    orders = [
+        Order(
+            order_id=f'{i:016x}',
+            symbol='510300' if i % 2 else '600000',
+            direction=OrderSide.BUY if i % 2 else OrderSide.SELL,
+            price=3.5 + i % 100 / 1000,
+            volume=100 * (i % 50 + 1),
+            status=OrderStatus.PARTIAL_FILLED,
+            create_time=datetime.now(),
+            filled_volume=100 * (i % 10),
+            trader_platform='qmt',
+            order_type=OrderType.LIMIT,
+            strategy_name='etf_arbitrage',
+            traded_price=3.5,
+            execution_strategy='BasicStrategy',
+            parent_id=f'{i // 10:016x}',
+        )
+        for i in range(count)
+    ]
+    click.echo(f"{'codec':<10}{'encode(us)':>12}{'decode(us)':>12}{'bytes/row':>12}{'db(bytes)':>12}")
+    for result in benchmark(orders):
+        click.echo(f"{result['codec']:<10}{result['encode_us']:>12.2f}{result['decode_us']:>12.2f}"
+                   f"{result['avg_bytes']:>12.1f}{result['db_bytes']:>12}")
+
+@cli.command('bench-order-record')
+@click.option('--count', default=10000, help='参与测试的订单数量')
+def bench_order_record(count):
+    """对比 Order 与 OrderRecord 的构造、事件复制耗时和内存占用"""
+    from app.oms.order_record import benchmark
+    click.echo(f"{'type':<14}{'build(us)':>12}{'clone(us)':>12}{'bytes/obj':>12}")
+    for result in benchmark(count):
+        click.echo(f"{result['type']:<14}{result['build_us']:>12.2f}{result['clone_us']:>12.2f}"
+                   f"{result['bytes']:>12.1f}")
+
 if __name__ == '__main__':
     cli() 
\ No newline at end of file
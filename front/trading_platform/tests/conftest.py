@@ -0,0 +1,31 @@
+import os
+import sys
+import tempfile
+from datetime import datetime
+
+import pytest
+
+# app.oms 导入时会按环境变量打开交易数据库，测试使用临时库
+_tmp_dir = tempfile.mkdtemp(prefix='jailbird-test-')
+os.environ['TRADING_DATA_PATH'] = os.path.join(_tmp_dir, 'trading_data.db')
+os.environ.setdefault('JAILBIRD_DB_PATH', os.environ['TRADING_DATA_PATH'])
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.oms.constant import Order, OrderSide, OrderStatus  # noqa: E402
+
+
+@pytest.fixture
+def make_order():
+    """测试订单的工厂：make_order(order_id='o1', **字段)
+
+    默认为当前时间创建的600000买单；未指定状态时，有成交量为部分成交，否则为已提交
+    """
+    def make(order_id='o1', **fields) -> Order:
+        fields.setdefault('status', OrderStatus.PARTIAL_FILLED if fields.get('filled_volume')
+                          else OrderStatus.SUBMITTED)
+        values = dict(order_id=order_id, symbol='600000', direction=OrderSide.BUY, price=10.0,
+                      volume=100, create_time=datetime.now())
+        values.update(fields)
+        return Order(**values)
+    return make
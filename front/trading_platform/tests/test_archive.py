@@ -0,0 +1,50 @@
+import sqlite3
+import threading
+import time
+from datetime import datetime, timedelta
+
+from app.oms.constant import OrderStatus
+from app.oms.storage import DataStorage
+
+
+def test_history_reads_archive_with_relative_db_path(tmp_path, monkeypatch, make_order):
+    monkeypatch.chdir(tmp_path)
+    storage = DataStorage('trading_data.db')
+    try:
+        old_time = datetime.now() - timedelta(days=3)
+        storage.save_order(make_order(status=OrderStatus.FILLED, create_time=old_time, filled_volume=100,
+                                      is_active=False, is_finished=True))
+        assert storage.archive_old_orders(keep_days=1)['orders'] == 1
+
+        history = storage.get_order_history(old_time - timedelta(hours=1), datetime.now())
+        assert [order.order_id for order in history] == ['o1']
+    finally:
+        storage.close()
+
+
+
+def test_clear_old_orders_keeps_concurrent_tombstones(tmp_path, make_order):
+    db_path = str(tmp_path / 'trading_data.db')
+    storage = DataStorage(db_path)
+    try:
+        storage.save_order(make_order('old', create_time=datetime.now() - timedelta(days=40)))
+        storage.save_order(make_order('new'))
+        storage.save_order(make_order('gone'))
+        cursor = storage.current_change_seq()
+
+        # 另一个连接持有写锁时删除订单，清理需等待其提交
+        other = sqlite3.connect(db_path)
+        other.execute('BEGIN IMMEDIATE')
+        other.execute("DELETE FROM orders WHERE order_id = 'gone'")
+        worker = threading.Thread(target=storage.clear_old_orders, args=(30,))
+        worker.start()
+        time.sleep(0.2)
+        other.commit()
+        other.close()
+        worker.join()
+
+        assert storage.get_order('old') is None and storage.get_order('new') is not None
+        # 只保留并发删除的墓碑，清理本身不产生变更
+        assert [(order_id, order) for _, order_id, order in storage.changes_since(cursor)] == [('gone', None)]
+    finally:
+        storage.close()
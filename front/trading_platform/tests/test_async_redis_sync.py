@@ -0,0 +1,93 @@
+import asyncio
+import os
+
+import pytest
+
+from app.oms.async_redis_sync import AsyncRedisSyncManager
+from app.oms.storage import DataStorage
+
+fakeredis = pytest.importorskip('fakeredis')
+
+
+async def _wait_for(condition, timeout: float = 5.0):
+    deadline = asyncio.get_running_loop().time() + timeout
+    while not condition():
+        assert asyncio.get_running_loop().time() < deadline, '等待同步超时'
+        await asyncio.sleep(0.05)
+
+
+@pytest.mark.parametrize('use_stream, sharded', [(False, False), (True, True)])
+def test_async_managers_round_trip(tmp_path, make_order, use_stream, sharded):
+    local_storage = DataStorage(str(tmp_path / 'local.db'))
+    cloud_storage = DataStorage(str(tmp_path / 'cloud.db'))
+    server = fakeredis.FakeServer()
+
+    async def main():
+        managers = [
+            AsyncRedisSyncManager(storage, fakeredis.FakeAsyncRedis(server=server, decode_responses=True),
+                                  is_cloud=is_cloud, sync_interval=0.1, use_stream=use_stream, sharded=sharded)
+            for storage, is_cloud in ((local_storage, False), (cloud_storage, True))
+        ]
+        tasks = [asyncio.ensure_future(manager.run()) for manager in managers]
+        try:
+            local_storage.save_order(make_order(strategy_name='S'))
+            await _wait_for(lambda: cloud_storage.get_order('o1') is not None)
+
+            cloud_storage.save_order(make_order(strategy_name='S', filled_volume=40))
+            await _wait_for(lambda: local_storage.get_order('o1').filled_volume == 40)
+            # 应用远端更新后不会再推送回去
+            await asyncio.sleep(0.3)
+            assert cloud_storage.get_order('o1').filled_volume == 40
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+        assert not any(manager.running for manager in managers)
+        # 取消时持有发送锁的协程已释放锁
+        assert not any(manager._send_lock.locked() for manager in managers)
+
+    try:
+        asyncio.run(main())
+    finally:
+        local_storage.close()
+        cloud_storage.close()
+
+
+def test_sync_daemons_round_trip(tmp_path, monkeypatch, make_order):
+    pytest.importorskip('watchdog')
+    monkeypatch.setenv('JAILBIRD_DATA_PATH', str(tmp_path / 'account_data'))
+    monkeypatch.syspath_prepend(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+    import sync_combined
+
+    server = fakeredis.FakeServer()
+    monkeypatch.setattr(sync_combined.redis.asyncio, 'Redis',
+                        lambda *args, **kwargs: fakeredis.FakeAsyncRedis(server=server, decode_responses=True))
+    local_db, cloud_db = str(tmp_path / 'local.db'), str(tmp_path / 'cloud.db')
+    writer = DataStorage(local_db)
+    writer.save_order(make_order(strategy_name='S'))
+    local_data, cloud_data = tmp_path / 'local_data', tmp_path / 'cloud_data'
+    local_data.mkdir()
+    cloud_data.mkdir()
+
+    async def main():
+        local = sync_combined.SyncDaemon(is_cloud=False, db_path=local_db, data_path=str(local_data))
+        cloud = sync_combined.SyncDaemon(is_cloud=True, db_path=cloud_db, data_path=str(cloud_data))
+        tasks = [asyncio.ensure_future(local.run())]
+        try:
+            await _wait_for(lambda: local.order_sync is not None and local.order_sync.last_orders)
+            tasks.append(asyncio.ensure_future(cloud.run()))
+            await _wait_for(lambda: cloud.storage is not None and cloud.storage.get_order('o1') is not None)
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    try:
+        asyncio.run(main())
+    finally:
+        writer.close()
+    reader = DataStorage(cloud_db)
+    try:
+        assert reader.get_order('o1').strategy_name == 'S'
+    finally:
+        reader.close()
@@ -0,0 +1,56 @@
+from datetime import datetime
+
+import pytest
+
+from app.oms.constant import Event, EventType
+from app.oms.order_record import OrderRecord, clone_event
+
+
+@pytest.fixture
+def share_payloads():
+    Event.share_payloads = True
+    yield
+    Event.share_payloads = False
+
+
+def test_shared_payload_copied_on_write(share_payloads, make_order):
+    source = Event(EventType.ORDER, make_order(create_time=datetime(2025, 4, 8, 9, 30)))
+    first, second = source.clone(), source.clone()
+    assert first.data is source.data and second.data is source.data
+
+    first.mutable_data().filled_volume = 50
+    second.mutable_data().filled_volume = 70
+
+    assert source.data.filled_volume == 0
+    assert first.data.filled_volume == 50
+    assert second.data.filled_volume == 70
+
+
+def test_copy_mode_isolates_subscribers(make_order):
+    order = make_order(create_time=datetime(2025, 4, 8, 9, 30))
+    source = Event(EventType.ORDER, order)
+    first, second = source.clone(), source.clone()
+
+    first.data.filled_volume = 50
+    second.mutable_data().filled_volume = 70
+
+    assert order.filled_volume == 0
+    assert source.data.filled_volume == 0
+    assert first.data.filled_volume == 50
+    assert second.data.filled_volume == 70
+
+
+def test_clone_event_shares_frozen_record(make_order):
+    record = OrderRecord.from_order(make_order(create_time=datetime(2025, 4, 8, 9, 30)), frozen=True)
+    source = Event(EventType.ORDER, record)
+    first, second = clone_event(source), clone_event(source)
+    assert first.data is record and second.data is record
+
+    with pytest.raises(AttributeError):
+        first.data.filled_volume = 50
+    first.mutable_data().filled_volume = 50
+    second.mutable_data().filled_volume = 70
+
+    assert record.filled_volume == 0
+    assert first.data.filled_volume == 50
+    assert second.data.filled_volume == 70
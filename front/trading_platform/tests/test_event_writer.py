@@ -0,0 +1,17 @@
+from app.oms.constant import Event, EventType
+from app.oms.storage import DataStorage
+
+
+def test_flush_returns_after_stop(tmp_path, make_order):
+    storage = DataStorage(str(tmp_path / 'trading_data.db'), async_events=True)
+    try:
+        storage.save_event(Event(EventType.ORDER, make_order('o1')))
+        storage.event_writer.stop(timeout=5)
+
+        # 写入线程已停止，之后提交的事件同步写入
+        assert storage.event_writer.submit(Event(EventType.ORDER, make_order('o2')))
+        assert storage.flush_events(timeout=1)
+        assert storage.event_writer.stats()['written'] == 2
+        assert len(storage.get_events(EventType.ORDER)) == 2
+    finally:
+        storage.close()
@@ -0,0 +1,31 @@
+import sqlite3
+
+import pytest
+
+from app.oms.storage import DataStorage
+
+
+def test_failed_migration_raises(tmp_path, monkeypatch):
+    db_path = str(tmp_path / 'trading_data.db')
+
+    def broken(cursor):
+        cursor.execute('CREATE TABLE broken (id INTEGER)')
+        raise sqlite3.OperationalError('迁移失败')
+
+    steps = DataStorage.migration_steps() + [(99, '失败的步骤', broken)]
+    monkeypatch.setattr(DataStorage, 'migration_steps', classmethod(lambda cls: steps))
+    with pytest.raises(sqlite3.OperationalError):
+        DataStorage(db_path)
+
+    conn = sqlite3.connect(db_path)
+    try:
+        # 整个迁移已回滚
+        assert conn.execute('PRAGMA user_version').fetchone()[0] == 0
+        assert conn.execute("SELECT name FROM sqlite_master WHERE name = 'broken'").fetchone() is None
+    finally:
+        conn.close()
+
+
+def test_unopenable_database_raises(tmp_path):
+    with pytest.raises(sqlite3.OperationalError):
+        DataStorage(str(tmp_path / 'missing' / 'trading_data.db'))
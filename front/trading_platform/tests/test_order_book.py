@@ -0,0 +1,28 @@
+from app.oms.constant import OrderStatus
+from app.oms.storage import DataStorage
+
+
+def test_book_follows_database_writes(tmp_path, make_order):
+    db_path = str(tmp_path / 'trading_data.db')
+    writer = DataStorage(db_path)
+    reader = DataStorage(db_path, read_only=True, use_order_book=True)
+    try:
+        writer.save_orders([
+            make_order('A', status=OrderStatus.FILLED, filled_volume=100, traded_price=10.0, parent_id='P1'),
+            make_order('B', status=OrderStatus.PARTIAL_FILLED, filled_volume=40, traded_price=11.0, parent_id='P1'),
+        ])
+        book = reader.get_order_book()
+        assert book.best_fill('P1').order_id == 'A'
+        assert book.summary('P1').filled_volume == 140
+
+        # 已成交的订单回到部分成交是不合法的转换，但数据库已经写入，订单簿按数据库更新
+        writer.save_order(make_order('A', status=OrderStatus.PARTIAL_FILLED, filled_volume=30, traded_price=10.0,
+                                     parent_id='P1'))
+        book = reader.get_order_book()
+        assert book.anomalies == 1
+        assert book.get('A').status == OrderStatus.PARTIAL_FILLED
+        assert book.best_fill('P1').order_id == 'B'
+        assert book.summary('P1').filled_volume == 70
+    finally:
+        reader.close()
+        writer.close()
@@ -0,0 +1,62 @@
+import sys
+import threading
+
+from app.oms.storage import DataStorage
+
+
+def test_anonymous_order_matches_database(tmp_path, make_order):
+    storage = DataStorage(str(tmp_path / 'trading_data.db'), use_cache=True)
+    try:
+        order = make_order(None)
+        storage.get_active_orders()
+        storage.save_order(order)
+        storage.save_order(order)
+
+        cached = storage.get_active_orders()
+        rows = storage._get_conn().execute('SELECT COUNT(*) FROM orders').fetchone()[0]
+        assert len(cached) == rows
+    finally:
+        storage.close()
+
+
+def test_concurrent_reads_see_complete_day(tmp_path, make_order):
+    db_path = str(tmp_path / 'trading_data.db')
+    storage = DataStorage(db_path, use_cache=True)
+    other = DataStorage(db_path)
+    errors, stop = [], threading.Event()
+
+    def read():
+        seen = 0
+        try:
+            while not stop.is_set():
+                # 订单只增不减，读到的数量变少说明读到了加载了一半的缓存
+                count = len(storage.get_orders_by_parent('P1'))
+                assert count >= seen
+                seen = count
+                storage.get_orders_grouped_by_parent()
+        except Exception as e:
+            errors.append(e)
+
+    readers = [threading.Thread(target=read) for _ in range(4)]
+    # 频繁切换线程，让读取更容易落在重新加载的中途
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    try:
+        for thread in readers:
+            thread.start()
+        for i in range(1000):
+            # 其他连接写入使缓存整天重新加载，本实例写入走写穿
+            (other if i % 2 else storage).save_order(make_order(f'o{i}', parent_id='P1'))
+    finally:
+        stop.set()
+        for thread in readers:
+            thread.join()
+        sys.setswitchinterval(interval)
+        other.close()
+        storage.close()
+    assert errors == []
+    check = DataStorage(db_path)
+    try:
+        assert len(check.get_orders_by_parent('P1')) == 1000
+    finally:
+        check.close()
@@ -0,0 +1,47 @@
+import warnings
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+
+from app.oms.constant import OrderSide, OrderStatus
+from app.oms.order_frame import FRAME_COLUMNS, OrderFrame
+from app.oms.storage import DataStorage
+
+
+def _row(order_id: str, create_time) -> tuple:
+    values = dict.fromkeys(FRAME_COLUMNS)
+    values.update(order_id=order_id, symbol='600000', direction=OrderSide.BUY.value, price=10.0,
+                  volume=100, status=OrderStatus.SUBMITTED.value, create_time=create_time,
+                  filled_volume=0, is_active=1, is_finished=0)
+    return tuple(values[name] for name in FRAME_COLUMNS)
+
+
+def test_offset_times_keep_local_time():
+    column_map = {name: i for i, name in enumerate(FRAME_COLUMNS)}
+    rows = [
+        _row('aware', '2025-04-08T09:30:00.257510+08:00'),
+        _row('naive', '2025-04-08T09:00:00'),
+        _row('missing', None),
+    ]
+    with warnings.catch_warnings():
+        warnings.simplefilter('error')
+        frame = OrderFrame.from_rows(rows, column_map)
+    assert frame.columns['create_time'][0] == np.datetime64('2025-04-08T09:30:00.257510')
+    assert frame.columns['create_time'][1] == np.datetime64('2025-04-08T09:00:00')
+    assert np.isnat(frame.columns['create_time'][2])
+
+
+def test_frame_times_match_order_history(tmp_path, make_order):
+    storage = DataStorage(str(tmp_path / 'trading_data.db'))
+    try:
+        now = datetime.now().replace(microsecond=0)
+        storage.save_order(make_order('aware', create_time=now.replace(tzinfo=timezone(timedelta(hours=8)))))
+        storage.save_order(make_order('naive', create_time=now - timedelta(minutes=1)))
+        start, end = now - timedelta(hours=1), now + timedelta(hours=1)
+        history = [(order.order_id, order.create_time.replace(tzinfo=None))
+                   for order in storage.get_order_history(start, end)]
+        frame = storage.get_order_history_frame(start, end)
+        assert list(zip(frame.columns['order_id'], frame.columns['create_time'].astype(datetime))) == history
+        assert [order_id for order_id, _ in history] == ['aware', 'naive']
+    finally:
+        storage.close()
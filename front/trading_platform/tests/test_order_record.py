@@ -0,0 +1,61 @@
+import copy
+import pickle
+from datetime import datetime
+
+import pytest
+
+from app.oms.order_record import FrozenOrderRecord, OrderRecord
+
+
+def test_round_trip_with_order(make_order):
+    order = make_order(filled_volume=50, strategy_name='grid', create_time=datetime(2025, 4, 8, 9, 30))
+    record = OrderRecord.from_order(order)
+    assert record == order
+    assert record.to_order() == order
+    assert record.security_type is order.security_type
+
+
+def test_frozen_record_is_read_only(make_order):
+    record = OrderRecord.from_order(make_order(), frozen=True)
+    assert isinstance(record, FrozenOrderRecord) and record.frozen
+    with pytest.raises(AttributeError):
+        record.filled_volume = 50
+    with pytest.raises(AttributeError):
+        del record.price
+    assert hash(record) == hash(record.replace())
+
+
+def test_frozen_record_is_shared(make_order):
+    record = OrderRecord.from_order(make_order(), frozen=True)
+    assert record.clone() is record
+    assert copy.copy(record) is record
+    assert copy.deepcopy(record) is record
+    assert record.freeze() is record
+
+
+def test_replace_keeps_source(make_order):
+    record = OrderRecord.from_order(make_order(), frozen=True)
+    updated = record.replace(filled_volume=50)
+    assert updated.frozen and updated.filled_volume == 50
+    assert record.filled_volume == 0
+
+    mutable = record.replace(frozen=False)
+    mutable.filled_volume = 70
+    assert not mutable.frozen and record.filled_volume == 0
+
+
+def test_mutable_record_is_copied(make_order):
+    record = OrderRecord.from_order(make_order())
+    clone = record.clone()
+    assert clone is not record and clone == record
+    clone.filled_volume = 50
+    assert record.filled_volume == 0
+    with pytest.raises(TypeError):
+        hash(record)
+
+
+@pytest.mark.parametrize('frozen', [False, True])
+def test_pickle_keeps_frozen_flag(make_order, frozen):
+    record = OrderRecord.from_order(make_order(), frozen=frozen)
+    restored = pickle.loads(pickle.dumps(record))
+    assert restored == record and restored.frozen is frozen
@@ -0,0 +1,28 @@
+from app.oms.hlc import clock
+from app.oms.storage import DataStorage
+
+
+def _version(storage: DataStorage) -> int:
+    return storage._get_conn().execute("SELECT version FROM orders WHERE order_id = 'o1'").fetchone()[0]
+
+
+def test_local_write_beats_stored_remote_version(tmp_path, make_order):
+    storage = DataStorage(str(tmp_path / 'trading_data.db'))
+    try:
+        storage.save_order(make_order())
+        # 时钟超前的远端修改，本进程的时钟没有合并它（如Web接口进程）
+        remote = clock.now() + (10_000 << 16)
+        written, _ = storage.save_orders_versioned([(make_order(filled_volume=10), remote)])
+        assert written == {'o1'}
+
+        storage.save_order(make_order(filled_volume=40))
+        assert _version(storage) > remote
+        storage.update_order_fields([('o1', {'filled_volume': 50})])
+        assert _version(storage) > remote + 1
+
+        # 同一远端修改重放时不会覆盖之后的本地修改
+        written, _ = storage.save_orders_versioned([(make_order(filled_volume=10), remote)])
+        assert not written
+        assert storage.get_order('o1').filled_volume == 50
+    finally:
+        storage.close()
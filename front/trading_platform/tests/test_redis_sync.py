@@ -0,0 +1,159 @@
+import json
+import threading
+import time
+
+import pytest
+import redis
+
+from app.oms.redis_sync import RedisSyncManager, sync_options_from_env
+from app.oms.storage import DataStorage
+
+fakeredis = pytest.importorskip('fakeredis')
+
+
+@pytest.fixture
+def storage(tmp_path):
+    storage = DataStorage(str(tmp_path / 'trading_data.db'))
+    yield storage
+    storage.close()
+
+
+@pytest.fixture
+def client():
+    return fakeredis.FakeRedis(decode_responses=True)
+
+
+def _monitor_tick(manager: RedisSyncManager):
+    """监控线程的一轮"""
+    changed, to_publish, deleted_orders = manager._scan_local_changes()
+    if to_publish:
+        published = manager.publish_orders([changed[order_id] for order_id in to_publish])
+        manager._record_published(to_publish, published)
+    if deleted_orders and manager.delete_orders(deleted_orders):
+        manager._record_deleted(deleted_orders)
+    if not to_publish and not deleted_orders:
+        manager._flush_outbox()
+
+
+def test_batch_rejected_by_redis_is_retried(storage, client, monkeypatch, make_order):
+    manager = RedisSyncManager(storage, redis_client=client)
+    storage.save_order(make_order())
+    _monitor_tick(manager)
+
+    storage.save_order(make_order(filled_volume=40))
+    write_batch = manager._write_batch
+    def rejected(batch):
+        monkeypatch.setattr(manager, '_write_batch', write_batch)
+        raise redis.ResponseError('OOM command not allowed when used memory > maxmemory')
+    monkeypatch.setattr(manager, '_write_batch', rejected)
+    _monitor_tick(manager)
+    assert json.loads(client.hget(manager.ORDERS_HASH, 'o1'))['filled_volume'] == 0
+
+    _monitor_tick(manager)
+    assert json.loads(client.hget(manager.ORDERS_HASH, 'o1'))['filled_volume'] == 40
+
+
+def test_outbox_flush_and_push_do_not_interleave(storage, client, monkeypatch, make_order):
+    manager = RedisSyncManager(storage, redis_client=client)
+    storage.save_order(make_order())
+    _monitor_tick(manager)
+    # 断线期间的旧数据留在待发送队列
+    stale = manager._stamp_orders([make_order(filled_volume=10)])
+    manager._outbox.update(stale)
+
+    write_batch = manager._write_batch
+    flushing = threading.Event()
+    def slow_write(batch):
+        if threading.current_thread().name == 'flush':
+            flushing.set()
+            time.sleep(0.2)
+        write_batch(batch)
+    monkeypatch.setattr(manager, '_write_batch', slow_write)
+
+    flush = threading.Thread(target=manager._flush_outbox, name='flush')
+    flush.start()
+    flushing.wait(1)
+    storage.save_order(make_order(filled_volume=40))
+    _monitor_tick(manager)
+    flush.join()
+
+    assert json.loads(client.hget(manager.ORDERS_HASH, 'o1'))['filled_volume'] == 40
+
+
+def test_pending_stream_entries_replayed_after_restart(tmp_path, client, make_order):
+    sender_storage = DataStorage(str(tmp_path / 'sender.db'))
+    receiver_storage = DataStorage(str(tmp_path / 'receiver.db'))
+    try:
+        receiver = RedisSyncManager(receiver_storage, redis_client=client, use_stream=True)
+        group, consumer = receiver._stream_consumer()
+        receiver._ensure_stream_group()
+
+        sender = RedisSyncManager(sender_storage, redis_client=client, use_stream=True)
+        sender.is_cloud = True
+        sender_storage.save_order(make_order(filled_volume=40))
+        _monitor_tick(sender)
+
+        # 重启前按进程命名的消费者读取后未确认
+        client.xreadgroup(group, 'host-1234', {receiver.ORDERS_STREAM: '>'})
+        receiver.stream_claim_idle = 0
+        receiver._claim_stale_entries(group, consumer)
+
+        entries = client.xreadgroup(group, consumer, {receiver.ORDERS_STREAM: '0'})[0][1]
+        assert len(entries) == 1
+        assert [info['name'] for info in client.xinfo_consumers(receiver.ORDERS_STREAM, group)] == [consumer]
+        receiver._apply_stream_entries(entries, '本地')
+        assert receiver_storage.get_order('o1').filled_volume == 40
+    finally:
+        sender_storage.close()
+        receiver_storage.close()
+
+
+def test_new_stream_group_starts_at_end(tmp_path, client, make_order):
+    sender_storage = DataStorage(str(tmp_path / 'sender.db'))
+    receiver_storage = DataStorage(str(tmp_path / 'receiver.db'))
+    try:
+        sender = RedisSyncManager(sender_storage, redis_client=client, use_stream=True)
+        sender.is_cloud = True
+        sender_storage.save_order(make_order(filled_volume=40))
+        _monitor_tick(sender)
+
+        # 新建的消费者组不重放流中保留的消息，由启动时的全量对比补齐
+        receiver = RedisSyncManager(receiver_storage, redis_client=client, use_stream=True)
+        group, consumer = receiver._stream_consumer()
+        receiver._ensure_stream_group()
+        assert client.xreadgroup(group, consumer, {receiver.ORDERS_STREAM: '>'}) == []
+        receiver._sync_from_hash()
+        assert receiver_storage.get_order('o1').filled_volume == 40
+    finally:
+        sender_storage.close()
+        receiver_storage.close()
+
+
+def test_sync_options_from_env(monkeypatch):
+    monkeypatch.delenv('JAILBIRD_REDIS_SHARDED', raising=False)
+    monkeypatch.delenv('JAILBIRD_REDIS_STREAM', raising=False)
+    assert sync_options_from_env() == {'sharded': True, 'use_stream': True}
+    monkeypatch.setenv('JAILBIRD_REDIS_SHARDED', 'false')
+    monkeypatch.setenv('JAILBIRD_REDIS_STREAM', '0')
+    assert sync_options_from_env() == {'sharded': False, 'use_stream': False}
+
+
+def test_count_remote_orders_reads_shards(storage, client, make_order):
+    manager = RedisSyncManager(storage, redis_client=client, sharded=True)
+    storage.save_orders([make_order('o1', strategy_name='A'), make_order('o2', strategy_name='B'),
+                         make_order('o3')])
+    _monitor_tick(manager)
+    assert client.hlen(manager.ORDERS_HASH) == 0
+    assert manager.count_remote_orders() == 3
+
+
+def test_delete_after_restart_removes_from_shard(storage, client, make_order):
+    storage.save_orders([make_order('o1', strategy_name='A'), make_order('o2', strategy_name='B')])
+    _monitor_tick(RedisSyncManager(storage, redis_client=client, sharded=True))
+
+    # 重启后的进程没有推送记录；o1 的订单行仍在，o2 的订单行已删除
+    restarted = RedisSyncManager(storage, redis_client=client, sharded=True)
+    storage._get_conn().execute("DELETE FROM orders WHERE order_id = 'o2'")
+    storage._get_conn().commit()
+    assert restarted.delete_orders(['o1', 'o2'])
+    assert restarted.count_remote_orders() == 0
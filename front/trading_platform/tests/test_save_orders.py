@@ -0,0 +1,16 @@
+from app.oms.constant import OrderType
+from app.oms.storage import DataStorage
+
+
+def test_market_order_without_price(tmp_path, make_order):
+    storage = DataStorage(str(tmp_path / 'trading_data.db'))
+    try:
+        order = make_order('m1', price=None, order_type=OrderType.MARKET)
+        assert storage.save_orders([order]) == []
+        saved = storage.get_order('m1')
+        assert saved.price is None and saved.traded_price is None
+
+        storage.update_order_fields([('m1', {'traded_price': 10.12345, 'filled_volume': 100})])
+        assert storage.get_order('m1').traded_price == 10.123
+    finally:
+        storage.close()
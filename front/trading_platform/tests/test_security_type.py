@@ -0,0 +1,30 @@
+import pytest
+
+from app.oms.constant import SecurityType, infer_security_type
+from app.oms.symbols import infer_symbol_info
+
+
+@pytest.mark.parametrize('symbol', ['110059', '111004', '113050', '118008', '123107', '127045', '128081'])
+def test_convertible_bonds(symbol):
+    # 这些前缀原先判断为 STOCK
+    assert infer_security_type(symbol) is SecurityType.BOND
+
+
+@pytest.mark.parametrize('symbol, expected', [
+    ('600000', SecurityType.STOCK),
+    ('000001', SecurityType.STOCK),
+    ('300750', SecurityType.STOCK),
+    ('688981', SecurityType.STOCK),
+    ('112001', SecurityType.STOCK),
+    ('510300', SecurityType.ETF),
+    ('511880', SecurityType.ETF),
+    ('159915', SecurityType.ETF),
+])
+def test_other_prefixes(symbol, expected):
+    assert infer_security_type(symbol) is expected
+
+
+def test_bond_symbol_info():
+    info = infer_symbol_info('113050')
+    assert (info.exchange, info.lot_size, info.tick_size) == ('SH', 10, 0.001)
+    assert infer_symbol_info('127045').exchange == 'SZ'
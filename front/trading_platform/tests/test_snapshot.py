@@ -0,0 +1,37 @@
+import threading
+
+from app.oms.storage import DataStorage
+
+
+def test_snapshot_connection_per_thread(tmp_path, make_order):
+    db_path = str(tmp_path / 'trading_data.db')
+    writer = DataStorage(db_path)
+    reader = DataStorage(db_path, read_only=True, snapshot_interval=3600)
+    try:
+        writer.save_order(make_order('o1'))
+        reader._snapshot.refresh()
+
+        conns, counts = {}, {}
+
+        def query(name):
+            conns[name] = reader._get_conn()
+            counts[name] = len(reader.get_active_orders())
+
+        threads = [threading.Thread(target=query, args=(f't{i}',)) for i in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert len({id(conn) for conn in conns.values()}) == 4
+        assert set(counts.values()) == {1}
+
+        # 刷新后重新复制，同线程被替换的连接仍可读取
+        first = reader._get_conn()
+        writer.save_order(make_order('o2'))
+        reader._snapshot.refresh()
+        assert reader._get_conn() is not first
+        assert first.execute('SELECT COUNT(*) FROM orders').fetchone()[0] == 1
+        assert len(reader.get_active_orders()) == 2
+    finally:
+        reader.close()
+        writer.close()